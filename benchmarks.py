@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       benchmarks.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This script times the CAD/GIS Office scripts' hot spots against synthetic data,
+so the row by row implementations they replaced can be compared with the
+current ones. The benchmarks only require pandas and numpy, no database,
+ArcGIS or AutoCAD installation is needed. The startup benchmark runs
+office_scripts.py in new interpreters and checks that its help texts do not
+import any heavy module.
+usage: python benchmarks.py [benchmark name ...]
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+
+def _decode(value):
+    # the legacy loop decoded every cell, python 3 strings are already text
+    if bytes is str:
+        return value.decode('UTF-8')
+    return value
+
+
+def _timed(func, *args):
+    """ This helper function runs func(*args) and returns the elapsed
+    seconds.
+    """
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def _report(name, rows, legacy_rows, legacy_seconds, new_seconds):
+    """ This helper function prints a benchmark result, the legacy time is
+    extrapolated linearly when it was measured on a sample.
+    """
+    legacy_total = legacy_seconds * rows / float(legacy_rows)
+    print('{}: {} rows'.format(name, rows))
+    print('  legacy loop:  {:10.3f} s{}'.format(
+        legacy_total, '' if legacy_rows == rows else
+        ' (extrapolated from {} rows)'.format(legacy_rows)))
+    print('  vectorized:   {:10.3f} s'.format(new_seconds))
+    print('  speedup:      {:10.1f}x'.format(legacy_total / new_seconds))
+
+
+def synthetic_roster(rows=500000, seed=0):
+    """ This function builds a synthetic employee roster with the columns
+    employees_to_postgresql expects after formatting the column names. About
+    one percent of the rows are missing an address part.
+
+    Args:
+    rows (int) (default = 500000) = The number of employees.
+    seed (int) (default = 0) = The random generator seed.
+
+    Returns:
+    A pandas DataFrame.
+    """
+    rng = np.random.RandomState(seed)
+    streets = np.array([u'Regent Dr', u'Broadway', u'Folsom St',
+                        u'Arapahoe Ave', u'Baseline Rd', u'Colorado Ave',
+                        u'Pearl St'],
+                       dtype=object)
+    cities = np.array([u'Boulder', u'Louisville', u'Lafayette', u'Longmont',
+                       u'Denver'], dtype=object)
+    numbers = rng.randint(1, 9999, rows).astype(str).astype(object)
+    df = pd.DataFrame({
+        'address_1': numbers + u' ' + streets[rng.randint(0, 7, rows)],
+        'city': cities[rng.randint(0, 5, rows)],
+        'state': u'CO',
+        'postal': rng.randint(80000, 81000, rows).astype(float)})
+    blanks = rng.rand(rows) < 0.01
+    df.loc[blanks, 'postal'] = np.nan
+    return df
+
+
+def _legacy_normalize(df):
+    """ The row by row address normalization employees_to_postgresql used
+    before normalize_addresses.
+    """
+    df.insert(len(df.columns), 'normalize_addr', 'x')
+    for index, row in df.iterrows():
+        try:
+            street = _decode(str(df.loc[index, 'address_1']))
+            city = _decode(str(df.loc[index, 'city']))
+            state = _decode(str(df.loc[index, 'state']))
+            zipcode = _decode(str(df.loc[index, 'postal']))
+            normalize_addr = '{}, {} {} {}'.format(
+                street, city, state, zipcode)
+            df.loc[index, 'normalize_addr'] = normalize_addr
+        except Exception as e:
+            print(e)
+
+
+def bench_address_normalization(rows=500000, legacy_rows=20000):
+    """ This function compares the legacy employee address loop with
+    cu_ed_web_map.normalize_addresses on a synthetic roster. The legacy loop
+    is timed on the first legacy_rows rows only, it takes minutes on the full
+    roster.
+    """
+    from cu_ed_web_map import normalize_addresses
+    df = synthetic_roster(rows)
+    legacy_rows = min(rows, legacy_rows)
+    legacy = _timed(_legacy_normalize, df.head(legacy_rows).copy())
+    new = _timed(normalize_addresses, df)
+    _report('address normalization', rows, legacy_rows, legacy, new)
+
+
+def synthetic_sensor_file(start='2016-08-15', end='2016-12-16', minutes=1,
+                          bad_share=0.001, seed=0):
+    """ This function builds a synthetic CUPD volume sheet (after skipping
+    its header rows) covering a semester, with day strings such as
+    '8/16/2016' and hour strings such as '11:30 PM'. A small share of the
+    hours is garbled.
+
+    Args:
+    start (string) (default = '2016-08-15') = The first day.
+    end (string) (default = '2016-12-16') = The last day.
+    minutes (int) (default = 1) = The minutes between readings.
+    bad_share (float) (default = 0.001) = The share of garbled hours.
+    seed (int) (default = 0) = The random generator seed.
+
+    Returns:
+    A pandas DataFrame with the 'Unnamed: 0' ... 'Unnamed: 4' columns.
+    """
+    rng = np.random.RandomState(seed)
+    stamps = pd.date_range(start, end, freq='{}min'.format(minutes))
+    rows = len(stamps)
+    days = ['{}/{}/{}'.format(t.month, t.day, t.year) for t in
+            pd.date_range(start, end, freq='D')]
+    day = np.array(days, dtype=object)[(stamps.normalize() - stamps[0]
+                                        .normalize()).days]
+    hour = np.array(stamps.strftime('%I:%M %p'), dtype=object)
+    hour[rng.rand(rows) < bad_share] = u'--:-- --'
+    return pd.DataFrame({'Unnamed: 0': np.arange(rows),
+                         'Unnamed: 1': day, 'Unnamed: 2': hour,
+                         'Unnamed: 3': rng.poisson(20, rows),
+                         'Unnamed: 4': rng.poisson(25, rows)})
+
+
+def _legacy_timestamps(df):
+    """ The row by row DATE construction movein_dataparser used before
+    parse_timestamps.
+    """
+    import re
+    df.insert(5, 'DATE', 'x')
+    for index, row in df.iterrows():
+        day = row['Unnamed: 1']
+        hour = row['Unnamed: 2']
+        hour_pattern = r'\w\w\s'
+        hour_repla = hour[3:5] + ':00' + ' '
+        parsed_hour_data = re.sub(hour_pattern, hour_repla, hour)
+        df.loc[index, 'DATE'] = day + ' ' + parsed_hour_data
+
+
+def bench_sensor_timestamps(minutes=1, legacy_rows=10000):
+    """ This function compares the legacy DATE loop of movein_dataparser
+    with parse_timestamps on a synthetic semester of sensor readings (one
+    reading per minute, about 177,000 rows). The legacy loop is timed on the
+    first legacy_rows rows only.
+    """
+    from movein_project_csv_formatting import parse_timestamps
+    df = synthetic_sensor_file(minutes=minutes)
+    rows = len(df)
+    legacy_rows = min(rows, legacy_rows)
+    legacy = _timed(_legacy_timestamps, df.head(legacy_rows).copy())
+    new = _timed(parse_timestamps, df['Unnamed: 1'], df['Unnamed: 2'])
+    _report('sensor timestamps', rows, legacy_rows, legacy, new)
+
+
+def synthetic_rooms(rooms=200000, seed=0):
+    """ This function builds the vertices of synthetic room boundaries, 4 to
+    12 vertices each with a few arc segments, concatenated as
+    dxf_area_report.polygon_areas expects them.
+
+    Returns:
+    A tuple (x, y, bulge, starts) of numpy arrays.
+    """
+    rng = np.random.RandomState(seed)
+    sizes = rng.randint(4, 13, rooms)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    ring = np.arange(sizes.sum()) - np.repeat(starts, sizes)
+    angle = 2 * np.pi * ring / np.repeat(sizes, sizes)
+    radius = np.repeat(rng.uniform(60, 600, rooms), sizes)
+    x = np.repeat(rng.uniform(0, 1e5, rooms), sizes) + radius * np.cos(angle)
+    y = np.repeat(rng.uniform(0, 1e5, rooms), sizes) + radius * np.sin(angle)
+    bulge = np.where(rng.rand(len(x)) < 0.05, rng.uniform(-1, 1, len(x)), 0)
+    return x, y, bulge, starts
+
+
+def _legacy_areas(x, y, bulge, starts):
+    """ The polygon by polygon, vertex by vertex area loop.
+    """
+    import math
+    ends = list(starts[1:]) + [len(x)]
+    areas = []
+    for start, end in zip(starts, ends):
+        total = 0.0
+        for i in range(start, end):
+            j = i + 1 if i + 1 < end else start
+            total += x[i] * y[j] - x[j] * y[i]
+            if bulge[i]:
+                angle = 4 * math.atan(bulge[i])
+                chord = math.hypot(x[j] - x[i], y[j] - y[i])
+                radius = chord / (2 * math.sin(angle / 2))
+                total += radius ** 2 * (angle - math.sin(angle))
+        areas.append(abs(total) / 2)
+    return areas
+
+
+def bench_dxf_areas(rooms=200000, legacy_rooms=20000):
+    """ This function compares a polygon by polygon area loop with
+    dxf_area_report.polygon_areas on synthetic room boundaries. The loop is
+    timed on the first legacy_rooms rooms only.
+    """
+    from dxf_area_report import polygon_areas
+    x, y, bulge, starts = synthetic_rooms(rooms)
+    legacy_rooms = min(rooms, legacy_rooms)
+    end = starts[legacy_rooms] if legacy_rooms < rooms else len(x)
+    legacy = _timed(_legacy_areas, x[:end].tolist(), y[:end].tolist(),
+                    bulge[:end].tolist(), starts[:legacy_rooms].tolist())
+    new = _timed(polygon_areas, x, y, bulge, starts)
+    _report('dxf areas', rooms, legacy_rooms, legacy, new)
+
+
+def synthetic_projects(folder, projects=300, files=20):
+    """ This function creates GIS project trees (see
+    gis_project_folder_structure.py) with small files in every project
+    folder.
+    """
+    from gis_project_folder_structure import FOLDER_STRUCTURE, LOGBOOK_SUFFIX
+    extensions = ['.docx', '.png', '.gdbtable', '.lyr', '.mxd', '.pdf',
+                  '.shp', '.xlsx', '.py', '.dwg']
+    for p in range(projects):
+        name = 'PROJ{:04d}'.format(p)
+        with open(os.path.join(folder, name + LOGBOOK_SUFFIX), 'w') as f:
+            f.write('Project name: {}\nAssigned to: UG\n'.format(name))
+        for suffix, extension in zip(FOLDER_STRUCTURE, extensions):
+            path = os.path.join(folder, name + suffix)
+            os.makedirs(path)
+            for i in range(files):
+                with open(os.path.join(path, 'file{}{}'.format(
+                        i, extension)), 'w') as f:
+                    f.write('x')
+
+
+def _walk_find(folder, extension):
+    """ The recursive walk a search used before the catalog.
+    """
+    return [os.path.join(path, name) for path, _, names in os.walk(folder)
+            for name in names if name.lower().endswith(extension)]
+
+
+def bench_catalog(projects=300, files=20):
+    """ This function compares a recursive walk with the gis_catalog lookup
+    on synthetic project trees: the first scan, a scan after one file was
+    added and the lookup itself. The trees are local, on the network share
+    every listing and stat is a round trip and the difference is larger.
+    """
+    import shutil
+    import tempfile
+    from gis_catalog import GisCatalog
+    folder = tempfile.mkdtemp()
+    try:
+        root = os.path.join(folder, 'GIS')
+        os.makedirs(root)
+        synthetic_projects(root, projects, files)
+        catalog = GisCatalog(os.path.join(folder, 'catalog.sqlite'))
+        walk = _timed(_walk_find, root, '.mxd')
+        first = _timed(catalog.scan, [root])
+        # file system times have a coarse resolution on some platforms
+        time.sleep(1.1)
+        with open(os.path.join(root, 'PROJ0000_MXD', 'new.mxd'), 'w') as f:
+            f.write('x')
+        stats = catalog.scan([root])
+        lookup = _timed(catalog.find, None, '.mxd')
+        found = len(catalog.find(extension='.mxd'))
+        catalog.close()
+    finally:
+        shutil.rmtree(folder)
+    print('catalog: {} projects, {} files'.format(
+        projects, projects * (files * 10 + 1)))
+    print('  recursive walk: {:10.3f} s ({} maps)'.format(walk, found))
+    print('  first scan:     {:10.3f} s'.format(first))
+    print('  rescan:         {:10.3f} s ({} of {} directories listed)'.format(
+        stats['seconds'], stats['listed'], stats['directories']))
+    print('  lookup:         {:10.3f} s'.format(lookup))
+
+
+def _probe(statements, runs):
+    """ This helper function runs python statements in new interpreters
+    (from this folder) and returns the median wall time and the
+    office_scripts.HEAVY_MODULES they imported.
+    """
+    code = '\n'.join([
+        'import sys'] + statements + [
+        'import office_scripts',
+        'sys.stdout.write("\\n" + " ".join(m for m in '
+        'office_scripts.HEAVY_MODULES if m in sys.modules))'])
+    folder = os.path.dirname(os.path.abspath(__file__))
+    seconds = []
+    for _ in range(runs):
+        start = time.time()
+        process = subprocess.Popen([sys.executable, '-c', code], cwd=folder,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        out, err = process.communicate()
+        seconds.append(time.time() - start)
+        if process.returncode:
+            raise RuntimeError(err.decode('utf-8', 'replace'))
+    heavy = out.decode('utf-8', 'replace').splitlines()[-1].split()
+    return sorted(seconds)[runs // 2], heavy
+
+
+def bench_startup(runs=5):
+    """ This function times the startup of office_scripts.py: the bare
+    interpreter, the pandas and sqlalchemy imports the scripts used to run
+    at module level, the main help text and every subcommand's help text.
+    A help text that imports a heavy module is flagged.
+    """
+    parse = ['try:',
+             '    office_scripts.build_parser().parse_known_args({!r})',
+             'except SystemExit:',
+             '    pass']
+    probes = [('interpreter', ['pass'], False),
+              ('pandas + sqlalchemy', ['import pandas, sqlalchemy.sql'],
+               False),
+              ('--help', ['import office_scripts'] +
+               [line.format(['--help']) for line in parse], True)]
+    import office_scripts
+    for name in office_scripts.SUBCOMMANDS:
+        probes.append(('{} --help'.format(name), ['import office_scripts'] +
+                       [line.format([name, '--help']) for line in parse],
+                       True))
+    print('office_scripts startup: median of {} runs'.format(runs))
+    results = {}
+    for name, statements, must_be_light in probes:
+        seconds, heavy = _probe(statements, runs)
+        results[name] = seconds
+        print('  {:24} {:8.3f} s  {}{}'.format(
+            name, seconds, ' '.join(heavy),
+            '  <- heavy import' if must_be_light and heavy else ''))
+    return results
+
+
+BENCHMARKS = {'address_normalization': bench_address_normalization,
+              'sensor_timestamps': bench_sensor_timestamps,
+              'dxf_areas': bench_dxf_areas,
+              'catalog': bench_catalog,
+              'startup': bench_startup}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or sorted(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
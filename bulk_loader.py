@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       bulk_loader.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+PostgreSQL Version: 9.4
+--------------------------------------------------------------------------------
+This module streams pandas dataframes, chunk by chunk, into a table. The
+target is a 'sink' object, PostgresCopySink sends every chunk through an in
+memory CSV buffer to PostgreSQL COPY FROM STDIN, SQLiteSink and CSVFileSink
+are local stand-ins that can be used to exercise a load without a PostgreSQL
+server. Every sink implements the same three methods:
+begin(frame)  creates (or replaces) the target from the first chunk
+write(frame)  appends a chunk
+close()       commits the load, abort() rolls it back
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import csv
+import io
+import sqlite3
+
+# python 2 csv and to_csv write byte strings, python 3 write text
+if bytes is str:
+    from StringIO import StringIO as CSVBuffer
+else:
+    CSVBuffer = io.StringIO
+
+
+def quote_identifier(name):
+    """ This helper function double quotes a PostgreSQL/SQLite identifier.
+
+    Examples:
+    >>> quote_identifier('normalize_addr')
+    '"normalize_addr"'
+    """
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def frame_columns(frame, index=True):
+    """ This helper function returns the column names a dataframe is written
+    with, the index label comes first when index is True (pandas names an
+    unnamed index 'index').
+    """
+    columns = [str(c) for c in frame.columns]
+    if index:
+        columns.insert(0, frame.index.name or 'index')
+    return columns
+
+
+def frame_to_csv_buffer(frame, index=True):
+    """ This function writes a dataframe to an in-memory CSV buffer without
+    header, the buffer is rewound and ready to be read.
+
+    Args:
+    frame (pandas.DataFrame) = The chunk that is going to be written.
+    index (boolean) (default = True) = Whether the index is written as the
+    first column.
+
+    Returns:
+    A file-like object.
+    """
+    buf = CSVBuffer()
+    frame.to_csv(buf, index=index, header=False, encoding='utf-8',
+                 quoting=csv.QUOTE_MINIMAL)
+    buf.seek(0)
+    return buf
+
+
+class PostgresCopySink(object):
+    """ This sink loads the chunks into a PostgreSQL table with
+    COPY ... FROM STDIN inside a single transaction, so the table is either
+    fully replaced or left untouched.
+
+    Args:
+    engine (sqlalchemy.engine.Engine) = The target database engine, or any
+    object with the same connect method (i.e. a PipelineContext).
+    table (string) = The name of the target table.
+    schema (string) (default = 'public') = The name of the target schema.
+    index (boolean) (default = True) = Whether the dataframe index is loaded
+    as the first column (the same as DataFrame.to_sql).
+    ddl (string) (default = None) = A CREATE TABLE statement, when given it is
+    used instead of the table pandas derives from the first chunk.
+    """
+
+    def __init__(self, engine, table, schema='public', index=True, ddl=None):
+        self.engine = engine
+        self.table = table
+        self.schema = schema
+        self.index = index
+        self.ddl = ddl
+        self.rows = 0
+        self._con = None
+        self._trans = None
+        self._copy_sql = None
+
+    def begin(self, frame):
+        from sqlalchemy.sql import text
+        self._con = self.engine.connect()
+        self._trans = self._con.begin()
+        qualified = '{}.{}'.format(quote_identifier(self.schema),
+                                   quote_identifier(self.table))
+        if self.ddl is None:
+            frame.head(0).to_sql(self.table, self._con, schema=self.schema,
+                                 if_exists='replace', index=self.index)
+        else:
+            self._con.execute(text('DROP TABLE IF EXISTS {}'.format(
+                qualified)))
+            self._con.execute(text(self.ddl))
+        columns = ', '.join(quote_identifier(c)
+                            for c in frame_columns(frame, self.index))
+        self._copy_sql = 'COPY {} ({}) FROM STDIN WITH CSV'.format(
+            qualified, columns)
+
+    def write(self, frame):
+        cursor = self._con.connection.cursor()
+        try:
+            cursor.copy_expert(self._copy_sql,
+                               frame_to_csv_buffer(frame, self.index))
+        finally:
+            cursor.close()
+        self.rows += len(frame)
+
+    def close(self):
+        self._trans.commit()
+        self._con.close()
+
+    def abort(self):
+        if self._trans is not None:
+            self._trans.rollback()
+            self._con.close()
+
+
+class SQLiteSink(object):
+    """ This sink loads the chunks into a SQLite table (executemany through
+    DataFrame.to_sql), it stands in for PostgreSQL in local runs.
+
+    Args:
+    path (string) = The SQLite database file (':memory:' is allowed).
+    table (string) = The name of the target table.
+    index (boolean) (default = True) = Whether the dataframe index is loaded
+    as the first column.
+    """
+
+    def __init__(self, path, table, index=True):
+        self.path = path
+        self.table = table
+        self.index = index
+        self.rows = 0
+        self.connection = None
+
+    def begin(self, frame):
+        self.connection = sqlite3.connect(self.path)
+        frame.head(0).to_sql(self.table, self.connection,
+                             if_exists='replace', index=self.index)
+
+    def write(self, frame):
+        frame.to_sql(self.table, self.connection, if_exists='append',
+                     index=self.index)
+        self.rows += len(frame)
+
+    def close(self):
+        self.connection.commit()
+        if self.path != ':memory:':
+            self.connection.close()
+
+    def abort(self):
+        if self.connection is not None:
+            self.connection.rollback()
+            self.connection.close()
+
+
+class CSVFileSink(object):
+    """ This sink appends the chunks to a CSV file (with header), it is the
+    simplest stand-in for a database table.
+
+    Args:
+    path (string) = The output CSV file.
+    index (boolean) (default = True) = Whether the dataframe index is written
+    as the first column.
+    """
+
+    def __init__(self, path, index=True):
+        self.path = path
+        self.index = index
+        self.rows = 0
+        self._csv = None
+
+    def begin(self, frame):
+        self._csv = io.open(self.path, 'w', encoding='utf-8', newline='')
+        header = CSVBuffer()
+        csv.writer(header).writerow(frame_columns(frame, self.index))
+        self._csv.write(header.getvalue().decode('utf-8')
+                        if bytes is str else header.getvalue())
+
+    def write(self, frame):
+        chunk = frame_to_csv_buffer(frame, self.index).getvalue()
+        self._csv.write(chunk.decode('utf-8') if bytes is str else chunk)
+        self.rows += len(frame)
+
+    def close(self):
+        self._csv.close()
+
+    def abort(self):
+        if self._csv is not None:
+            self._csv.close()
+
+
+def bulk_load(frames, sink):
+    """ This function streams dataframes into a sink, only one chunk is held
+    in memory at a time. The sink is rolled back if anything goes wrong.
+
+    Args:
+    frames (iterable) = An iterable of pandas DataFrames with the same
+    columns, i.e. the chunks yielded by an Excel or shapefile reader.
+    sink (object) = A PostgresCopySink, SQLiteSink, CSVFileSink or any object
+    with the same begin/write/close/abort methods.
+
+    Returns:
+    The number of rows loaded.
+
+    Examples:
+    >>> bulk_load(excel_chunks('cu_employees_data.xlsx'),
+    ...           SQLiteSink('employees.sqlite', 'cu_employees_data'))
+    48210
+    """
+    started = False
+    try:
+        for frame in frames:
+            if not started:
+                sink.begin(frame)
+                started = True
+            sink.write(frame)
+        if started:
+            sink.close()
+    except Exception:
+        if started:
+            sink.abort()
+        raise
+    return sink.rows
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       cad_commands.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  20.1
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module compiles the steps that standardize a drawing into as few
+AutoCAD round trips as possible. A step is a (name, command, lisp) tuple:
+('dlf', 'DLF\\n', 'Z:/ACAD/Lisp/dlf.lsp')   the lisp file defines the command
+('layers', None, 'Z:/ACAD/Lisp/...lsp')   loading the lisp file is the step
+('zoom', 'ZOOM EXTENTS\\n', None)          a plain command
+The lisp files are copied once from the network share to a local folder.
+The ones that define commands are loaded once per CAD session with
+vl-load-all (AutoLISP functions belong to a document, vl-load-all makes them
+available to every drawing the session opens), the ones whose load is the
+step are loaded again in every drawing, from the local copy. All the steps
+of a drawing are sent as one payload, or written with the drawings of a
+whole batch to an AutoCAD script (.scr).
+In timed mode every step is followed by a (cu-mark "step") call, which
+appends the drawing, the step and the MILLISECS system variable to the
+session's timing log, so the time spent in every step can be measured
+without a round trip per step (see read_timings).
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import glob
+import os
+import shutil
+import tempfile
+
+"""the lisp routine that writes the timing marks, the log path is shared by
+the session's documents through the blackboard namespace"""
+TIMING_LISP = r'''(defun cu-mark (step / log f)
+  (setq log (vl-bb-ref '*cu-timing-log*))
+  (if (and log (setq f (open log "a")))
+    (progn
+      (write-line (strcat (getvar "DWGPREFIX") (getvar "DWGNAME") "\t" step
+                          "\t" (itoa (getvar "MILLISECS"))) f)
+      (close f)))
+  (princ))
+'''
+
+
+def lisp_string(text):
+    """ This function quotes a string (i.e. a path) for AutoLISP.
+    """
+    return '"{}"'.format(text.replace('\\', '/').replace('"', '\\"'))
+
+
+def drawing_key(path):
+    """ This function returns the key of a drawing in the timing logs, the
+    lower case path with forward slashes (AutoCAD reports the paths with
+    backslashes, windows paths ignore case).
+    """
+    return os.path.normpath(path.replace('\\', '/')).replace('\\', '/') \
+        .lower()
+
+
+def cache_lisp(paths, folder):
+    """ This function copies lisp files to a local folder, a file is only
+    copied again when its size or modification time changed. When the
+    network share is not available the local copy is used.
+
+    Args:
+    paths (list) = The paths of the lisp files.
+    folder (string) = The local folder, it is created when it does not exist.
+
+    Returns:
+    A dictionary {path: local path}.
+
+    Examples:
+    >>> cache_lisp(['Z:/ACAD/Lisp/dlf.lsp'], 'C:/Temp/cu_cad_lisp')
+    {'Z:/ACAD/Lisp/dlf.lsp': 'C:/Temp/cu_cad_lisp/dlf.lsp'}
+    """
+    try:
+        os.makedirs(folder)
+    except OSError:
+        if not os.path.isdir(folder):
+            raise
+    local = {}
+    for path in paths:
+        target = os.path.join(folder, os.path.basename(path))
+        if os.path.exists(path):
+            source = os.stat(path)
+            if not os.path.exists(target) or \
+                    os.stat(target).st_size != source.st_size or \
+                    int(os.stat(target).st_mtime) != int(source.st_mtime):
+                # copy2 keeps the modification time
+                shutil.copy2(path, target)
+        elif os.path.exists(target):
+            print('{} is not available, using the copy in {}'.format(
+                path, folder))
+        else:
+            raise IOError('{} is not available and was never cached'.format(
+                path))
+        local[path] = target.replace('\\', '/')
+    return local
+
+
+class CommandCompiler(object):
+    """ This class turns a list of steps into the commands sent to a CAD
+    session.
+
+    Args:
+    steps (list) = The (name, command, lisp) steps, in order.
+    cache_folder (string) (default = None) = The local folder for the lisp
+    files, cu_cad_lisp in the temporary folder when it is None.
+    timing_folder (string) (default = None) = The folder for the timing logs,
+    the steps are not timed when it is None.
+    copy_lisp (boolean) (default = True) = Copy the lisp files to
+    cache_folder, when it is False the commands refer to the files on the
+    share and they are never read (i.e. for cad_session.RecordingCad).
+
+    Examples:
+    >>> compiler = CommandCompiler(CLEANING_STEPS, timing_folder='C:/timings')
+    >>> session.start(compiler.session_commands(compiler.timing_log(1)))
+    >>> session.run(dwg, [compiler.drawing_payload()])
+    >>> compiler.read_timings()[dwg]
+    {'dlf': 0.41, 'area_report': 3.92, 'layers': 1.2, ...}
+    """
+
+    def __init__(self, steps, cache_folder=None, timing_folder=None,
+                 copy_lisp=True):
+        self.steps = list(steps)
+        self.cache_folder = cache_folder or os.path.join(
+            tempfile.gettempdir(), 'cu_cad_lisp')
+        self.timing_folder = timing_folder
+        self.copy_lisp = copy_lisp
+        self._local = None
+
+    @property
+    def timed(self):
+        return self.timing_folder is not None
+
+    def step_names(self):
+        return [name for name, _, _ in self.steps]
+
+    def local_lisp(self):
+        """ This method returns the {path: local path} of the steps' lisp
+        files, they are cached on the first call.
+        """
+        if self._local is None:
+            paths = [lisp for _, _, lisp in self.steps if lisp]
+            if self.copy_lisp:
+                self._local = cache_lisp(paths, self.cache_folder)
+            else:
+                self._local = dict((path, path.replace('\\', '/'))
+                                   for path in paths)
+        return self._local
+
+    def timing_log(self, session):
+        """ This method returns the timing log of a session (a worker
+        number), None when the steps are not timed.
+        """
+        if not self.timed:
+            return None
+        return os.path.join(self.timing_folder, 'session_{}.log'.format(
+            session)).replace('\\', '/')
+
+    def reset_timings(self):
+        """ This method removes the timing logs of a previous run.
+        """
+        if not self.timed:
+            return
+        try:
+            os.makedirs(self.timing_folder)
+        except OSError:
+            if not os.path.isdir(self.timing_folder):
+                raise
+        for log in glob.glob(os.path.join(self.timing_folder, '*.log')):
+            os.remove(log)
+
+    def session_commands(self, log=None):
+        """ This method returns the commands a session runs once, after it
+        starts: the lisp files that define commands are loaded into every
+        document of the session.
+        """
+        local = self.local_lisp()
+        commands = ['(vl-load-com)\n']
+        if self.timed:
+            try:
+                os.makedirs(self.cache_folder)
+            except OSError:
+                if not os.path.isdir(self.cache_folder):
+                    raise
+            timing = os.path.join(self.cache_folder, 'cu_timing.lsp')
+            with open(timing, 'w') as f:
+                f.write(TIMING_LISP)
+            commands.append("(vl-bb-set '*cu-timing-log* {})\n".format(
+                lisp_string(log or self.timing_log(1))))
+            commands.append('(vl-load-all {})\n'.format(lisp_string(timing)))
+        for _, command, lisp in self.steps:
+            if lisp and command is not None:
+                commands.append('(vl-load-all {})\n'.format(
+                    lisp_string(local[lisp])))
+        return commands
+
+    def step_commands(self):
+        """ This method returns the commands of a drawing, one string per
+        step (the timing marks included).
+        """
+        local = self.local_lisp()
+        commands = ['(cu-mark "start")\n'] if self.timed else []
+        for name, command, lisp in self.steps:
+            text = command if command is not None else \
+                '(load {})\n'.format(lisp_string(local[lisp]))
+            if self.timed:
+                text += '(cu-mark {})\n'.format(lisp_string(name))
+            commands.append(text)
+        return commands
+
+    def drawing_payload(self):
+        """ This method returns every step of a drawing as a single string,
+        it is sent with one SendCommand call.
+        """
+        return ''.join(self.step_commands())
+
+    def batch_script(self, dwgs):
+        """ This method returns an AutoCAD script that standardizes a batch
+        of drawings in one session. The script switches to single document
+        mode and keeps the lisp functions loaded between drawings (LISPINIT
+        0), run it with 'acad.exe /b batch.scr' or the SCRIPT command.
+        """
+        lines = ['SDI', '1', 'LISPINIT', '0']
+        lines.extend(command.rstrip('\n') for command in
+                     self.session_commands())
+        for dwg in dwgs:
+            lines.append('(command "_.OPEN" {})'.format(
+                lisp_string(os.path.abspath(dwg))))
+            lines.extend(self.drawing_payload().rstrip('\n').split('\n'))
+        lines.extend(['LISPINIT', '1', 'SDI', '0'])
+        return '\n'.join(lines) + '\n'
+
+    def write_batch_script(self, dwgs, path):
+        with open(path, 'w') as f:
+            f.write(self.batch_script(dwgs))
+        return path
+
+    def read_timings(self):
+        """ This method reads the timing logs, a drawing's last attempt wins.
+
+        Returns:
+        A dictionary {drawing key: {step name: seconds}}, the drawing key is
+        the lower case absolute path with forward slashes.
+        """
+        timings = {}
+        if not self.timed:
+            return timings
+        for log in glob.glob(os.path.join(self.timing_folder, '*.log')):
+            last = {}
+            with open(log) as f:
+                for line in f:
+                    parts = line.rstrip('\r\n').split('\t')
+                    if len(parts) != 3:
+                        continue
+                    drawing, step, millisecs = parts
+                    drawing = drawing_key(drawing)
+                    if step == 'start':
+                        timings[drawing] = {}
+                    elif drawing in last:
+                        timings.setdefault(drawing, {})[step] = \
+                            (int(millisecs) - last[drawing]) / 1000.0
+                    last[drawing] = int(millisecs)
+        return timings
+
+
+def print_step_report(report, step_names):
+    """ This function prints the mean and maximum seconds of every step, and
+    the drawing where it was slowest, from the 'steps' of clean_drawings'
+    report.
+    """
+    print('{:<16}  {:>8}  {:>8}  {:>8}  {}'.format(
+        'step', 'drawings', 'mean', 'max', 'slowest drawing'))
+    for name in step_names:
+        seconds = [(entry['steps'][name], entry['drawing'])
+                   for entry in report if name in entry.get('steps', {})]
+        if not seconds:
+            continue
+        slowest, drawing = max(seconds)
+        print('{:<16}  {:>8}  {:>8.2f}  {:>8.2f}  {}'.format(
+            name, len(seconds), sum(s for s, _ in seconds) / len(seconds),
+            slowest, os.path.basename(drawing)))
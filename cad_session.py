@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       cad_session.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  20.1
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module drives the CAD application that standardizes the floor plans
+(see dwg_floorplans_cleaner.py). A session is one running application, it is
+used by a single thread and implements three methods:
+start(commands)          launches the application and sends the commands
+                         to its first drawing (i.e. to load lisp routines)
+run(dwg, commands)       opens the drawing, sends the commands and closes it
+stop()                   quits the application
+An exception raised by run means the session can no longer be trusted, the
+caller stops it and starts a new one. A session factory whose needs_lisp
+attribute is False never reads the lisp files, so they are not copied from
+the share for it. AutoCadComSession runs a headless
+AutoCAD instance over COM, RecordingCad builds fake sessions that only
+record the commands they receive, so the scheduling and retry logic can be
+exercised without AutoCAD (i.e. on Linux).
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import itertools
+import os
+import threading
+import time
+
+"""the COM error AutoCAD returns while it is busy (RPC_E_CALL_REJECTED)"""
+CALL_REJECTED = -2147418111
+
+
+class CadSessionError(Exception):
+    """ A CAD session crashed or stopped responding.
+    """
+
+
+class AutoCadComSession(object):
+    """ This session runs its own AutoCAD process through COM. DispatchEx
+    starts a new instance instead of attaching to the one already open, so
+    several sessions can run at the same time, and the application stays
+    hidden. COM is initialized for the thread that calls start, the session
+    must be used and stopped from that thread.
+
+    Args:
+    prog_id (string) (default = 'AutoCAD.Application') = The COM class of
+    the application, i.e. 'AutoCAD.Application.20.1' to pick a version.
+    visible (boolean) (default = False) = Show the application window.
+    busy_timeout (float) (default = 60) = The seconds a call is retried while
+    AutoCAD rejects it because it is busy.
+
+    Examples:
+    >>> session = AutoCadComSession()
+    >>> session.start(['(vl-load-all "C:/Temp/cu_cad_lisp/dlf.lsp")\\n'])
+    >>> session.run('Z:/FLOORPLANS/0001_01.dwg', ['DLF\\nQSAVE\\n'])
+    >>> session.stop()
+    """
+
+    needs_lisp = True
+
+    def __init__(self, prog_id='AutoCAD.Application', visible=False,
+                 busy_timeout=60):
+        self.prog_id = prog_id
+        self.visible = visible
+        self.busy_timeout = busy_timeout
+        self.acad = None
+        self._com = None
+
+    def _call(self, func, *args):
+        """ This helper method calls a COM method, retrying while AutoCAD is
+        busy.
+        """
+        import pywintypes
+        deadline = time.time() + self.busy_timeout
+        while True:
+            try:
+                return func(*args)
+            except pywintypes.com_error as e:
+                if e.hresult != CALL_REJECTED or time.time() > deadline:
+                    raise
+                time.sleep(0.5)
+
+    def start(self, commands=()):
+        import pythoncom
+        from win32com import client
+        pythoncom.CoInitialize()
+        self._com = pythoncom
+        self.acad = client.DispatchEx(self.prog_id)
+        self._call(setattr, self.acad, 'Visible', self.visible)
+        if commands:
+            doc = self._call(getattr, self.acad, 'ActiveDocument')
+            for command in commands:
+                self._call(doc.SendCommand, command)
+
+    def run(self, dwg, commands):
+        if self.acad is None:
+            raise CadSessionError('the session is not started')
+        doc = self._call(self.acad.Documents.Open,
+                         os.path.abspath(dwg).replace('\\', '/'))
+        try:
+            for command in commands:
+                self._call(doc.SendCommand, command)
+        finally:
+            # the commands save the drawing (QSAVE)
+            self._call(doc.Close, False)
+
+    def stop(self):
+        try:
+            if self.acad is not None:
+                self.acad.Quit()
+        except Exception:
+            # the application may already be gone
+            pass
+        finally:
+            self.acad = None
+            if self._com is not None:
+                self._com.CoUninitialize()
+                self._com = None
+
+
+class RecordingCadSession(object):
+    """ This fake session records the drawings and commands it receives
+    (see RecordingCad).
+    """
+
+    def __init__(self, cad, number):
+        self.cad = cad
+        self.number = number
+        self.started = False
+
+    def start(self, commands=()):
+        self.cad._record(self.number, 'start', None, list(commands))
+        self.started = True
+
+    def run(self, dwg, commands):
+        if not self.started:
+            raise CadSessionError('session {} is not running'.format(
+                self.number))
+        time.sleep(self.cad.seconds)
+        name = os.path.basename(dwg)
+        with self.cad._lock:
+            if self.cad.failures.get(name):
+                self.cad.failures[name] -= 1
+                # a crash leaves the session unusable until it is restarted
+                self.started = False
+                crashed = True
+            else:
+                crashed = False
+        if crashed:
+            self.cad._record(self.number, 'crash', dwg, list(commands))
+            raise CadSessionError('session {} crashed on {}'.format(
+                self.number, name))
+        self.cad._record(self.number, 'run', dwg, list(commands))
+
+    def stop(self):
+        self.started = False
+        self.cad._record(self.number, 'stop', None, None)
+
+
+class RecordingCad(object):
+    """ This fake CAD application is a session factory (it can be passed
+    wherever AutoCadComSession is), all the sessions it creates write to the
+    same log.
+
+    Args:
+    seconds (float) (default = 0) = The time every drawing takes.
+    failures (dict) (default = None) = {drawing file name: n}, the session
+    crashes the first n times it runs that drawing.
+
+    Examples:
+    >>> cad = RecordingCad(failures={'0001_01.dwg': 1})
+    >>> report = clean_drawings(dwgs, cad, workers=3)
+    >>> cad.drawings()
+    ['0001_01.dwg', '0001_02.dwg', '0002_01.dwg']
+    """
+
+    # the fake sessions only record the lisp paths
+    needs_lisp = False
+
+    def __init__(self, seconds=0, failures=None):
+        self.seconds = seconds
+        self.failures = dict(failures or {})
+        self.log = []
+        self._lock = threading.Lock()
+        self._numbers = itertools.count(1)
+
+    def __call__(self):
+        with self._lock:
+            number = next(self._numbers)
+        return RecordingCadSession(self, number)
+
+    def _record(self, session, event, dwg, commands):
+        with self._lock:
+            self.log.append({'session': session, 'event': event,
+                             'drawing': dwg, 'commands': commands})
+
+    def sessions(self):
+        """ This method returns the number of sessions started.
+        """
+        return len([e for e in self.log if e['event'] == 'start'])
+
+    def drawings(self):
+        """ This method returns the file names of the drawings that were
+        processed, sorted.
+        """
+        return sorted(os.path.basename(e['drawing']) for e in self.log
+                      if e['event'] == 'run')
@@ -18,19 +18,391 @@ TRansportation Group.
 """
 from __future__ import print_function
 import os
-from subprocess import call
+import itertools
+from binascii import hexlify
+from subprocess import PIPE, Popen
+from multiprocessing.pool import ThreadPool
 import glob
 import ast
+import hashlib
 import inspect
-import StringIO
-import pandas as pd
-from sqlalchemy import create_engine
-from sqlalchemy.sql import text
-import arcpy
+import tempfile
+import threading
+import time
+from sqlalchemy.sql import bindparam, text
+from bulk_loader import PostgresCopySink, bulk_load, quote_identifier
+from excel_cache import ExcelCache
+from file_manifest import Manifest, fingerprint_files, same_content
+from geocode_cache import GeocodeCache
+from map_publisher import ArcpyPublishingBackend, publish_maps
+from pipeline_context import PipelineContext
+from pipeline_runner import PipelineRunner, Stage
+from shapefile_reader import ShapefileReader
+from sql_script import execute_statement, is_session_statement, \
+    parse_sql_file, print_statement_report, run_parallel
+
+# the columns (after renaming) that make up the address sent to the geocoder,
+# in the order they appear in the normalized string 'street, city state zip'
+ADDRESS_COLUMNS = ('address_1', 'city', 'state', 'postal')
+TEXT_TYPE = type(u'')
+
+
+def _decode_utf8(value):
+    """ This helper function decodes a byte string as UTF-8, it returns None
+    when the value is not valid UTF-8.
+    """
+    try:
+        return value.decode('UTF-8')
+    except UnicodeDecodeError:
+        return None
+
+
+def _text_column(series):
+    """ This helper function converts a whole pandas Series to unicode text in
+    one pass.
+
+    Args:
+    series (pandas.Series) = The column that is going to be converted.
+
+    Returns:
+    A tuple (text, reasons), text is a Series of stripped unicode strings and
+    reasons is a Series holding the reason why a cell was rejected (None for
+    valid cells).
+    """
+    import pandas as pd
+    reasons = pd.Series(None, index=series.index, dtype=object)
+    missing = series.isnull()
+    if series.dtype.kind == 'f':
+        # zip codes are read as floats (80309.0) when the column has blanks
+        text = series.astype(TEXT_TYPE)
+        whole = ~missing & (series % 1 == 0)
+        text[whole] = series[whole].astype('int64').astype(TEXT_TYPE)
+    elif series.dtype.kind == 'O':
+        text = series.copy()
+        is_bytes = series.map(lambda value: isinstance(value, bytes))
+        other = ~missing & ~is_bytes
+        text[other] = series[other].astype(TEXT_TYPE)
+        decoded = series[is_bytes].map(_decode_utf8)
+        text[is_bytes] = decoded
+        invalid = decoded[decoded.isnull()].index
+        reasons[invalid] = 'invalid UTF-8 in {}'.format(series.name)
+    else:
+        text = series.astype(TEXT_TYPE)
+    text[missing] = None
+    text = text.str.strip()
+    empty = text.isnull() | (text == u'')
+    reasons[empty & reasons.isnull()] = 'missing {}'.format(series.name)
+    return text, reasons
+
+
+def normalize_addresses(df, columns=ADDRESS_COLUMNS):
+    """ This function builds the address string used by the TIGER geocoder,
+    'street, city state zip', for the whole dataframe at once instead of
+    row by row. Rows with missing or non UTF-8 address parts are not
+    normalized, they are collected in a reject report instead.
+
+    Args:
+    df (pandas.DataFrame) = The employees dataframe, column names must be
+    already formatted (lower case, '_' instead of '/' and ' ').
+    columns (tuple) (default = ADDRESS_COLUMNS) = The street, city, state and
+    zip code column names.
+
+    Returns:
+    A tuple (normalize_addr, rejects), normalize_addr is a Series of strings
+    (None for rejected rows) and rejects is a DataFrame with the rejected
+    rows' address columns and the reason they were rejected.
+
+    Examples:
+    >>> normalize_addr, rejects = normalize_addresses(df)
+    >>> normalize_addr[0]
+    u'1050 Regent Dr, Boulder CO 80309'
+    """
+    import pandas as pd
+    texts = []
+    reason = pd.Series(None, index=df.index, dtype=object)
+    for column in columns:
+        text, reasons = _text_column(df[column])
+        texts.append(text)
+        # keeping the first problem found for every row
+        reason = reason.combine_first(reasons)
+    street, city, state, zipcode = texts
+    normalize_addr = street + u', ' + city + u' ' + state + u' ' + zipcode
+    rejected = reason.notnull()
+    normalize_addr[rejected] = None
+    rejects = df.loc[rejected, list(columns)].copy()
+    rejects['reason'] = reason[rejected]
+    return normalize_addr, rejects
+
+
+def _pipeline_context(context, db, user, password, host, schema,
+                      pool_size=4):
+    """ This helper function returns the shared PipelineContext, or a new one
+    when a step runs on its own (the step disposes it when it is done).
+    """
+    if context is None:
+        context = PipelineContext(db, user, password, host, schema,
+                                  pool_size=pool_size)
+    return context
+
+
+def format_column_names(df):
+    """ This helper function formats the employee data column names in place
+    to make them compatible with ArcMap (lower case, '_' instead of '/' and
+    ' ').
+    """
+    df.rename(columns=lambda x: x.lower(), inplace=True)
+    df.rename(columns=lambda x: x.replace('/', '_'), inplace=True)
+    df.rename(columns=lambda x: x.replace(' ', '_'), inplace=True)
+    return df
+
+
+def excel_chunks(excel_file, skiprows=1, chunksize=50000):
+    """ This function reads the first sheet of an excel file in chunks of
+    chunksize rows. xlsx files are streamed with openpyxl's read-only mode,
+    so memory use does not grow with the file; other files (or a missing
+    openpyxl) fall back to a full pandas parse that is then sliced.
+
+    Args:
+    excel_file (string) = The path and file name of the excel file.
+    skiprows (int) (default = 1) = The number of rows above the header.
+    chunksize (int) (default = 50000) = The number of rows per chunk.
+
+    Returns:
+    A generator of pandas DataFrames, the index keeps counting across chunks.
+
+    Examples:
+    >>> for df in excel_chunks('cu_employees_data.xlsx'):
+    ...     print(len(df))
+    50000
+    12345
+    """
+    import pandas as pd
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        load_workbook = None
+    if load_workbook is None or not excel_file.lower().endswith('.xlsx'):
+        xl = pd.ExcelFile(excel_file)
+        df = xl.parse(xl.sheet_names[0], skiprows=skiprows)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+    workbook = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows()
+        for _ in range(skiprows):
+            next(rows)
+        header = [cell.value for cell in next(rows)]
+        # the same names pandas gives to blank header cells
+        header = [name if name is not None else 'Unnamed: {}'.format(i)
+                  for i, name in enumerate(header)]
+        batch = []
+        offset = 0
+        for row in rows:
+            values = [cell.value for cell in row]
+            # read-only worksheets report trailing formatted rows as blanks
+            if all(value is None for value in values):
+                continue
+            batch.append(values[:len(header)])
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header,
+                                   index=range(offset, offset + len(batch)))
+                offset += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header,
+                               index=range(offset, offset + len(batch)))
+    finally:
+        workbook.close()
+
+
+def row_hashes(df):
+    """ This function hashes every row of a dataframe (MD5 of the row's text
+    values), the hashes identify which employee rows changed between loads.
+
+    Args:
+    df (pandas.DataFrame) = The normalized employee dataframe.
+
+    Returns:
+    A Series of hexadecimal digests with the same index as df.
+    """
+    joined = None
+    for column in df.columns:
+        values = df[column].astype(TEXT_TYPE)
+        joined = values if joined is None else joined + u'\x1f' + values
+    return joined.map(lambda row: hashlib.md5(row.encode('utf-8')).hexdigest())
+
+
+def _qualified(table, schema):
+    """ This helper function returns the double quoted (schema.)table name.
+    """
+    if schema is None:
+        return quote_identifier(table)
+    return '{}.{}'.format(quote_identifier(schema), quote_identifier(table))
+
+
+def _delete_in(con, table, schema, column, values, batch=1000):
+    """ This helper function deletes the rows whose column value is in values,
+    in batches of batch values.
+    """
+    statement = text('DELETE FROM {} WHERE {} IN :values'.format(
+        _qualified(table, schema), quote_identifier(column))).bindparams(
+            bindparam('values', expanding=True))
+    values = list(values)
+    for start in range(0, len(values), batch):
+        con.execute(statement, {'values': values[start:start + batch]})
+
+
+def delta_load(engine, df, table, schema='public', key_column=None):
+    """ This function refreshes a table with only the rows that changed since
+    the last load. Every row is hashed and the hashes are compared with the
+    manifest table (<table>_manifest) written by the previous load; new rows
+    are inserted, changed rows are replaced and rows that are gone are
+    deleted, all in one transaction. The table gets a row_hash column. If the
+    table or its manifest do not exist, or the columns changed, the table is
+    fully reloaded.
+
+    Args:
+    engine (sqlalchemy.engine.Engine) = The target database engine (or a
+    PipelineContext).
+    df (pandas.DataFrame) = The normalized employee dataframe.
+    table (string) = The name of the target table.
+    schema (string) (default = 'public') = The name of the target schema.
+    key_column (string) (default = None) = A column that identifies an
+    employee (i.e. an employee id). When it is None the row hash is the key,
+    so a changed row is counted as one deletion and one insertion.
+
+    Returns:
+    A dictionary with the number of rows inserted, updated, deleted and
+    unchanged.
+
+    Examples:
+    >>> delta_load(engine, df, 'cu_employees_data', key_column='emplid')
+    {'inserted': 12, 'updated': 3, 'deleted': 5, 'unchanged': 48190}
+    """
+    import pandas as pd
+    manifest_table = '{}_manifest'.format(table)
+    df = df.copy()
+    df['row_hash'] = row_hashes(df)
+    if key_column is None:
+        keys = df['row_hash']
+    else:
+        keys = df[key_column].astype(TEXT_TYPE)
+    duplicated = keys.duplicated(keep='last')
+    if duplicated.any():
+        print('{} duplicated rows were skipped'.format(duplicated.sum()))
+        df = df[~duplicated]
+        keys = keys[~duplicated]
+    manifest = pd.DataFrame({'row_key': keys.values,
+                             'row_hash': df['row_hash'].values})
+    summary = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    with engine.begin() as con:
+        exists = (engine.dialect.has_table(con, table, schema=schema) and
+                  engine.dialect.has_table(con, manifest_table,
+                                           schema=schema))
+        if exists:
+            columns = list(con.execute(text('SELECT * FROM {} LIMIT 0'.format(
+                _qualified(table, schema)))).keys())
+            exists = columns == [str(c) for c in df.columns]
+        if not exists:
+            df.to_sql(table, con, schema=schema, if_exists='replace',
+                      index=False)
+            manifest.to_sql(manifest_table, con, schema=schema,
+                            if_exists='replace', index=False)
+            summary['inserted'] = len(df)
+            return summary
+        stored = pd.read_sql(text('SELECT row_key, row_hash FROM {}'.format(
+            _qualified(manifest_table, schema))), con)
+        stored = stored.set_index('row_key')['row_hash']
+        current = manifest.set_index('row_key')['row_hash']
+        new = current.index.difference(stored.index)
+        gone = stored.index.difference(current.index)
+        common = current.index.intersection(stored.index)
+        changed = common[current[common].values != stored[common].values]
+        stale = gone.union(changed)
+        _delete_in(con, table, schema, 'row_hash', stored[stale].values)
+        _delete_in(con, manifest_table, schema, 'row_key', stale)
+        fresh = keys.isin(new.union(changed)).values
+        df[fresh].to_sql(table, con, schema=schema, if_exists='append',
+                         index=False)
+        manifest[fresh].to_sql(manifest_table, con, schema=schema,
+                               if_exists='append', index=False)
+        summary['inserted'] = len(new)
+        summary['updated'] = len(changed)
+        summary['deleted'] = len(gone)
+        summary['unchanged'] = len(common) - len(changed)
+    return summary
+
+
+def _cast_like(df, dtypes):
+    """ This helper function casts the columns of a chunk to the types of
+    the first chunk, the ones its table was created with. pandas turns an
+    integer column with blanks into floats (80309 into 80309.0), which
+    COPY would reject in an integer column, so those columns become
+    nullable integers (the blanks are written as empty CSV fields).
+    """
+    import pandas as pd
+    for column, dtype in dtypes.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        values = df[column]
+        if dtype.kind in 'iuf':
+            numeric = pd.to_numeric(values, errors='coerce')
+            invalid = numeric.isnull() & values.notnull()
+            if dtype.kind != 'f':
+                invalid |= numeric.notnull() & (numeric % 1 != 0)
+            if invalid.any():
+                raise ValueError('column {} of rows {} does not match the '
+                                 'type of the first chunk ({})'.format(
+                                     column, list(df.index[invalid][:5]),
+                                     dtype))
+            df[column] = numeric.astype(dtype if dtype.kind == 'f' else
+                                        'Int64')
+        elif dtype.kind == 'M':
+            df[column] = pd.to_datetime(values, errors='coerce')
+
+
+def _prepare_employees(frames, reject_report, summary):
+    """ This helper function formats and normalizes employee data chunks, the
+    rejected rows of every chunk are appended to reject_report and counted
+    in summary['rejected']. The chunks after the first one are cast to its
+    column types (see _cast_like).
+    """
+    dtypes = None
+    for df in frames:
+        format_column_names(df)
+        # building the geocoder input column for the whole chunk at once
+        normalize_addr, rejects = normalize_addresses(df)
+        df.insert(12, 'normalize_addr', normalize_addr)
+        if len(rejects):
+            rejects.to_csv(reject_report, encoding='utf-8',
+                           mode='a' if summary['rejected'] else 'w',
+                           header=not summary['rejected'])
+            summary['rejected'] += len(rejects)
+        if dtypes is None:
+            dtypes = df.dtypes
+        else:
+            _cast_like(df, dtypes)
+        summary['rows'] += len(df)
+        yield df
+
+
+def latest_excel_file(cu_ed_loc):
+    """ This function returns the file name of the latest employee data
+    excel file in a folder, the employee table is named after it.
+    """
+    # grabbing the latest excel file in directory, in certain os, max
+    # must be changed to min
+    latest = max(glob.glob(os.path.join(cu_ed_loc, '*.xlsx')),
+                 key=os.path.getctime)
+    return os.path.basename(latest)
 
 
 def employees_to_postgresql(db, user, password, host='localhost',
-                            schema='public', cu_ed_loc=os.getcwd()):
+                            schema='public', cu_ed_loc=os.getcwd(),
+                            load_mode='replace', sink=None,
+                            chunksize=50000, key_column=None, context=None,
+                            cache=None):
     """ This function grabs the employee data provided by the sustainable
     transportation group (excel file) and import it into a PostgreSQL
     database. The format of the excel file was previously agreed on.
@@ -50,66 +422,256 @@ def employees_to_postgresql(db, user, password, host='localhost',
     schema.
     cu_ed_loc (string) = The path for the folder that contains the cu employees
     data information (excel files).
+    load_mode (string) (default = 'replace') = 'replace' writes the whole
+    dataframe with DataFrame.to_sql, 'copy' streams the excel sheet in chunks
+    through PostgreSQL COPY FROM STDIN (see bulk_loader.py) and 'delta' only
+    inserts, updates and deletes the rows that changed since the last load
+    (see delta_load).
+    sink (object) (default = None) = The bulk_loader sink used by the 'copy'
+    mode, it defaults to a PostgresCopySink on the target database; a
+    SQLiteSink or CSVFileSink can stand in for PostgreSQL.
+    chunksize (int) (default = 50000) = The number of rows per chunk in the
+    'copy' mode.
+    key_column (string) (default = None) = The column that identifies an
+    employee in the 'delta' mode, the whole row is the key when it is None.
+    context (PipelineContext) (default = None) = The database session shared
+    by the pipeline steps (see pipeline_context.py), a new one is created
+    from the connection arguments when it is None.
+    cache (ExcelCache) (default = None) = When given, the parsed sheet is
+    read from this cache (see excel_cache.py) if the excel file did not
+    change, and stored in it otherwise. The copy mode streams the sheet and
+    does not use the cache, a cached sheet is held in memory as a whole.
+
+    Returns:
+    The delta_load summary in the 'delta' mode, None otherwise.
 
     Examples:
     >>> employees_to_postgresql(db_name, db_user, db_password, cu_ed_loc)
     Executing employees_to_postgresql...
     employees_to_postgresql was successfully executed
     """
+    import pandas as pd
     # getting the name of the function programmatically.
     func_name = inspect.currentframe().f_code.co_name
     print('Executing {}... '.format(func_name))
-    original_workspace = os.getcwd()
-    os.chdir(cu_ed_loc)
-    # grabbing the latest excel file in directory, in certain os, max
-    # must be changed to min
-    excel_file = max(glob.glob('*.xlsx'), key=os.path.getctime)
-    xl = pd.ExcelFile(excel_file)
-    sheet = xl.sheet_names[0]
-    # this is done because the source file contains an extra row
-    df = xl.parse(sheet, skiprows=1)
-    # print(df)
-    # formatting column names to make them compatible with ArcMap
-    df.rename(columns=lambda x: x.lower(), inplace=True)
-    df.rename(columns=lambda x: x.replace('/', '_'), inplace=True)
-    df.rename(columns=lambda x: x.replace(' ', '_'), inplace=True)
-    df.insert(12, 'normalize_addr', 'x')
-    for index, row in df.iterrows():
-        try:
-            street = str(df.loc[index, 'address_1']).decode('UTF-8')
-            city = str(df.loc[index, 'city']).decode('UTF-8')
-            state = str(df.loc[index, 'state']).decode('UTF-8')
-            zipcode = str(df.loc[index, 'postal']).decode('UTF-8')
-            # print (type(street), type(city), type(state), type(zipcode))
-            normalize_addr = '{}, {} {} {}'.format(
-                street, city, state, zipcode)
-            df.loc[index, 'normalize_addr'] = normalize_addr
-        except Exception as e:
-            print(street, city, state, zipcode)
-            print(e)
-            """authenticating to the PostgreSQL db by using a URI
-    (Uniform Resource Identifier). This is done to avoid the password
-    prompt in the cmd window.
-    """
-    target_db = 'postgresql://{}:{}@localhost/{}'.format(
-        user, password, db)
-    engine = create_engine(target_db)
+    # absolute paths instead of os.chdir, the working directory is shared
+    # with the pipeline stages that run at the same time
+    excel_name = latest_excel_file(cu_ed_loc)
+    excel_file = os.path.join(cu_ed_loc, excel_name)
     # removing file extension
-    table_name = excel_file[:-5]
-    # writing pandas dataframe to PostgreSQL table
-    df.to_sql(name=table_name, con=engine, if_exists='replace')
-    os.chdir(original_workspace)
-    print('{} was successfully executed'.format(func_name))
-    return
+    table_name = excel_name[:-5]
+    reject_report = os.path.join(cu_ed_loc,
+                                 '{}_rejects.csv'.format(table_name))
+    summary = {'rows': 0, 'rejected': 0}
+    owned = context is None
+    context = _pipeline_context(context, db, user, password, host, schema)
+    try:
+        if load_mode == 'copy':
+            if sink is None:
+                sink = PostgresCopySink(context, table_name, schema)
+            # this is done because the source file contains an extra row,
+            # the chunks are streamed so only one is in memory at a time
+            frames = excel_chunks(excel_file, skiprows=1,
+                                  chunksize=chunksize)
+            bulk_load(_prepare_employees(frames, reject_report, summary), sink)
+        else:
+            # this is done because the source file contains an extra row
+            if cache is None:
+                xl = pd.ExcelFile(excel_file)
+                sheet = xl.sheet_names[0]
+                frames = [xl.parse(sheet, skiprows=1)]
+            else:
+                frames = [cache.parse(excel_file, skiprows=1)]
+            for df in _prepare_employees(frames, reject_report, summary):
+                if load_mode == 'delta':
+                    delta = delta_load(context, df, table_name, schema,
+                                       key_column)
+                    print('{inserted} inserted, {updated} updated, '
+                          '{deleted} deleted, {unchanged} unchanged '
+                          'rows'.format(**delta))
+                else:
+                    # writing pandas dataframe to PostgreSQL table
+                    with context.begin() as con:
+                        df.to_sql(name=table_name, con=con,
+                                  if_exists='replace')
+        if summary['rejected']:
+            print('{} rows could not be normalized, see {}'.format(
+                summary['rejected'], reject_report))
+        print('{} employee rows loaded into {}'.format(summary['rows'],
+                                                       table_name))
+        print('{} was successfully executed'.format(func_name))
+        if load_mode == 'delta':
+            return delta
+        return
+    finally:
+        # a context created for this call only
+        if owned:
+            context.dispose()
+
+
+def _shp_column_type(kind, length, decimals):
+    """ This helper function maps a dbf field to a PostgreSQL column type the
+    same way shp2pgsql does.
+    """
+    if kind == 'C':
+        return 'varchar({})'.format(length)
+    if kind == 'N' and decimals == 0:
+        return 'int4' if length < 10 else 'int8' if length < 19 else 'numeric'
+    if kind in ('N', 'F'):
+        return 'float8'
+    if kind == 'D':
+        return 'date'
+    if kind == 'L':
+        return 'boolean'
+    return 'varchar'
+
+
+def load_shp_native(engine, shp_full_path, schema='public', srid='26913',
+                    batch_size=5000):
+    """ This function imports a shapefile into PostGIS without shp2pgsql and
+    psql, the shapefile is read in batches (see shapefile_reader.py) that
+    are streamed to COPY FROM STDIN. Like 'shp2pgsql -d' the table is
+    dropped and recreated, it is named after the shapefile (lower case) and
+    has a gid serial key and a geom column.
+
+    Args:
+    engine (sqlalchemy.engine.Engine) = The target database engine (or a
+    PipelineContext).
+    shp_full_path (string) = The path and file name of the shapefile.
+    schema (string) (default = 'public') = The name of the target schema.
+    srid (string) (default = '26913') = The Spatial Reference System
+    Identifier (SRID) of the geometries.
+    batch_size (int) (default = 5000) = The number of records per COPY.
+
+    Returns:
+    The number of records imported.
+
+    Examples:
+    >>> load_shp_native(engine, 'C:/CU_ED_SHP/buildings.shp')
+    1287
+    """
+    import pandas as pd
+    table = os.path.basename(shp_full_path)[:-4].lower()
+    with ShapefileReader(shp_full_path, srid=int(srid)) as reader:
+        columns = []
+        definitions = ['gid serial PRIMARY KEY']
+        for name, kind, length, decimals, _ in reader.fields:
+            name = name.lower()
+            # the same renaming shp2pgsql does for reserved column names
+            if name in ('gid', 'geom'):
+                name = '__{}'.format(name)
+            columns.append(name)
+            definitions.append('{} {}'.format(
+                quote_identifier(name),
+                _shp_column_type(kind, length, decimals)))
+        geometry_type = reader.geometry_type + ('Z' if reader.has_z else '')
+        definitions.append('geom geometry({}, {})'.format(geometry_type,
+                                                          int(srid)))
+        ddl = 'CREATE TABLE {} ({})'.format(_qualified(table, schema),
+                                            ', '.join(definitions))
+        columns.append('geom')
+        sink = PostgresCopySink(engine, table, schema, index=False, ddl=ddl)
+        # an empty first chunk creates the table even without records
+        frames = itertools.chain(
+            [pd.DataFrame([], columns=columns, dtype=object)],
+            (pd.DataFrame([attributes + [None if geometry is None else
+                                         hexlify(geometry).decode('ascii')]
+                           for geometry, attributes in batch],
+                          columns=columns, dtype=object)
+             for batch in reader.batches(batch_size)))
+        return bulk_load(frames, sink)
+
+
+def run_pipeline(commands, timeout=None):
+    """ This function runs a list of commands as a pipeline (the output of
+    every command is piped to the next one) without going through a shell.
+    The pipeline is killed when it runs longer than timeout seconds.
+
+    Args:
+    commands (list) = A list of argument lists, i.e.
+    [['shp2pgsql', 'buildings.shp'], ['psql', uri]].
+    timeout (float) (default = None) = The maximum number of seconds.
+
+    Returns:
+    A tuple (returncode, error), returncode is the first non zero exit code
+    in the pipeline (0 when all of them succeeded, None when it timed out,
+    127 when a command could not be started) and error is the tail of the
+    commands' standard error.
+    """
+    devnull = open(os.devnull, 'w')
+    stderr = tempfile.TemporaryFile()
+    processes = []
+    try:
+        stdin = None
+        for i, command in enumerate(commands):
+            last = i == len(commands) - 1
+            try:
+                process = Popen(command, stdin=stdin,
+                                stdout=devnull if last else PIPE,
+                                stderr=stderr)
+            except OSError as e:
+                # i.e. the command is not on the PATH, the commands already
+                # started are stopped
+                if stdin is not None:
+                    stdin.close()
+                for p in processes:
+                    if p.poll() is None:
+                        p.kill()
+                    p.wait()
+                return 127, '{} could not be started: {}'.format(command[0],
+                                                                 e)
+            if stdin is not None:
+                # the upstream process gets SIGPIPE if this one exits early
+                stdin.close()
+            stdin = process.stdout
+            processes.append(process)
+        deadline = None if timeout is None else time.time() + timeout
+        while any(p.poll() is None for p in processes):
+            if deadline is not None and time.time() > deadline:
+                for p in processes:
+                    if p.poll() is None:
+                        p.kill()
+                    p.wait()
+                return None, 'timed out after {} s'.format(timeout)
+            time.sleep(0.05)
+        returncode = next((p.returncode for p in processes
+                           if p.returncode != 0), 0)
+        stderr.seek(0)
+        error = stderr.read()[-1000:].decode('utf-8', 'replace').strip()
+        return returncode, error
+    finally:
+        devnull.close()
+        stderr.close()
+
+
+def _print_import_report(report):
+    """ This helper function prints the per-layer import timings and exit
+    codes.
+    """
+    width = max([len(r['layer']) for r in report] + [5])
+    print('{:<{w}}  {:>7}  {:>9}'.format('layer', 'exit', 'seconds',
+                                         w=width))
+    for r in report:
+        print('{:<{w}}  {:>7}  {:>9.2f}'.format(
+            r['layer'], 'skipped' if r['skipped'] else 'timeout'
+            if r['returncode'] is None else r['returncode'], r['seconds'],
+            w=width))
+        if r['returncode'] != 0 and r['error']:
+            print('    {}'.format(r['error'].splitlines()[-1]))
 
 
 def load_shps_to_postgresql(db, user, password,
                             host='localhost', schema='public',
                             postg_vers='9.4', srid='26913',
-                            shp_loc=os.getcwd()):
+                            shp_loc=os.getcwd(), workers=4, timeout=3600,
+                            shp2pgsql=None, psql=None, loader='shp2pgsql',
+                            force=False, manifest_path=None, context=None):
     """ This function reads the shapefiles in a folder and programmatically
     import them into a spatially enabled database . A PostGIS PostgreSQL
-    database is required for the function to properly work.
+    database is required for the function to properly work. Several
+    shp2pgsql | psql pipelines run at the same time, a failing layer does not
+    stop the others. Layers whose .shp, .dbf, .prj and .shx files did not
+    change since their last successful import are skipped.
 
     Args:
     db (string) = A string that represents the name of the target
@@ -135,6 +697,31 @@ def load_shps_to_postgresql(db, user, password,
     path for the folder that contains the shapefiles that are going to be
     imported into the PostgreSQL database. It defaults to the current python
     directory.
+    workers (int) (default = 4) = The number of imports that run at the same
+    time.
+    timeout (float) (default = 3600) = The maximum number of seconds a single
+    import can take, None means no limit.
+    shp2pgsql (string) (default = None) = The path of the shp2pgsql
+    executable. It defaults to the PostgreSQL postg_vers bin folder on
+    Windows and to 'shp2pgsql' (found on the PATH) elsewhere.
+    psql (string) (default = None) = The path of the psql executable, with
+    the same defaults as shp2pgsql.
+    loader (string) (default = 'shp2pgsql') = 'shp2pgsql' runs the PostGIS
+    command line tools, 'native' reads the shapefiles in-process and streams
+    them to COPY (see load_shp_native), no PostgreSQL executables are needed
+    and timeout does not apply.
+    force (boolean) (default = False) = Import every layer, even the ones the
+    manifest reports as unchanged.
+    manifest_path (string) (default = None) = The JSON manifest with the size,
+    modification time and hash of the imported files (see file_manifest.py),
+    it defaults to .shp_manifest.json in shp_loc.
+    context (PipelineContext) (default = None) = The database session shared
+    by the pipeline steps, the 'native' loader checks its connections out of
+    it (shp2pgsql | psql pipelines always open their own connection).
+
+    Returns:
+    A list with one dictionary per shapefile (layer, returncode, seconds,
+    error and skipped), returncode is None when the import timed out.
 
     Examples:
     >>> load_shps_to_postgresql(db_name, db_user, db_password, cu_ed_loc)
@@ -144,41 +731,145 @@ def load_shps_to_postgresql(db, user, password,
     # getting the name of the function programmatically.
     func_name = inspect.currentframe().f_code.co_name
     print('Executing {}... '.format(func_name))
-    os.chdir(shp_loc)
-    shp_list = glob.glob('*.shp')
-    shp2pgsql = "C:\Program Files\PostgreSQL\{0}\\bin\shp2pgsql.exe".format(
-        postg_vers)
-    psql = "C:\Program Files\PostgreSQL\{0}\\bin\psql.exe".format(
-        postg_vers)
+    shp_list = sorted(glob.glob(os.path.join(shp_loc, '*.shp')))
+    if os.name == 'nt':
+        bin_folder = 'C:\\Program Files\\PostgreSQL\\{0}\\bin'.format(
+            postg_vers)
+        shp2pgsql = shp2pgsql or os.path.join(bin_folder, 'shp2pgsql.exe')
+        psql = psql or os.path.join(bin_folder, 'psql.exe')
+    else:
+        shp2pgsql = shp2pgsql or 'shp2pgsql'
+        psql = psql or 'psql'
     """authenticating to the PostgreSQL db by using a URI
     (Uniform Resource Identifier).
     """
     postgresql_uri = "postgresql://{0}:{1}@{2}/{3}".format(user, password,
                                                            host, db)
-    for shp in shp_list:
-        """this line works even though the psql and PostgreSQL windows
-        enviromental variables are not set.
-        """
-        shp_full_path = '{0}\{1}'.format(shp_loc, shp)
+    owned = loader == 'native' and context is None
+    if loader == 'native':
+        context = _pipeline_context(context, db, user, password, host,
+                                    schema)
+
+    def import_shp(shp_full_path):
         """ the cmd postgis syntax for importing shps to PostgreSQL is as
         follows:
         shp2pgsql -s 4326 -d neighborhoods public.neighborhoods |
         psql -h myserver -d mydb -U myuser
         """
-        # the call to executables inside the cmd should be double quoted
-        command = '''"{0}" -s {1} -d {2} {3}.{4} | "{5}" "{6}"'''.format(
-            shp2pgsql, srid, shp_full_path, schema, shp[:-4], psql,
-            postgresql_uri)
-        # this part sends the command to the windows command prompt (cmd)
-        call(command, shell=True)
+        layer = os.path.basename(shp_full_path)[:-4]
+        start = time.time()
+        if loader == 'native':
+            try:
+                load_shp_native(context, shp_full_path, schema, srid)
+                returncode, error = 0, ''
+            except Exception as e:
+                returncode, error = 1, str(e)
+        else:
+            try:
+                # ON_ERROR_STOP makes psql exit with an error code on SQL
+                # errors
+                returncode, error = run_pipeline(
+                    [[shp2pgsql, '-s', str(srid), '-d', shp_full_path,
+                      '{0}.{1}'.format(schema, layer)],
+                     [psql, '-q', '-v', 'ON_ERROR_STOP=1', postgresql_uri]],
+                    timeout)
+            except Exception as e:
+                # one layer must not abort the others
+                returncode, error = 1, str(e)
+        return {'layer': layer, 'returncode': returncode,
+                'seconds': time.time() - start, 'error': error,
+                'skipped': False}
+
+    manifest = Manifest(manifest_path or
+                        os.path.join(shp_loc, '.shp_manifest.json'))
+    entries = {}
+    pending = []
+    skipped = []
+    for shp_full_path in shp_list:
+        layer = os.path.basename(shp_full_path)[:-4]
+        # the same files in another database or srid are a different import
+        key = '{0}/{1}/{2}.{3}'.format(host, db, schema, layer)
+        previous = manifest.get(key) or {}
+        layer_files = [shp_full_path[:-4] + ext for ext in
+                       ('.shp', '.dbf', '.prj', '.shx')
+                       if os.path.exists(shp_full_path[:-4] + ext)]
+        entries[layer] = (key, {'srid': str(srid), 'files': fingerprint_files(
+            layer_files, previous.get('files'))})
+        if not force and previous.get('srid') == str(srid) and \
+                same_content(entries[layer][1]['files'],
+                             previous.get('files')):
+            skipped.append({'layer': layer, 'returncode': 0, 'seconds': 0.0,
+                            'error': '', 'skipped': True})
+        else:
+            pending.append(shp_full_path)
+    pool = ThreadPool(max(1, min(workers, len(pending))))
+    try:
+        report = pool.map(import_shp, pending)
+    finally:
+        pool.close()
+        pool.join()
+        # a context created for this call only
+        if owned:
+            context.dispose()
+    for r in report:
+        if r['returncode'] == 0:
+            manifest.set(*entries[r['layer']])
+    manifest.save()
+    report = sorted(report + skipped, key=lambda r: r['layer'])
+    _print_import_report(report)
+    if skipped:
+        print('{} unchanged shapefiles were skipped'.format(len(skipped)))
+    failed = [r['layer'] for r in report if r['returncode'] != 0]
+    if failed:
+        print('{} of {} shapefiles failed: {}'.format(
+            len(failed), len(report), ', '.join(failed)))
     print('{} was successfully executed'.format(func_name))
-    return
+    return report
+
+
+def _run_sql_parallel(context, statements, workers):
+    """ This helper function runs a script's statements with
+    sql_script.run_parallel, every worker thread keeps its own connection and
+    replays the session statements (SET search_path...) that precede the
+    statement it is about to run.
+    """
+    session = [i for i, statement in enumerate(statements)
+               if is_session_statement(statement)]
+    local = threading.local()
+    connections = []
+    lock = threading.Lock()
+
+    def execute(index, statement):
+        if not hasattr(local, 'con'):
+            local.con = context.connect()
+            local.applied = set()
+            with lock:
+                connections.append(local.con)
+        for i in session:
+            if i < index and i not in local.applied:
+                with local.con.begin():
+                    execute_statement(local.con, statements[i])
+                local.applied.add(i)
+        with local.con.begin():
+            rowcount = execute_statement(local.con, statement)
+        local.applied.add(index)
+        return rowcount
+
+    try:
+        return run_parallel(statements, execute, workers)
+    finally:
+        for con in connections:
+            con.close()
 
 
 def run_sql_on_db(db, user, password, sql_script_loc, host='localhost',
-                  schema='public'):
+                  schema='public', transaction=True, savepoints=False,
+                  workers=1, context=None):
     """ This function executes SQL scripts against a  PostgreSQL database, the
-    function can handle comments of the type '--' and multiline SQL statements.
+    function can handle comments ('--' and '/* */'), string literals, dollar
+    quoted function bodies and multiline SQL statements (see sql_script.py).
+    By default the whole script runs in one transaction, the first failing
+    statement rolls it back.
 
     Args:
     db (string) = A string that represents the name of the target PostgreSQL
@@ -193,41 +884,232 @@ def run_sql_on_db(db, user, password, sql_script_loc, host='localhost',
     where the PosgreSQL service was instantiated.
     schema (string) (default = 'public') = A string that represents the name of
     the target PostgreSQL schema.
+    transaction (boolean) (default = True) = Run the script in one
+    transaction, when False every statement is committed on its own and a
+    failing statement does not stop the script.
+    savepoints (boolean) (default = False) = Run every statement inside a
+    savepoint, a failing statement is rolled back on its own and the script
+    goes on (only used when transaction is True).
+    workers (int) (default = 1) = When it is greater than 1, the statements
+    that do not depend on each other (see sql_script.run_parallel) run at the
+    same time on a pool of workers connections. Every statement is then
+    committed on its own and transaction and savepoints are ignored; SET
+    statements are replayed on every connection.
+    context (PipelineContext) (default = None) = The database session shared
+    by the pipeline steps (see pipeline_context.py), a new one is created
+    from the connection arguments when it is None.
+
+    Returns:
+    A list with one dictionary per statement (statement, seconds, rowcount,
+    status and error), status is 'ok', 'failed', 'skipped' (not run after a
+    failure) or 'undone' (rolled back with the transaction).
 
     Examples:
     >>> run_sql_on_db(db_name, db_user, db_password,ed_format)
     Executing run_sql_on_db...
-    SET SEARCH PATH public, tiger, tiger.data was successfully executed
-    SELECT * FROM cu_employees_data WHERE state='CO'
+       #    seconds       rows  statement
+       1      0.002         -1  SET search_path = public, tiger, tiger.data
+       2     12.481      48210  UPDATE cu_employees_data SET geom = ...
     run_sql_on_db was successfully executed
     """
-    """authenticating to the PostgreSQL db by using a URI
-    (Uniform Resource Identifier).
+    # getting the name of the function programmatically.
+    func_name = inspect.currentframe().f_code.co_name
+    print('Executing {}... '.format(func_name))
+    owned = context is None
+    context = _pipeline_context(context, db, user, password, host, schema,
+                                pool_size=max(1, workers))
+    try:
+        statements = parse_sql_file(sql_script_loc)
+        if workers > 1:
+            report = _run_sql_parallel(context, statements, workers)
+            print_statement_report(report)
+            failed = [entry for entry in report if entry['status'] != 'ok']
+            if failed:
+                print('{} of {} statements were not executed'.format(
+                    len(failed), len(report)))
+            print('{} was successfully executed'.format(func_name))
+            return report
+        report = [{'statement': statement, 'seconds': 0.0, 'rowcount': None,
+                   'status': 'skipped', 'error': ''}
+                  for statement in statements]
+        failed = False
+        with context.connect() as con:
+            trans = con.begin() if transaction else None
+            for entry in report:
+                start = time.time()
+                try:
+                    if trans is None:
+                        with con.begin():
+                            entry['rowcount'] = execute_statement(
+                                con, entry['statement'])
+                    elif savepoints:
+                        with con.begin_nested():
+                            entry['rowcount'] = execute_statement(
+                                con, entry['statement'])
+                    else:
+                        entry['rowcount'] = execute_statement(
+                            con, entry['statement'])
+                    entry['status'] = 'ok'
+                except Exception as e:
+                    entry['status'] = 'failed'
+                    entry['error'] = str(e)
+                    failed = True
+                entry['seconds'] = time.time() - start
+                # a failed statement aborts the whole transaction
+                if failed and trans is not None and not savepoints:
+                    break
+            if trans is not None:
+                if failed and not savepoints:
+                    trans.rollback()
+                    for entry in report:
+                        if entry['status'] == 'ok':
+                            entry['status'] = 'undone'
+                else:
+                    trans.commit()
+        print_statement_report(report)
+        if failed:
+            print('{} could not be fully executed'.format(sql_script_loc))
+        print('{} was successfully executed'.format(func_name))
+        return report
+    finally:
+        # a context created for this call only
+        if owned:
+            context.dispose()
+
+
+def geocode_employees(db, user, password, table, cache_loc, host='localhost',
+                      schema='public', workers=4, context=None):
+    """ This function geocodes the employee table with the TIGER geocoder,
+    going through a persistent cache keyed on normalize_addr (see
+    geocode_cache.py); only the addresses that are not cached are sent to
+    the geocoder. The results are written to the lon, lat (NAD83) and rating
+    columns of the table, the columns are added when they are missing. The
+    formatting script can then build the geometries from lon and lat.
+
+    Args:
+    db (string) = A string that represents the name of the target PostgreSQL
+    database.
+    user (string) = A string that represents the user name for the target
+    PostgreSQL database.
+    password (string) = A string that represents the corresponding user
+    password.
+    table (string) = The name of the employee table (see
+    employees_to_postgresql).
+    cache_loc (string) = The path and file name of the SQLite cache.
+    host (string) (default = 'localhost') = A string that represents the port
+    where the PosgreSQL service was instantiated.
+    schema (string) (default = 'public') = A string that represents the name of
+    the target PostgreSQL schema.
+    workers (int) (default = 4) = The number of addresses geocoded at the
+    same time.
+    context (PipelineContext) (default = None) = The database session shared
+    by the pipeline steps, a new one is created from the connection
+    arguments when it is None.
+
+    Returns:
+    A dictionary with the number of addresses, cache hits, misses, matched
+    misses, errors and the hit rate. An address whose geocode call failed
+    gets no rating and is not cached.
+
+    Examples:
+    >>> geocode_employees(db_name, db_user, db_password, 'cu_employees_data',
+    ...                   'C:/cu_employees_data/.geocode_cache.sqlite')
+    Executing geocode_employees...
+    48210 addresses, 48102 cached (99.8%), 108 geocoded (101 matched, 0
+    errors)
+    geocode_employees was successfully executed
     """
     # getting the name of the function programmatically.
     func_name = inspect.currentframe().f_code.co_name
     print('Executing {}... '.format(func_name))
-    target_db = 'postgresql://{}:{}@{}/{}?currentSchema={}'.format(
-        user, password, host, db, schema)
-    engine = create_engine(target_db)
-    sql_script = StringIO.StringIO()
-    # removing comments from SQL code ('--')
-    with open(sql_script_loc, 'r') as sql:
-        for line in sql:
-            if not line.startswith('-'):
-                sql_script.write(line)
-    sql_commands = sql_script.getvalue()
-    # all SQL commands (split on ';')
-    sql_commands = sql_commands.split(';')
-    with engine.connect() as con:
-        for command in sql_commands:
-            if command not in ('', '\n', '\n\n'):
+    owned = context is None
+    context = _pipeline_context(context, db, user, password, host, schema,
+                                pool_size=max(1, workers))
+    try:
+        qualified = _qualified(table, schema)
+        with context.begin() as con:
+            columns = list(con.execute(text('SELECT * FROM {} LIMIT 0'.format(
+                qualified))).keys())
+            for column, kind in (('lon', 'float8'), ('lat', 'float8'),
+                                 ('rating', 'integer')):
+                if column not in columns:
+                    con.execute(text('ALTER TABLE {} ADD COLUMN {} {}'.format(
+                        qualified, column, kind)))
+            addresses = [row[0] for row in con.execute(text(
+                'SELECT DISTINCT normalize_addr FROM {} '
+                'WHERE normalize_addr IS NOT NULL'.format(qualified)))]
+        cache = GeocodeCache(cache_loc)
+        try:
+            results = cache.lookup(addresses)
+            misses = [a for a in addresses if a not in results]
+            local = threading.local()
+            connections = []
+
+            def geocode(address):
                 try:
-                    con.execute(text(command))
-                    print('{} was successfully executed'.format(command))
+                    if not hasattr(local, 'con'):
+                        local.con = context.connect()
+                        connections.append(local.con)
+                    # one transaction per address, a failure rolls back only
+                    # that address and the connection stays usable
+                    with local.con.begin():
+                        # the best match only (geocode(address, 1))
+                        row = local.con.execute(text(
+                            'SELECT ST_X(g.geomout), ST_Y(g.geomout), '
+                            'g.rating FROM geocode(:address, 1) AS g'),
+                            {'address': address}).fetchone()
                 except Exception as e:
-                    print(e)
-    return
+                    print('{} could not be geocoded: {}'.format(address, e))
+                    return address, None
+                return address, tuple(row) if row else (None, None, None)
+
+            pool = ThreadPool(max(1, min(workers, len(misses))))
+            try:
+                geocoded = dict(pool.map(geocode, misses))
+            finally:
+                pool.close()
+                pool.join()
+                for con in connections:
+                    con.close()
+            # the failed addresses are not cached, the next run retries them
+            errors = [a for a, result in geocoded.items() if result is None]
+            for address in errors:
+                geocoded[address] = (None, None, None)
+            cache.store(dict((a, result) for a, result in geocoded.items()
+                             if a not in errors))
+            results.update(geocoded)
+            cache.evict()
+            hit_rate = cache.hit_rate()
+        finally:
+            cache.close()
+        with context.begin() as con:
+            con.execute(text('CREATE TEMP TABLE geocoded (normalize_addr '
+                             'text, lon float8, lat float8, rating integer) '
+                             'ON COMMIT DROP'))
+            rows = [{'address': a, 'lon': lon, 'lat': lat, 'rating': rating}
+                    for a, (lon, lat, rating) in results.items()]
+            if rows:
+                con.execute(text('INSERT INTO geocoded VALUES '
+                                 '(:address, :lon, :lat, :rating)'), rows)
+            con.execute(text(
+                'UPDATE {} AS t SET lon = g.lon, lat = g.lat, '
+                'rating = g.rating FROM geocoded AS g '
+                'WHERE t.normalize_addr = g.normalize_addr'
+                .format(qualified)))
+        summary = {'addresses': len(addresses), 'hits': len(addresses) -
+                   len(misses), 'misses': len(misses),
+                   'matched': sum(1 for r in geocoded.values()
+                                  if r[0] is not None),
+                   'errors': len(errors), 'hit_rate': hit_rate}
+        print('{addresses} addresses, {hits} cached ({0:.1%}), {misses} '
+              'geocoded ({matched} matched, {errors} errors)'.format(
+                  hit_rate, **summary))
+        print('{} was successfully executed'.format(func_name))
+        return summary
+    finally:
+        # a context created for this call only
+        if owned:
+            context.dispose()
 
 
 def sdd_drafter(mxd_loc, sdd_out_loc, portal='MY_HOSTED_SERVICES'):
@@ -244,7 +1126,8 @@ def sdd_drafter(mxd_loc, sdd_out_loc, portal='MY_HOSTED_SERVICES'):
     My Hosted Services server type for ArcGIS Online or Portal for ArcGIS.
 
     Returns:
-    A sdd object, draft service definition File, (i.e. mymap.sd).
+    The path of the Service Definition Draft file (i.e. mymap.sddraft), None
+    when the draft could not be created.
 
     Examples:
     >>> sdd_drafter(mxd_loc, sdd_outloc)
@@ -252,19 +1135,21 @@ def sdd_drafter(mxd_loc, sdd_out_loc, portal='MY_HOSTED_SERVICES'):
     sdd_drafter was successfully executed
     """
     # getting the name of the function programmatically.
+    import arcpy
     func_name = inspect.currentframe().f_code.co_name
     print('Executing {}... '.format(func_name))
     map_document = arcpy.mapping.MapDocument(mxd_loc)
     service_name = os.path.basename(mxd_loc)[:-4]
-    sddraft = '{}/{}.sddraft'.format(sd_out_loc, service_name)
+    sddraft = '{}/{}.sddraft'.format(sdd_out_loc, service_name)
     try:
-        sdd_obj = arcpy.mapping.CreateMapSDDraft(
-            map_document, sddraft, service_name, portal)
+        arcpy.mapping.CreateMapSDDraft(map_document, sddraft, service_name,
+                                       portal)
         print('{} was successfully executed'. format(func_name))
     except Exception as e:
         print(e.args[0])
         print(arcpy.GetMessages())
-    return sdd_obj
+        return None
+    return sddraft
 
 
 def agol_publisher(sdd, out_name, groups, sd_out_loc=os.getcwd(),
@@ -274,7 +1159,7 @@ def agol_publisher(sdd, out_name, groups, sd_out_loc=os.getcwd(),
 
     Args:
     sdd (string) = A string that represents the path and file name for the
-    mxd document.
+    Service Definition Draft (.sddraft) file returned by sdd_drafter.
     out_name (string) = A string that represents the name for the output  sd
     file, Service Definition File.
     groups (list) = A list of group names with which to share the service.
@@ -290,6 +1175,7 @@ def agol_publisher(sdd, out_name, groups, sd_out_loc=os.getcwd(),
     agol_publisher was successfully executed
     """
     # getting the name of the function programmatically.
+    import arcpy
     func_name = inspect.currentframe().f_code.co_name
     print('Executing {}... '.format(func_name))
     try:
@@ -311,31 +1197,75 @@ if __name__ == '__main__':
     db_name = login_dict['dbname']
     db_user = login_dict['dbuser']
     db_password = login_dict['dbpassword']
+    # one pooled database session is shared by all the steps
+    context = PipelineContext(db_name, db_user, db_password)
+    context.warm_up()
     # employees data folder location
     cu_ed_loc = '/cu_employees_data'
-    employees_to_postgresql(db_name, db_user, db_password, cu_ed_loc)
     # shapes folder location
     shp_loc = '\CU_ED_SHP'
-    load_shps_to_postgresql(db_name, db_user, db_password, shp_loc=shp_loc)
-    # path to the sql script that prepares the database
+    # path to the sql script that prepares the database, the TIGER geocoder
+    # results are already in the lon, lat and rating columns (see
+    # geocode_employees)
     ed_format = '\CU_ED_SQL' \
         '\cu_employees_data_formatting.sql'
-    # running tiger geocoder
-    run_sql_on_db(db_name, db_user, db_password, ed_format)
-    # path to the sql script that creates the analysis
+    # path to the sql script that creates the analysis (buffers)
     ed_map_lyr = '\CU_ED_SQL' \
         '\cu_ed_map_layers.sql'
-    # running buffers
-    run_sql_on_db(db_name, db_user, db_password, ed_map_lyr)
-    # path to the mxd file that serves as
-    mxd_loc = '/CU_ED_MXD/' \
-        'sustainable_transportation_webmap.mxd'
-    # location for the sdd (draft) file
+    # the mxd files that serve as web maps, they are published as a batch
+    mxd_loc = '/CU_ED_MXD/*.mxd'
+    # location for the sdd (draft) and sd files
     sdd_outloc = ''
-    sd_out_loc = ''
-    # this function defaults to 'MY_HOSTED_SERVICES'
-    sdd = sdd_drafter(mxd_loc, sdd_outloc)
-    agol_user = login_dict['agoluser']
-    agol_password = login_dict['agolpassword']
-    # this function defaults to 'MY_HOSTED_SERVICES'
-    agol_publisher(sdd, 'test', 'group', sd_out_loc)
+    employees_table = latest_excel_file(cu_ed_loc)[:-5]
+
+    def failed_statements(report):
+        failed = [e for e in report if e['status'] == 'failed']
+        return '{} statements failed'.format(len(failed)) if failed else ''
+
+    def failed_layers(report):
+        failed = [e['layer'] for e in report if e['returncode'] != 0]
+        return 'failed layers: {}'.format(', '.join(failed)) if failed else ''
+
+    def failed_maps(report):
+        failed = [e['map'] for e in report if e['status'] != 'ok']
+        return 'failed maps: {}'.format(', '.join(failed)) if failed else ''
+
+    # every stage is skipped when its inputs and the stages it waits for did
+    # not change since its last successful run, a failed run resumes at the
+    # failed stage. The employee ingest and the shapefile load run at the
+    # same time.
+    stages = [
+        Stage('ingest', employees_to_postgresql,
+              (db_name, db_user, db_password),
+              {'cu_ed_loc': cu_ed_loc, 'context': context,
+               'cache': ExcelCache(os.path.join(cu_ed_loc, '.excel_cache'))},
+              inputs=[os.path.join(cu_ed_loc, employees_table + '.xlsx')]),
+        Stage('load_shp', load_shps_to_postgresql,
+              (db_name, db_user, db_password),
+              {'shp_loc': shp_loc, 'context': context},
+              inputs=[os.path.join(shp_loc, '*.{}'.format(extension))
+                      for extension in ('shp', 'shx', 'dbf', 'prj')],
+              check=failed_layers),
+        # geocoding only the addresses that are not in the cache
+        Stage('geocode', geocode_employees,
+              (db_name, db_user, db_password, employees_table,
+               os.path.join(cu_ed_loc, '.geocode_cache.sqlite')),
+              {'context': context}, after=['ingest']),
+        Stage('format', run_sql_on_db,
+              (db_name, db_user, db_password, ed_format),
+              {'context': context}, inputs=[ed_format],
+              after=['geocode', 'load_shp'], check=failed_statements),
+        Stage('map_layers', run_sql_on_db,
+              (db_name, db_user, db_password, ed_map_lyr),
+              {'context': context}, inputs=[ed_map_lyr], after=['format'],
+              check=failed_statements),
+        # this backend defaults to 'MY_HOSTED_SERVICES'
+        Stage('publish', publish_maps,
+              (sorted(glob.glob(mxd_loc)), ArcpyPublishingBackend(['group']),
+               sdd_outloc), inputs=[mxd_loc], after=['map_layers'],
+              check=failed_maps)]
+    runner = PipelineRunner(stages, os.path.join(
+        cu_ed_loc, '.cu_ed_web_map_checkpoints.json'))
+    # resume_from='format' reruns a stage and everything after it
+    runner.run(resume_from=None)
+    context.report()
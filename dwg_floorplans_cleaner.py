@@ -11,13 +11,33 @@ Python Version:   2.7.8
 This script was developed to automate part of the CAD/GIS Office at CU Boulder
 CAD standardization process. The office's current CAD standards can be found at
 http://www.colorado.edu/fm/planning-design-construction/cad-document-management
+The drawings can be processed by several hidden AutoCAD instances at the same
+time, a crashed instance is restarted and its drawing retried. The AutoCAD
+session sits behind the interface described in cad_session.py.
+A manifest (.dwg_manifest.json in the drawings folder) records every drawing
+that was standardized, with its size, modification time and content hash
+after the save and the version of the lisp routines applied, so the next run
+only opens new or modified drawings (see file_manifest.py). The steps of a
+drawing are sent as a single command payload and the lisp routines are
+loaded from local copies once per AutoCAD session, in timed mode the seconds
+of every step are reported (see cad_commands.py).
 --------------------------------------------------------------------------------
 """
 
 from __future__ import print_function
 import os
 import glob
-from win32com import client
+import hashlib
+import time
+from multiprocessing.pool import ThreadPool
+try:
+    from Queue import Empty, Queue
+except ImportError:
+    from queue import Empty, Queue
+from cad_commands import CommandCompiler, drawing_key, print_step_report
+from cad_session import AutoCadComSession
+from file_manifest import Manifest, file_digest, fingerprint_files, \
+    same_content
 
 
 def simple_path_retriever(vpath):
@@ -40,57 +60,313 @@ def simple_path_retriever(vpath):
     return path
 
 
-def dwgs_cleaner(folderpath):
+"""the folder of the office's lisp routines"""
+LISP_FOLDER = 'Z:/ACAD/Lisp'
+
+"""the (name, command, lisp) steps that standardize an open drawing, in
+order (see cad_commands.py)"""
+CLEANING_STEPS = [
+    # this lisp routine removes the layers' filters programatically,
+    # when used in Hurricane for AutoCAD, the "Model" tab in the drawings
+    # gets hidden.
+    ('dlf', 'DLF\n', LISP_FOLDER + '/dlf.lsp'),
+    # this line runs the area graphic report.
+    ('area_report', '-SREPORT AREA\n', None),
+    # this lisp routine frezzes and thaws the drawing's layers to leave it
+    # at the desired state, it runs when it is loaded.
+    ('layers', None, LISP_FOLDER + '/LAYERS-BLDG-FINAL-ULISES.lsp'),
+    # this lisp routine turns on ANNOALLVISIBLE for the whole drawing
+    # (including layouts).
+    ('annoallvisible', 'TRUEANNOALLVISIBLE\n',
+     LISP_FOLDER + '/TRUEANNOALLVISIBLE.lsp'),
+    # the following lines make sure that the drawing gets save with
+    # the appropiate extents.
+    ('layout', '(command "-LAYOUT" "S" "11x17")\n', None),
+    ('pspace', 'PSPACE\n', None),
+    ('zoom', 'ZOOM EXTENTS\n', None),
+    ('save', 'QSAVE\n', None)]
+
+
+def routines_version(steps=CLEANING_STEPS, local=None):
+    """ This function returns the version of the standardization, a hash of
+    the steps and of the content of their lisp files. Editing a lisp routine
+    changes the version, and every drawing is cleaned again.
+
+    Args:
+    steps (list) (default = CLEANING_STEPS) = The (name, command, lisp) steps.
+    local (dictionary) (default = None) = The {path: local path} of the lisp
+    files the sessions load (see CommandCompiler.local_lisp), the local
+    copies are hashed so the version does not change when the share is
+    offline. The files on the share are hashed when it is None.
+
+    Returns:
+    The sha1 hex digest, an IOError is raised when a lisp file is missing.
+
+    Examples:
+    >>> compiler = CommandCompiler(CLEANING_STEPS)
+    >>> routines_version(CLEANING_STEPS, compiler.local_lisp())
+    '5b1d0c6a2f0e8c7b3c7d1e9f0a4b6c2d8e1f3a5b'
+    """
+    local = local or {}
+    digest = hashlib.sha1(repr(list(steps)).encode('utf-8'))
+    for _, _, lisp in steps:
+        if not lisp:
+            continue
+        used = local.get(lisp, lisp)
+        if not os.path.exists(used):
+            raise IOError('{} is not available, the version of the routines '
+                          'cannot be computed'.format(used))
+        digest.update(file_digest(used).encode('ascii'))
+    return digest.hexdigest()
+
+
+def plan_drawings(dwgs, manifest, version, force=False):
+    """ This function compares the drawings with the manifest.
+
+    Args:
+    dwgs (list) = The paths and file names of the drawings.
+    manifest (Manifest) = The manifest of the standardized drawings.
+    version (string) = The current routines_version.
+    force (boolean) (default = False) = Clean the unchanged drawings too.
+
+    Returns:
+    A list with one dictionary per drawing (drawing, key, reason), reason
+    is 'new', 'modified', 'routines changed', 'forced' or 'unchanged'.
+    """
+    plan = []
+    for dwg in dwgs:
+        key = os.path.abspath(dwg).replace('\\', '/')
+        previous = manifest.get(key)
+        if previous is None:
+            reason = 'new'
+        elif not same_content(fingerprint_files([dwg], previous['files']),
+                              previous['files']):
+            reason = 'modified'
+        elif previous.get('routines') != version:
+            reason = 'routines changed'
+        else:
+            reason = 'forced' if force else 'unchanged'
+        plan.append({'drawing': dwg, 'key': key, 'reason': reason})
+    return plan
+
+
+def print_plan(plan):
+    """ This function prints the drawings a run would clean and why.
+    """
+    for item in plan:
+        print('{:<16}  {}'.format(item['reason'], item['drawing']))
+    pending = len([i for i in plan if i['reason'] != 'unchanged'])
+    print('{} of {} drawings would be standardized'.format(pending,
+                                                           len(plan)))
+
+
+def _stop_quietly(session):
+    try:
+        session.stop()
+    except Exception:
+        pass
+
+
+def print_cleaning_report(report):
+    """ This function prints the per drawing results returned by
+    clean_drawings.
+    """
+    width = max([len(os.path.basename(e['drawing'])) for e in report] + [7])
+    print('{:<{w}}  {:>7}  {:>8}  {:>8}  {}'.format(
+        'drawing', 'session', 'seconds', 'attempts', 'status', w=width))
+    for entry in report:
+        print('{:<{w}}  {:>7}  {:>8.2f}  {:>8}  {}'.format(
+            os.path.basename(entry['drawing']), entry['session'],
+            entry['seconds'], entry['attempts'], entry['status'], w=width))
+        if entry['error']:
+            print('    {}'.format(entry['error']))
+
+
+def clean_drawings(dwgs, session_factory=AutoCadComSession, workers=1,
+                   retries=1, compiler=None, callback=None):
+    """ This function standardizes a list of drawings on a pool of CAD
+    sessions. Every worker owns one session and takes the next drawing from
+    a shared queue, so a slow drawing does not hold up the others. When a
+    session fails on a drawing it is stopped, a new session is started and
+    the drawing is retried.
+
+    Args:
+    dwgs (list) = The paths and file names of the drawings.
+    session_factory (callable) (default = AutoCadComSession) = Returns a new,
+    not started, session (see cad_session.py).
+    workers (int) (default = 1) = The number of sessions running at the
+    same time.
+    retries (int) (default = 1) = The number of times a failed drawing is
+    retried on a new session.
+    compiler (CommandCompiler) (default = None) = Compiles the steps sent to
+    every session and drawing, CLEANING_STEPS untimed when it is None (the
+    lisp files are only copied when the sessions need them).
+    callback (function) (default = None) = Called with every drawing's
+    result as soon as it is done, from the worker's thread.
+
+    Returns:
+    A list with one dictionary per drawing (drawing, session, seconds,
+    attempts, status, error and steps), in the order of dwgs. session is the
+    worker number, status is 'ok' or 'failed' and steps holds the seconds
+    of every step ({} when the compiler is not timed).
+
+    Examples:
+    >>> report = clean_drawings(glob.glob('Z:/FLOORPLANS/*.dwg'), workers=4)
+    drawing      session   seconds  attempts  status
+    0001_01.dwg        1     41.20         1  ok
+    0001_02.dwg        2     95.87         2  ok
+    """
+    compiler = compiler or CommandCompiler(
+        CLEANING_STEPS, copy_lisp=getattr(session_factory, 'needs_lisp', True))
+    compiler.reset_timings()
+    # one SendCommand per drawing, the lisp files are read from the local
+    # copies (see cad_commands.py)
+    payload = [compiler.drawing_payload()] if dwgs else []
+    queue = Queue()
+    for index, dwg in enumerate(dwgs):
+        queue.put((index, dwg))
+    report = [None] * len(dwgs)
+
+    def work(number):
+        session = None
+        try:
+            while True:
+                try:
+                    index, dwg = queue.get_nowait()
+                except Empty:
+                    return
+                entry = {'drawing': dwg, 'session': number, 'seconds': 0.0,
+                         'attempts': 0, 'status': 'failed', 'error': '',
+                         'steps': {}}
+                start = time.time()
+                while entry['attempts'] <= retries:
+                    entry['attempts'] += 1
+                    try:
+                        if session is None:
+                            session = session_factory()
+                            session.start(compiler.session_commands(
+                                compiler.timing_log(number)))
+                        session.run(dwg, payload)
+                        entry['status'], entry['error'] = 'ok', ''
+                        break
+                    except Exception as e:
+                        entry['error'] = '{}: {}'.format(type(e).__name__, e)
+                        print('{} failed on session {} ({}), restarting the '
+                              'session'.format(os.path.basename(dwg), number,
+                                               entry['error']))
+                        if session is not None:
+                            _stop_quietly(session)
+                        session = None
+                entry['seconds'] = time.time() - start
+                report[index] = entry
+                if callback is not None:
+                    callback(entry)
+        finally:
+            if session is not None:
+                _stop_quietly(session)
+
+    size = max(1, min(workers, len(dwgs)))
+    pool = ThreadPool(size)
+    try:
+        pool.map(work, range(1, size + 1))
+    finally:
+        pool.close()
+        pool.join()
+    print_cleaning_report(report)
+    if compiler.timed:
+        timings = compiler.read_timings()
+        for entry in report:
+            entry['steps'] = timings.get(
+                drawing_key(os.path.abspath(entry['drawing'])), {})
+        print_step_report(report, compiler.step_names())
+    return report
+
+
+def dwgs_cleaner(folderpath, workers=1, session_factory=AutoCadComSession,
+                 retries=1, force=False, dry_run=False, manifest_path=None,
+                 timed=False, lisp_cache=None, script=None):
     """
     This function was developed as an alternative to Hurricane for AutoCAD
     because some lisp routines do not work well in Hurricane. The function
     removes all layer filters, runs an AREA graphic report, set up the layers'
     visibility according to our current CAD standards, turns on ANNOALLVISIBLE
     for the whole drawing (including layouts) and finally save the drawing with
-    appropiate extents. In some cases when the function is completed an
-    Autodesk error appears on screen, if this happens, just ignore it.
+    appropiate extents (see CLEANING_STEPS). The drawings are split among
+    several hidden AutoCAD instances when workers is greater than 1 (see
+    clean_drawings). Drawings that did not change since they were
+    standardized with the current lisp routines are skipped.
     Args:
     folderpath (string) = A string representation of a location on disk.
+    workers (int) (default = 1) = The number of AutoCAD instances.
+    session_factory (callable) (default = AutoCadComSession) = Returns a new
+    CAD session, cad_session.RecordingCad stands in for AutoCAD.
+    retries (int) (default = 1) = The number of times a failed drawing is
+    retried on a new session.
+    force (boolean) (default = False) = Clean the unchanged drawings too.
+    dry_run (boolean) (default = False) = Only list the drawings that would
+    be cleaned, AutoCAD is not started.
+    manifest_path (string) (default = None) = The JSON manifest of the
+    standardized drawings, it defaults to .dwg_manifest.json in folderpath.
+    timed (boolean) (default = False) = Measure the seconds of every step,
+    the timing logs are written to .dwg_timings in folderpath.
+    lisp_cache (string) (default = None) = The local folder for the copies of
+    the lisp routines (see cad_commands.cache_lisp).
+    script (string) (default = None) = Instead of running AutoCAD, write the
+    drawings to clean to this AutoCAD script (.scr), the manifest is not
+    updated.
     Returns:
-    cleaned dwgs
+    The clean_drawings report, the plan_drawings list when dry_run is True or
+    a script is written.
     Examples:
-    >>> dwgs_cleaner(folder)
+    >>> dwgs_cleaner(folder, workers=4)
     'All drawings have been standardized!'
     """
-    os.chdir(folderpath)
-    dwg_list = glob.glob('*.dwg')
     folderpath = folderpath.replace('\\', '/')
-    acad = client.Dispatch("AutoCAD.Application")
-    acad.Visible = True
-    doc = acad.ActiveDocument
-    for dwg in dwg_list:
-        floor_plan = folderpath + '/' + "%s" % dwg
-        doc.SendCommand('(command "_.OPEN" "%s")\n' % floor_plan)
-        # this lisp routine removes the layers' filters programatically,
-        # when used in Hurricane for AutoCAD, the "Model" tab in the drawings
-        # gets hidden.
-        doc.SendCommand('''(LOAD "Z:/ACAD/Lisp/dlf.lsp")\n''')
-        doc.SendCommand("DLF\n")
-        # this line runs the area graphic report.
-        doc.SendCommand("-SREPORT AREA\n")
-        # this lisp routine frezzes and thaws the drawing's layers to leave it
-        # at the desired state.
-        doc.SendCommand(
-            '''(LOAD "Z:/ACAD/Lisp/LAYERS-BLDG-FINAL-ULISES.lsp")\n''')
-        # this lisp routine frezzes and thaws the drawing layers to leave it
-        # a the desired state.
-        doc.SendCommand(
-            '''(LOAD "Z:/ACAD/Lisp/TRUEANNOALLVISIBLE.lsp")\n''')
-        doc.SendCommand("TRUEANNOALLVISIBLE\n")
-        # the following lines make sure that the drawing gets save with
-        # the appropiate extents.
-        doc.SendCommand('(command "-LAYOUT" "S" "11x17")\n')
-        doc.SendCommand("PSPACE\n")
-        doc.SendCommand("ZOOM EXTENTS\n")
-        doc.SendCommand("QSAVE\n")
-    doc.SendCommand("QUIT\n")
-    print('All drawings have been standardized!')
-    return
+    dwg_list = sorted(glob.glob(os.path.join(folderpath, '*.dwg')))
+    manifest = Manifest(manifest_path or
+                        os.path.join(folderpath, '.dwg_manifest.json'))
+    # an AutoCAD script is run by AutoCAD, it always needs the lisp files
+    compiler = CommandCompiler(
+        CLEANING_STEPS, lisp_cache,
+        os.path.join(folderpath, '.dwg_timings') if timed else None,
+        copy_lisp=bool(script) or getattr(session_factory, 'needs_lisp',
+                                          True))
+    # the version comes from the files the sessions load, the local copies
+    # when the share is offline
+    version = routines_version(CLEANING_STEPS, compiler.local_lisp())
+    plan = plan_drawings(dwg_list, manifest, version, force)
+    if dry_run:
+        print_plan(plan)
+        return plan
+    keys = dict((item['drawing'], item['key']) for item in plan)
+    pending = [item['drawing'] for item in plan
+               if item['reason'] != 'unchanged']
+    if script:
+        compiler.write_batch_script(pending, script)
+        print('{} drawings were written to {}'.format(len(pending), script))
+        return plan
+
+    def cleaned(entry):
+        # the drawing is fingerprinted after its QSAVE
+        if entry['status'] == 'ok':
+            manifest.set(keys[entry['drawing']], {
+                'files': fingerprint_files([entry['drawing']]),
+                'routines': version})
+            manifest.save()
+
+    report = clean_drawings(pending, session_factory, workers, retries,
+                            compiler, cleaned)
+    if len(pending) < len(plan):
+        print('{} unchanged drawings were skipped'.format(
+            len(plan) - len(pending)))
+    failed = [e for e in report if e['status'] != 'ok']
+    if failed:
+        print('{} of {} drawings could not be standardized'.format(
+            len(failed), len(report)))
+    else:
+        print('All drawings have been standardized!')
+    return report
+
 
 if __name__ == "__main__":
     print("""Relax while I take care of the boring stuff
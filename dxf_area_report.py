@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       dxf_area_report.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This script reports the room and floor areas of the floor plans from their
+DXF exports, without an AutoCAD session (the -SREPORT AREA step of
+dwg_floorplans_cleaner needs one per drawing). Every drawing is read as a
+stream of group code / value pairs, only the closed LWPOLYLINE and POLYLINE
+boundaries of the ENTITIES section on the BLDG layers are kept (see
+BLDG_LAYERS, the layers our lisp routines leave on) and their areas are
+computed at once with NumPy: the shoelace formula plus the circular segment
+of every arc segment (bulge). The drawings are measured by a pool of
+processes. Polylines whose last vertex repeats the first one are treated as
+closed. Blocks (INSERT) are not exploded and binary DXF files are not
+supported. Only numpy is required.
+usage: python dxf_area_report.py <folder> <report.csv> [options]
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import argparse
+import csv
+import fnmatch
+import glob
+import io
+import os
+import time
+from functools import partial
+from multiprocessing import Pool
+import numpy as np
+
+"""the layers of the room and floor boundaries, fnmatch patterns that are
+compared in upper case"""
+BLDG_LAYERS = ('BLDG*',)
+
+"""square feet per square drawing unit, by $INSUNITS code"""
+SQUARE_FEET = {1: 1 / 144.0, 2: 1.0, 4: 1 / 92903.04, 5: 1 / 929.0304,
+               6: 10.76391041671}
+
+
+def _pairs(f):
+    """ This helper function yields the (group code, value) pairs of a DXF
+    file, the values are stripped.
+    """
+    for code, value in zip(f, f):
+        yield code.strip(), value.strip()
+
+
+def _layer_filter(patterns):
+    patterns = [pattern.upper() for pattern in patterns or ()]
+
+    def wanted(layer):
+        layer = layer.upper()
+        return not patterns or any(fnmatch.fnmatchcase(layer, pattern)
+                                   for pattern in patterns)
+    return wanted
+
+
+def iter_boundaries(path, layers=BLDG_LAYERS, header=None):
+    """ This function stream-parses a DXF file and yields its closed
+    polylines.
+
+    Args:
+    path (string) = The path and file name of the DXF file.
+    layers (tuple) (default = BLDG_LAYERS) = The layer name patterns, every
+    layer when it is empty.
+    header (dict) (default = None) = Receives the $INSUNITS header variable
+    (the drawing units code) when the drawing sets it.
+
+    Yields:
+    A tuple (layer, handle, x, y, bulge), the vertex coordinates and bulges
+    as lists.
+    """
+    for boundary in _polylines(path, layers, header):
+        if boundary is not None:
+            yield boundary
+
+
+def _polylines(path, layers, header):
+    """ This helper generator yields every polyline of the ENTITIES section,
+    None for the open ones.
+    """
+    wanted = _layer_filter(layers)
+    section = None
+    entity = None
+    polyline = None
+    vertex = None
+    previous = None
+    with io.open(path, encoding='utf-8', errors='replace') as f:
+        first = f.readline()
+        if first.startswith('AutoCAD Binary DXF'):
+            raise ValueError('{} is a binary DXF file'.format(path))
+        f.seek(0)
+        for code, value in _pairs(f):
+            if code == '0':
+                # the previous entity ends here
+                if entity == 'LWPOLYLINE' and polyline is not None:
+                    yield _closed(polyline)
+                    polyline = None
+                elif entity == 'VERTEX' and vertex is not None and \
+                        polyline is not None:
+                    # 16: spline frame control point, not on the curve
+                    if not vertex['flags'] & 16:
+                        polyline['x'].append(vertex['x'])
+                        polyline['y'].append(vertex['y'])
+                        polyline['bulge'].append(vertex['bulge'])
+                    vertex = None
+                if value == 'SEQEND' and entity in ('VERTEX', 'POLYLINE'):
+                    if polyline is not None:
+                        yield _closed(polyline)
+                    polyline = None
+                entity = value
+                if value == 'SECTION':
+                    section = None
+                elif value == 'ENDSEC':
+                    section = None
+                elif section == 'ENTITIES' and value in ('LWPOLYLINE',
+                                                         'POLYLINE'):
+                    polyline = {'kind': value, 'layer': None, 'handle': None,
+                                'flags': 0, 'x': [], 'y': [], 'bulge': []}
+                elif section == 'ENTITIES' and value == 'VERTEX' and \
+                        polyline is not None:
+                    vertex = {'x': 0.0, 'y': 0.0, 'bulge': 0.0, 'flags': 0}
+                elif value not in ('VERTEX', 'SEQEND'):
+                    polyline = None
+                continue
+            if entity == 'SECTION' and code == '2':
+                section = value
+            elif section == 'HEADER':
+                if code == '9':
+                    previous = value
+                elif previous == '$INSUNITS' and code == '70' and \
+                        header is not None:
+                    header['$INSUNITS'] = int(value)
+            elif polyline is not None and entity in ('LWPOLYLINE',
+                                                     'POLYLINE'):
+                if code == '8':
+                    polyline['layer'] = value
+                    if not wanted(value):
+                        polyline = None
+                elif code == '5':
+                    polyline['handle'] = value
+                elif code == '70':
+                    polyline['flags'] = int(value)
+                    # 16: 3D mesh, 64: polyface mesh
+                    if polyline['flags'] & 80:
+                        polyline = None
+                elif entity == 'LWPOLYLINE':
+                    if code == '10':
+                        polyline['x'].append(float(value))
+                        polyline['bulge'].append(0.0)
+                    elif code == '20':
+                        polyline['y'].append(float(value))
+                    elif code == '42':
+                        polyline['bulge'][-1] = float(value)
+            elif vertex is not None:
+                if code == '10':
+                    vertex['x'] = float(value)
+                elif code == '20':
+                    vertex['y'] = float(value)
+                elif code == '42':
+                    vertex['bulge'] = float(value)
+                elif code == '70':
+                    vertex['flags'] = int(value)
+        if entity == 'LWPOLYLINE' and polyline is not None:
+            yield _closed(polyline)
+
+
+def _closed(polyline):
+    """ This helper function returns a polyline tuple, None when the
+    polyline is open (a repeated first vertex closes it).
+    """
+    x, y, bulge = polyline['x'], polyline['y'], polyline['bulge']
+    if len(x) != len(y) or len(x) < 2:
+        return None
+    if not polyline['flags'] & 1:
+        if len(x) < 4 or (x[0], y[0]) != (x[-1], y[-1]):
+            return None
+        x, y, bulge = x[:-1], y[:-1], bulge[:-1]
+    return (polyline['layer'], polyline['handle'], x, y, bulge)
+
+
+def polygon_areas(x, y, bulge, starts):
+    """ This function computes the areas of many closed polylines at once.
+    The vertices of all the polylines are concatenated, the segment from
+    the last vertex of a polyline goes back to its first one.
+
+    Args:
+    x (array) = The x coordinates.
+    y (array) = The y coordinates.
+    bulge (array) = The bulge of the segment starting at every vertex, the
+    tangent of a quarter of the arc angle (0 for a straight segment,
+    positive for a counterclockwise arc).
+    starts (array) = The index of the first vertex of every polyline.
+
+    Returns:
+    A numpy array with the area of every polyline.
+
+    Examples:
+    >>> polygon_areas([0, 2], [0, 0], [1, 1], [0])
+    array([3.14159265])
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    bulge = np.asarray(bulge, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.intp)
+    if not len(starts):
+        return np.zeros(0)
+    ends = np.append(starts[1:], len(x))
+    following = np.arange(1, len(x) + 1)
+    following[ends - 1] = starts
+    x1, y1 = x[following], y[following]
+    twice = x * y1 - x1 * y
+    # the circular segment between the chord and the arc of the (few) arc
+    # segments, r = c / 2 sin(t / 2)
+    arcs = np.flatnonzero(bulge)
+    if len(arcs):
+        angle = 4 * np.arctan(bulge[arcs])
+        chord = np.hypot(x1[arcs] - x[arcs], y1[arcs] - y[arcs])
+        radius = chord / (2 * np.sin(angle / 2))
+        twice[arcs] += radius ** 2 * (angle - np.sin(angle))
+    return np.abs(np.add.reduceat(twice, starts)) / 2
+
+
+def measure_dxf(path, layers=BLDG_LAYERS):
+    """ This function measures the closed boundaries of a DXF file.
+
+    Returns:
+    A dictionary with the drawing, its units ($INSUNITS, 0 when unknown),
+    its boundaries (a list of (layer, handle, vertices, area) tuples),
+    seconds and error (empty when the drawing was read).
+    """
+    start = time.time()
+    result = {'drawing': path, 'units': 0, 'boundaries': [],
+              'seconds': 0.0, 'error': ''}
+    try:
+        x, y, bulge, starts, found = [], [], [], [], []
+        header = {}
+        for layer, handle, xs, ys, bulges in iter_boundaries(path, layers,
+                                                             header):
+            starts.append(len(x))
+            x.extend(xs)
+            y.extend(ys)
+            bulge.extend(bulges)
+            found.append((layer, handle, len(xs)))
+        result['units'] = header.get('$INSUNITS', 0)
+        areas = polygon_areas(x, y, bulge, starts)
+        result['boundaries'] = [(layer, handle, vertices, float(area))
+                                for (layer, handle, vertices), area in
+                                zip(found, areas)]
+    except Exception as e:
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+    result['seconds'] = time.time() - start
+    return result
+
+
+def _csv_file(path):
+    return open(path, 'wb' if bytes is str else 'w')
+
+
+def _square_feet(area, units):
+    factor = SQUARE_FEET.get(units)
+    return '' if factor is None else round(area * factor, 2)
+
+
+def dxf_area_report(dxfs, report_loc, layers=BLDG_LAYERS, workers=None,
+                    boundaries_loc=None):
+    """ This function measures a batch of DXF drawings on a pool of processes
+    and writes the total area of every BLDG layer of every drawing to a CSV
+    file.
+
+    Args:
+    dxfs (list or string) = The DXF files, or a folder whose *.dxf files are
+    measured.
+    report_loc (string) = The CSV report, one row per drawing and layer
+    (drawing, layer, boundaries, area, area_sqft). area is in square drawing
+    units, area_sqft is empty when the drawing does not set $INSUNITS.
+    layers (tuple) (default = BLDG_LAYERS) = The layer name patterns.
+    workers (int) (default = None) = The number of processes, one per CPU
+    when it is None.
+    boundaries_loc (string) (default = None) = An optional CSV file with one
+    row per boundary (drawing, layer, handle, vertices, area, area_sqft).
+
+    Returns:
+    A list with the measure_dxf result of every drawing, sorted by drawing.
+
+    Examples:
+    >>> dxf_area_report('Z:/FLOORPLANS/DXF', 'C:/Temp/areas.csv')
+    3120 drawings, 148211 boundaries in 41.3 seconds (75.5 drawings/s)
+    """
+    start = time.time()
+    if not isinstance(dxfs, (list, tuple)):
+        dxfs = glob.glob(os.path.join(dxfs, '*.dxf')) + \
+            glob.glob(os.path.join(dxfs, '*.DXF'))
+    dxfs = sorted(set(dxfs))
+    measure = partial(measure_dxf, layers=layers)
+    if workers == 1 or len(dxfs) < 2:
+        results = [measure(dxf) for dxf in dxfs]
+    else:
+        pool = Pool(workers)
+        try:
+            results = list(pool.imap_unordered(measure, dxfs, chunksize=4))
+        finally:
+            pool.close()
+            pool.join()
+    results.sort(key=lambda r: r['drawing'])
+    with _csv_file(report_loc) as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['drawing', 'layer', 'boundaries', 'area',
+                         'area_sqft'])
+        for result in results:
+            totals = {}
+            for layer, _, _, area in result['boundaries']:
+                count, total = totals.get(layer, (0, 0.0))
+                totals[layer] = (count + 1, total + area)
+            for layer in sorted(totals):
+                count, total = totals[layer]
+                writer.writerow([os.path.basename(result['drawing']), layer,
+                                 count, round(total, 4),
+                                 _square_feet(total, result['units'])])
+    if boundaries_loc:
+        with _csv_file(boundaries_loc) as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(['drawing', 'layer', 'handle', 'vertices',
+                             'area', 'area_sqft'])
+            for result in results:
+                for layer, handle, vertices, area in result['boundaries']:
+                    writer.writerow([os.path.basename(result['drawing']),
+                                     layer, handle, vertices, round(area, 4),
+                                     _square_feet(area, result['units'])])
+    seconds = time.time() - start
+    failed = [r for r in results if r['error']]
+    for result in failed:
+        print('{} could not be read ({})'.format(result['drawing'],
+                                                 result['error']))
+    print('{} drawings, {} boundaries in {:.1f} seconds ({:.1f} '
+          'drawings/s)'.format(len(results),
+                               sum(len(r['boundaries']) for r in results),
+                               seconds, len(results) / max(seconds, 1e-9)))
+    return results
+
+
+def main(argv=None):
+    """ This function runs the command line interface, argv defaults to
+    the script's arguments (sys.argv[1:]).
+    """
+    parser = argparse.ArgumentParser(
+        description='Reports the areas of the closed polylines on the BLDG '
+        'layers of a folder of DXF floor plans.')
+    parser.add_argument('folder', help='the folder with the *.dxf files')
+    parser.add_argument('report', help='the CSV report, one row per drawing '
+                        'and layer')
+    parser.add_argument('--layers', nargs='+', default=list(BLDG_LAYERS),
+                        help='the layer name patterns (default: BLDG*)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='the number of processes')
+    parser.add_argument('--boundaries', help='a CSV file with one row per '
+                        'boundary')
+    args = parser.parse_args(argv)
+    results = dxf_area_report(args.folder, args.report, args.layers,
+                              args.workers, args.boundaries)
+    return 1 if any(r['error'] for r in results) else 0
+
+
+if __name__ == "__main__":
+    main()
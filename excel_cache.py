@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       excel_cache.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module caches parsed excel sheets, so an unchanged workbook is not
+parsed again on the next run. A cache entry is keyed on the workbook's
+content hash, the sheet, the skipped rows and a tag naming the cleaning step
+applied after the parse (change the tag when that step changes). Entries are
+Parquet files when pyarrow is installed and pickle files otherwise, they are
+written atomically and their modification time records the last use, so
+several processes can share a cache folder. The least recently used entries
+are evicted when the folder grows past its size limit.
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import glob
+import hashlib
+import os
+import tempfile
+from file_manifest import file_digest
+try:
+    # only checking that the module exists, pyarrow is slow to import
+    from importlib.util import find_spec
+    PARQUET = find_spec('pyarrow') is not None
+except ImportError:
+    # python 2
+    import imp
+    try:
+        imp.find_module('pyarrow')
+        PARQUET = True
+    except ImportError:
+        PARQUET = False
+
+
+class ExcelCache(object):
+    """ This class is a folder of parsed excel sheets.
+
+    Args:
+    folder (string) = The cache folder, it is created when it does not
+    exist.
+    max_bytes (int) (default = 512 MB) = The size above which the least
+    recently used entries are evicted.
+
+    Examples:
+    >>> cache = ExcelCache('C:/cu_employees_data/.excel_cache')
+    >>> df = cache.parse('cu_employees_data.xlsx', skiprows=1)
+    >>> cache.hits, cache.misses
+    (1, 0)
+    """
+
+    def __init__(self, folder, max_bytes=512 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        try:
+            os.makedirs(folder)
+        except OSError:
+            # another process may have created it first
+            if not os.path.isdir(folder):
+                raise
+
+    def key(self, excel_file, sheet=0, skiprows=0, tag=''):
+        """ This method returns the cache key of a parse.
+        """
+        digest = hashlib.sha1(file_digest(excel_file).encode('ascii'))
+        digest.update(u'{!r}|{!r}|{}'.format(sheet, skiprows, tag).encode(
+            'utf-8'))
+        return digest.hexdigest()
+
+    def _entries(self, key='*'):
+        return glob.glob(os.path.join(self.folder, key + '.parquet')) + \
+            glob.glob(os.path.join(self.folder, key + '.pickle'))
+
+    def get(self, key):
+        """ This method returns a cached dataframe, None when there is no
+        entry for the key.
+        """
+        import pandas as pd
+        for path in self._entries(key):
+            try:
+                if path.endswith('.parquet'):
+                    frame = pd.read_parquet(path)
+                else:
+                    frame = pd.read_pickle(path)
+            except Exception:
+                # a damaged entry is dropped and parsed again
+                os.remove(path)
+                continue
+            # the modification time is the last use of the entry
+            os.utime(path, None)
+            return frame
+        return None
+
+    def put(self, key, frame):
+        """ This method stores a dataframe and evicts the least recently
+        used entries when the cache is full.
+        """
+        handle, temporary = tempfile.mkstemp(dir=self.folder, suffix='.tmp')
+        os.close(handle)
+        extension = '.pickle'
+        try:
+            if PARQUET:
+                try:
+                    frame.to_parquet(temporary)
+                    extension = '.parquet'
+                except Exception:
+                    # i.e. columns mixing types parquet cannot store
+                    pass
+            if extension == '.pickle':
+                frame.to_pickle(temporary)
+            target = os.path.join(self.folder, key + extension)
+            if os.path.exists(target):
+                os.remove(target)
+            os.rename(temporary, target)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self.evict()
+
+    def parse(self, excel_file, sheet=0, skiprows=0, transform=None,
+              tag=''):
+        """ This method returns a sheet parsed by pandas, from the cache when
+        the workbook did not change.
+
+        Args:
+        excel_file (string) = The path and file name of the excel file.
+        sheet (int or string) (default = 0) = The sheet index or name.
+        skiprows (int) (default = 0) = The number of rows above the header.
+        transform (function) (default = None) = A cleaning step applied to
+        the parsed dataframe before it is cached, it must be deterministic.
+        tag (string) (default = '') = The name and version of transform.
+
+        Returns:
+        A pandas DataFrame.
+        """
+        key = self.key(excel_file, sheet, skiprows, tag)
+        frame = self.get(key)
+        if frame is not None:
+            self.hits += 1
+            return frame
+        self.misses += 1
+        import pandas as pd
+        frame = pd.read_excel(excel_file, sheet_name=sheet,
+                              skiprows=skiprows)
+        if transform is not None:
+            frame = transform(frame)
+        self.put(key, frame)
+        return frame
+
+    def evict(self):
+        """ This method removes the least recently used entries until the
+        cache fits in max_bytes.
+
+        Returns:
+        The number of entries removed.
+        """
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       feature_writers.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   10.3.1
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module writes the sensor volume records as point features. A writer
+creates a feature class (or table) per sensor and inserts the rows of a
+dataframe in batches, the schema is described once by a list of
+(field name, type) pairs, type being 'TEXT', 'DOUBLE', 'LONG' or 'DATE'.
+ArcpyFeatureWriter writes to a file geodatabase, the fields are added once to
+an in-memory template that every feature class is created from and each
+feature class is filled through a single InsertCursor. GeoPackageWriter
+writes a GeoPackage (a SQLite database) with executemany and only needs the
+standard library, so the conversion can run without ArcGIS. Every writer
+implements the same three methods:
+create(name)             creates (or replaces) the feature class
+write(name, frame, x, y) inserts the rows, all at the point (x, y)
+close()                  releases the writer
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import sqlite3
+import struct
+from datetime import datetime
+
+"""the fields of a sensor volume feature class, in insertion order"""
+VOLUME_FIELDS = [('DAY', 'TEXT'), ('HOUR', 'TEXT'),
+                 ('VOL_LEFTLANE', 'DOUBLE'), ('VOL_RIGHTLANE', 'DOUBLE'),
+                 ('DATE', 'DATE')]
+
+
+def _batches(frame, columns, batch_size):
+    """ This helper function yields the frame's rows as lists of tuples,
+    batch_size rows at a time, timestamps are converted to datetime objects
+    and missing values to None.
+    """
+    for start in range(0, len(frame), batch_size):
+        chunk = frame[columns].iloc[start:start + batch_size]
+        chunk = chunk.astype(object).where(chunk.notnull(), None)
+        rows = []
+        for row in chunk.itertuples(index=False):
+            rows.append(tuple(value.to_pydatetime()
+                              if hasattr(value, 'to_pydatetime') else value
+                              for value in row))
+        yield rows
+
+
+class ArcpyFeatureWriter(object):
+    """ This writer creates point feature classes in a geodatabase with
+    arcpy.
+
+    Args:
+    workspace (string) = The path of the geodatabase.
+    fields (list) (default = VOLUME_FIELDS) = The (field name, type) pairs.
+    spatial_reference (int) (default = 2876) = The ESRI code of the spatial
+    reference, NAD_1983_HARN_StatePlane_Colorado_North_FIPS_0501_Feet.
+    batch_size (int) (default = 10000) = The number of rows read from the
+    dataframe at a time.
+
+    Examples:
+    >>> writer = ArcpyFeatureWriter(GDB_PATH)
+    >>> writer.create('Colorado_Folsom')
+    >>> writer.write('Colorado_Folsom', df, 3066000.14, 1245908.47)
+    >>> writer.close()
+    """
+
+    def __init__(self, workspace, fields=VOLUME_FIELDS,
+                 spatial_reference=2876, batch_size=10000):
+        import arcpy
+        self.arcpy = arcpy
+        self.workspace = workspace
+        self.fields = fields
+        self.batch_size = batch_size
+        self.spatial_reference = arcpy.SpatialReference(spatial_reference)
+        self._template = None
+
+    def _template_fc(self):
+        """ This helper method creates the in-memory template feature class
+        the first time it is needed, its fields are added only once.
+        """
+        if self._template is None:
+            arcpy = self.arcpy
+            template = arcpy.CreateFeatureclass_management(
+                'in_memory', 'sensor_template', 'POINT', '', '', '',
+                self.spatial_reference).getOutput(0)
+            for name, kind in self.fields:
+                arcpy.AddField_management(template, name, kind)
+            self._template = template
+        return self._template
+
+    def create(self, name):
+        self.arcpy.CreateFeatureclass_management(
+            self.workspace, name, 'POINT', self._template_fc(), '', '',
+            self.spatial_reference)
+
+    def write(self, name, frame, x, y):
+        """ This method inserts the rows through a single cursor, the
+        "SHAPE@XY" token avoids building a geometry object per row.
+
+        Returns:
+        The number of rows written.
+        """
+        columns = [field for field, _ in self.fields]
+        rows = 0
+        fc = '{}/{}'.format(self.workspace, name)
+        with self.arcpy.da.InsertCursor(fc, ['SHAPE@XY'] + columns) as cursor:
+            for batch in _batches(frame, columns, self.batch_size):
+                for row in batch:
+                    cursor.insertRow(((x, y),) + row)
+                rows += len(batch)
+        return rows
+
+    def close(self):
+        if self._template is not None:
+            self.arcpy.Delete_management(self._template)
+            self._template = None
+
+
+class GeoPackageWriter(object):
+    """ This writer creates point feature tables in a GeoPackage (OGC
+    GeoPackage 1.2, readable by ArcGIS, QGIS and GDAL). Dates are stored as
+    ISO 8601 text.
+
+    Args:
+    path (string) = The .gpkg file, it is created when it does not exist.
+    fields (list) (default = VOLUME_FIELDS) = The (field name, type) pairs.
+    srs_id (int) (default = 2876) = The EPSG code of the coordinates.
+    srs_wkt (string) (default = 'undefined') = The WKT definition of the
+    spatial reference, readers fall back to the EPSG code without it.
+    batch_size (int) (default = 10000) = The number of rows per executemany.
+
+    Examples:
+    >>> writer = GeoPackageWriter('PARK_MI.gpkg')
+    >>> writer.create('Colorado_Folsom')
+    >>> writer.write('Colorado_Folsom', df, 3066000.14, 1245908.47)
+    >>> writer.close()
+    """
+
+    SQL_TYPES = {'TEXT': 'TEXT', 'DOUBLE': 'DOUBLE', 'LONG': 'INTEGER',
+                 'DATE': 'DATETIME'}
+
+    def __init__(self, path, fields=VOLUME_FIELDS, srs_id=2876,
+                 srs_wkt='undefined', batch_size=10000):
+        self.path = path
+        self.fields = fields
+        self.srs_id = srs_id
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA application_id = 1196444487')
+        self.connection.execute('PRAGMA user_version = 10200')
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (
+                srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY,
+                organization TEXT NOT NULL,
+                organization_coordsys_id INTEGER NOT NULL,
+                definition TEXT NOT NULL, description TEXT);
+            CREATE TABLE IF NOT EXISTS gpkg_contents (
+                table_name TEXT NOT NULL PRIMARY KEY,
+                data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+                description TEXT DEFAULT '',
+                last_change DATETIME NOT NULL DEFAULT
+                (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+                min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+                srs_id INTEGER);
+            CREATE TABLE IF NOT EXISTS gpkg_geometry_columns (
+                table_name TEXT NOT NULL, column_name TEXT NOT NULL,
+                geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL,
+                z TINYINT NOT NULL, m TINYINT NOT NULL,
+                CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name));
+            """)
+        spatial_refs = [
+            ('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined'),
+            ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined'),
+            ('EPSG:{}'.format(srs_id), srs_id, 'EPSG', srs_id, srs_wkt)]
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO gpkg_spatial_ref_sys (srs_name, srs_id, '
+            'organization, organization_coordsys_id, definition) '
+            'VALUES (?, ?, ?, ?, ?)', spatial_refs)
+        self.connection.commit()
+
+    def point_blob(self, x, y):
+        """ This method encodes a point as a GeoPackage geometry: the 'GP'
+        header (version 0, little endian, no envelope, srs id) followed by
+        the WKB point.
+        """
+        return sqlite3.Binary(b'GP' + struct.pack('<BBi', 0, 1, self.srs_id) +
+                              struct.pack('<BIdd', 1, 1, x, y))
+
+    def create(self, name):
+        columns = ', '.join('"{}" {}'.format(field, self.SQL_TYPES[kind])
+                            for field, kind in self.fields)
+        with self.connection:
+            self.connection.execute('DROP TABLE IF EXISTS "{}"'.format(name))
+            for table in ('gpkg_contents', 'gpkg_geometry_columns'):
+                self.connection.execute(
+                    'DELETE FROM {} WHERE table_name = ?'.format(table),
+                    (name,))
+            self.connection.execute(
+                'CREATE TABLE "{}" (fid INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'geom POINT, {})'.format(name, columns))
+            self.connection.execute(
+                'INSERT INTO gpkg_contents (table_name, data_type, '
+                'identifier, srs_id) VALUES (?, ?, ?, ?)',
+                (name, 'features', name, self.srs_id))
+            self.connection.execute(
+                'INSERT INTO gpkg_geometry_columns VALUES '
+                '(?, ?, ?, ?, 0, 0)', (name, 'geom', 'POINT', self.srs_id))
+
+    def write(self, name, frame, x, y):
+        """ This method inserts the rows with executemany in one
+        transaction and extends the table's extent to the point.
+
+        Returns:
+        The number of rows written.
+        """
+        columns = [field for field, _ in self.fields]
+        geometry = self.point_blob(x, y)
+        insert = 'INSERT INTO "{}" (geom, {}) VALUES (?, {})'.format(
+            name, ', '.join('"{}"'.format(c) for c in columns),
+            ', '.join('?' * len(columns)))
+        rows = 0
+        with self.connection:
+            for batch in _batches(frame, columns, self.batch_size):
+                self.connection.executemany(insert, [
+                    (geometry,) + tuple(value.isoformat()
+                                        if isinstance(value, datetime)
+                                        else value for value in row)
+                    for row in batch])
+                rows += len(batch)
+            self.connection.execute(
+                'UPDATE gpkg_contents SET min_x = min(ifnull(min_x, ?), ?), '
+                'min_y = min(ifnull(min_y, ?), ?), '
+                'max_x = max(ifnull(max_x, ?), ?), '
+                'max_y = max(ifnull(max_y, ?), ?), '
+                "last_change = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') "
+                'WHERE table_name = ?', (x, x, y, y, x, x, y, y, name))
+        return rows
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       file_manifest.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module keeps track of the files a script already processed. A manifest
+is a JSON file that maps a key (i.e. a layer or a drawing name) to the size,
+modification time and content hash of its files, so a later run can tell
+which inputs changed. Hashes are only recomputed for files whose size or
+modification time changed. Only the standard library is required.
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import hashlib
+import json
+import os
+import threading
+
+
+def file_digest(path, algorithm='sha1', blocksize=1 << 20):
+    """ This function hashes a file's content in blocks.
+
+    Args:
+    path (string) = The path and file name.
+    algorithm (string) (default = 'sha1') = A hashlib algorithm name.
+    blocksize (int) (default = 1 MB) = The number of bytes read at a time.
+
+    Returns:
+    The hexadecimal digest.
+
+    Examples:
+    >>> file_digest('buildings.shp')
+    '2fd4e1c67a2d28fced849ee1bb76e7391b93eb12'
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        block = f.read(blocksize)
+        while block:
+            digest.update(block)
+            block = f.read(blocksize)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, previous=None):
+    """ This function returns the size, modification time and sha1 hash of a
+    file. The hash of previous is reused when the size and modification time
+    did not change.
+
+    Args:
+    path (string) = The path and file name.
+    previous (dict) (default = None) = A fingerprint returned by an earlier
+    call.
+
+    Returns:
+    A dictionary {'size': int, 'mtime': float, 'sha1': string}.
+    """
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    if previous and previous.get('size') == fingerprint['size'] and \
+            previous.get('mtime') == fingerprint['mtime']:
+        fingerprint['sha1'] = previous['sha1']
+    else:
+        fingerprint['sha1'] = file_digest(path)
+    return fingerprint
+
+
+def fingerprint_files(paths, previous=None):
+    """ This function fingerprints a group of files (i.e. the .shp, .dbf,
+    .prj and .shx of a layer), keyed by file name.
+
+    Args:
+    paths (list) = The paths of the files.
+    previous (dict) (default = None) = The fingerprints returned by an
+    earlier call, used to skip hashing unchanged files.
+
+    Returns:
+    A dictionary {file name: fingerprint}.
+    """
+    previous = previous or {}
+    fingerprints = {}
+    for path in paths:
+        name = os.path.basename(path)
+        fingerprints[name] = file_fingerprint(path, previous.get(name))
+    return fingerprints
+
+
+def same_content(fingerprints, previous):
+    """ This function compares two fingerprint groups by file name and hash,
+    the modification times are ignored (a touched file is not a change).
+    """
+    previous = previous or {}
+    if sorted(fingerprints) != sorted(previous):
+        return False
+    return all(fingerprints[name]['sha1'] == previous[name].get('sha1')
+               for name in fingerprints)
+
+
+class Manifest(object):
+    """ This class is a JSON backed dictionary of manifest entries, it is
+    safe to update from several threads and it is saved atomically.
+
+    Args:
+    path (string) = The path and file name of the JSON manifest, it does
+    not need to exist yet.
+
+    Examples:
+    >>> manifest = Manifest('C:/CU_ED_SHP/.shp_manifest.json')
+    >>> manifest.get('localhost/cu_ed/public.buildings')
+    {'srid': '26913', 'files': {'buildings.shp': {'size': 5120, ...}, ...}}
+    >>> manifest.set('localhost/cu_ed/public.buildings',
+    ...              {'srid': '26913', 'files': fingerprint_files(paths)})
+    >>> manifest.save()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                print('{} is not a valid manifest, starting over'.format(
+                    path))
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self.entries.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self.entries[key] = value
+
+    def remove(self, key):
+        with self._lock:
+            self.entries.pop(key, None)
+
+    def save(self):
+        with self._lock:
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            if hasattr(os, 'replace'):
+                os.replace(temporary, self.path)
+            else:
+                # python 2 os.rename does not overwrite on Windows
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                os.rename(temporary, self.path)
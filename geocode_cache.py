@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       geocode_cache.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module keeps the TIGER geocoder results between runs. Results are stored
+in a local SQLite file keyed on the normalized address string (normalize_addr
+in the employee table), so only addresses that were never seen, or whose
+entry expired, are sent to the geocoder. Entries are evicted by age and, when
+the cache grows past its size limit, least recently used first. Only the
+standard library is required.
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import sqlite3
+import threading
+import time
+
+
+def cache_key(address):
+    """ This function normalizes an address for the cache lookup (upper case,
+    single spaces), so trivial formatting changes still hit the cache.
+
+    Examples:
+    >>> cache_key(u'1050 Regent Dr,  Boulder CO 80309')
+    u'1050 REGENT DR, BOULDER CO 80309'
+    """
+    return u' '.join(address.upper().split())
+
+
+class GeocodeCache(object):
+    """ This class is a persistent geocode cache.
+
+    Args:
+    path (string) = The SQLite file that holds the cache, it is created when
+    it does not exist.
+    max_age_days (float) (default = 180) = Entries older than this are
+    evicted and geocoded again.
+    max_entries (int) (default = 500000) = When the cache holds more entries,
+    the least recently used ones are evicted.
+
+    Examples:
+    >>> cache = GeocodeCache('C:/cu_employees_data/.geocode_cache.sqlite')
+    >>> hits = cache.lookup([u'1050 Regent Dr, Boulder CO 80309'])
+    >>> cache.store({u'1 Main St, Boulder CO 80302': (-105.2, 40.0, 3)})
+    >>> cache.hit_rate()
+    0.5
+    """
+
+    def __init__(self, path, max_age_days=180, max_entries=500000):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS geocodes ('
+            'address TEXT PRIMARY KEY, lon REAL, lat REAL, rating INTEGER, '
+            'created REAL, used REAL)')
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS geocodes_used ON geocodes (used)')
+        self.connection.commit()
+
+    def lookup(self, addresses, batch=500):
+        """ This method returns the cached results for the addresses, expired
+        entries are ignored.
+
+        Args:
+        addresses (iterable) = The normalized address strings.
+        batch (int) (default = 500) = The number of addresses per query.
+
+        Returns:
+        A dictionary {address: (lon, lat, rating)}, lon and lat are None for
+        addresses the geocoder could not match. Every spelling of an address
+        that has the same cache key gets the result.
+        """
+        addresses = list(addresses)
+        keys = {}
+        for address in addresses:
+            keys.setdefault(cache_key(address), []).append(address)
+        oldest = time.time() - self.max_age_days * 86400
+        found = {}
+        used = []
+        with self._lock:
+            key_list = list(keys)
+            for start in range(0, len(key_list), batch):
+                chunk = key_list[start:start + batch]
+                rows = self.connection.execute(
+                    'SELECT address, lon, lat, rating FROM geocodes '
+                    'WHERE created >= ? AND address IN ({})'.format(
+                        ', '.join('?' * len(chunk))), [oldest] + chunk)
+                for key, lon, lat, rating in rows:
+                    used.append(key)
+                    for address in keys[key]:
+                        found[address] = (lon, lat, rating)
+            now = time.time()
+            self.connection.executemany(
+                'UPDATE geocodes SET used = ? WHERE address = ?',
+                [(now, key) for key in used])
+            self.connection.commit()
+            self.hits += len(found)
+            self.misses += len(addresses) - len(found)
+        return found
+
+    def store(self, results):
+        """ This method adds (or refreshes) geocoder results.
+
+        Args:
+        results (dict) = {address: (lon, lat, rating)}, use (None, None,
+        None) for addresses without a match so they are not retried on every
+        run.
+        """
+        now = time.time()
+        with self._lock:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?)',
+                [(cache_key(address), lon, lat, rating, now, now)
+                 for address, (lon, lat, rating) in results.items()])
+            self.connection.commit()
+
+    def evict(self):
+        """ This method removes the expired entries and, above max_entries,
+        the least recently used ones.
+
+        Returns:
+        The number of entries removed.
+        """
+        oldest = time.time() - self.max_age_days * 86400
+        with self._lock:
+            removed = self.connection.execute(
+                'DELETE FROM geocodes WHERE created < ?', (oldest,)).rowcount
+            count, = self.connection.execute(
+                'SELECT count(*) FROM geocodes').fetchone()
+            if count > self.max_entries:
+                removed += self.connection.execute(
+                    'DELETE FROM geocodes WHERE address IN ('
+                    'SELECT address FROM geocodes ORDER BY used LIMIT ?)',
+                    (count - self.max_entries,)).rowcount
+            self.connection.commit()
+        return removed
+
+    def hit_rate(self):
+        """ This method returns the share of lookups found in the cache.
+        """
+        total = self.hits + self.misses
+        return self.hits / float(total) if total else 0.0
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       gis_catalog.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module keeps a local SQLite catalog of the GIS project folders on the
+share, so finding a layer or a map document is a query instead of a
+recursive walk over the network. The projects follow the structure
+gis_project_folder_structure.py creates: a <PROJECT>_logbook.txt file and
+the <PROJECT>_DOC, <PROJECT>_SHP, ... folders side by side. Every file is
+stored with its project, category (DOC, SHP, ...), extension, size and
+modification time, every project with the fields of its logbook.
+A directory is only listed again when its modification time changed (a file
+was added, removed or renamed in it), the directories that did not change
+are only checked with one stat each. A file modified in place does not
+change its directory, so its size and time are refreshed by a full scan
+(the logbooks are the exception, they are checked on every scan).
+The directories are listed with os.scandir (the scandir package on python 2,
+os.listdir when it is not installed), on windows the listing returns the
+size and time of every entry without another network round trip.
+usage: python gis_catalog.py <index> scan <root> [<root> ...] [--full]
+       python gis_catalog.py <index> find [--name *trees*] [--ext .mxd]
+       python gis_catalog.py <index> projects [--name CAMPUS*]
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import argparse
+import io
+import os
+import sqlite3
+import stat
+import sys
+import threading
+import time
+from gis_project_folder_structure import FOLDER_STRUCTURE, LOGBOOK_SUFFIX
+try:
+    from os import scandir
+except ImportError:
+    # python 2
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+"""the logbook lines and the projects table columns they are stored in"""
+LOGBOOK_FIELDS = [('Project name', 'title'), ('Deliverables', 'deliverables'),
+                  ('Date', 'date'), ('Request by', 'requested_by'),
+                  ('Assigned to', 'assigned_to'), ('Comments', 'comments')]
+
+"""the number of directories listed between two commits of a scan"""
+COMMIT_EVERY = 200
+
+
+class _Entry(object):
+    """ This class stands in for the os.scandir entries when neither
+    os.scandir nor the scandir package is available.
+    """
+
+    def __init__(self, folder, name):
+        self.name = name
+        self.path = os.path.join(folder, name)
+        self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def is_dir(self):
+        return stat.S_ISDIR(self.stat().st_mode)
+
+    def is_file(self):
+        return stat.S_ISREG(self.stat().st_mode)
+
+
+def list_directory(folder):
+    """ This function returns the entries of a directory (name, path,
+    is_dir(), is_file() and stat()).
+    """
+    if scandir is None:
+        entries = []
+        for name in os.listdir(folder):
+            if isinstance(name, bytes) and not isinstance(folder, bytes):
+                # python 2 returns the names it cannot decode as bytes
+                print('Skipping {!r} in {}, the name cannot be decoded'
+                      .format(name, folder))
+                continue
+            entries.append(_Entry(folder, name))
+        return entries
+    return list(scandir(folder))
+
+
+def _norm(path):
+    return os.path.normpath(path).replace('\\', '/')
+
+
+def _subtree(path):
+    """ This helper function returns the range of the paths below a
+    directory, ('/' + 1) is '0', so the range uses the primary key index
+    where a LIKE pattern would not (and would read the _ of the project
+    names as a wildcard).
+    """
+    return path.rstrip('/') + '/', path.rstrip('/') + '0'
+
+
+def _like(pattern):
+    """ This helper function translates a file name pattern (* and ?) into a
+    LIKE pattern, LIKE ignores the case like windows file names do.
+    """
+    escaped = pattern.replace('\\', '\\\\').replace('%', '\\%') \
+        .replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
+
+def category_folder(name):
+    """ This function splits a project folder name into the project name and
+    the category.
+
+    Returns:
+    A tuple (project name, category), None when the name does not end with a
+    FOLDER_STRUCTURE suffix.
+
+    Examples:
+    >>> category_folder('CAMPUS_TREES_SHP')
+    ('CAMPUS_TREES', 'SHP')
+    """
+    upper = name.upper()
+    for suffix in FOLDER_STRUCTURE:
+        if upper.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)], suffix[1:]
+    return None
+
+
+def read_logbook(path):
+    """ This function reads the fields of a project logbook, the comments
+    are every line after 'Comments:'. The logbooks written on windows are
+    cp1252 text, the ones that are not valid UTF-8 are read as cp1252.
+
+    Returns:
+    A dictionary {column: value}, see LOGBOOK_FIELDS.
+
+    Examples:
+    >>> read_logbook('Z:/GIS/CAMPUS_TREES_logbook.txt')['assigned_to']
+    'UG'
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        text = data.decode('cp1252', 'replace')
+    fields = dict((column, None) for _, column in LOGBOOK_FIELDS)
+    labels = dict((label.lower(), column) for label, column in LOGBOOK_FIELDS)
+    comments = None
+    with io.StringIO(text) as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if comments is not None:
+                comments.append(line)
+                continue
+            label, _, value = line.partition(':')
+            column = labels.get(label.strip().lower())
+            if column == 'comments':
+                comments = [value.strip()]
+            elif column is not None:
+                fields[column] = value.strip() or None
+    if comments is not None:
+        fields['comments'] = '\n'.join(comments).strip() or None
+    return fields
+
+
+class GisCatalog(object):
+    """ This class is the catalog of the GIS project folders.
+
+    Args:
+    path (string) = The SQLite file that holds the catalog, it is created
+    when it does not exist.
+
+    Examples:
+    >>> catalog = GisCatalog('C:/Temp/gis_catalog.sqlite')
+    >>> catalog.scan(['Z:/GIS/2017', 'Z:/GIS/2018'])
+    >>> catalog.find(name='*trees*', extension='.mxd')[0]['path']
+    'Z:/GIS/2018/CAMPUS_TREES_MXD/campus_trees.mxd'
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS directories ('
+            'path TEXT PRIMARY KEY, parent TEXT, mtime REAL, project TEXT, '
+            'category TEXT, scanned REAL)')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, directory TEXT, name TEXT, '
+            'extension TEXT, size INTEGER, mtime REAL, project TEXT, '
+            'category TEXT)')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS projects ('
+            'project TEXT PRIMARY KEY, name TEXT, folder TEXT, logbook TEXT, '
+            'logbook_mtime REAL, title TEXT, deliverables TEXT, date TEXT, '
+            'requested_by TEXT, assigned_to TEXT, comments TEXT)')
+        for table, column in [('directories', 'parent'),
+                              ('files', 'directory'), ('files', 'name'),
+                              ('files', 'extension'), ('files', 'project'),
+                              ('projects', 'folder'), ('projects', 'name')]:
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS {0}_{1} ON {0} ({1})'.format(
+                    table, column))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def _remove(self, path):
+        """ This method removes a directory and everything below it from
+        the catalog.
+        """
+        low, high = _subtree(path)
+        for table, column in [('directories', 'path'),
+                              ('files', 'directory'),
+                              ('projects', 'folder')]:
+            self.connection.execute(
+                'DELETE FROM {0} WHERE {1} = ? OR ({1} >= ? AND {1} < ?)'
+                .format(table, column), (path, low, high))
+
+    def _store_project(self, folder, name, logbook):
+        fields = dict((column, None) for _, column in LOGBOOK_FIELDS)
+        mtime = None
+        if logbook is not None:
+            try:
+                mtime = os.stat(logbook).st_mtime
+                fields = read_logbook(logbook)
+            except (IOError, OSError, ValueError):
+                # i.e. removed since the listing, or not text at all
+                logbook, mtime = None, None
+        self.connection.execute(
+            'INSERT OR REPLACE INTO projects VALUES '
+            '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [folder + '/' + name, name, folder, logbook, mtime] +
+            [fields[column] for _, column in LOGBOOK_FIELDS])
+
+    def _list(self, path, parent, mtime, project, category, stats):
+        """ This method lists a directory and replaces its files, its
+        projects and its subdirectories in the catalog.
+
+        Returns:
+        A list of (path, mtime, project, category) of the subdirectories.
+        """
+        try:
+            entries = list_directory(path)
+        except OSError as e:
+            print('Cannot list {}: {}'.format(path, e))
+            stats['errors'] += 1
+            return []
+        stats['listed'] += 1
+        files, folders = [], []
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    folders.append(entry)
+                elif entry.is_file():
+                    files.append(entry)
+            except OSError:
+                # i.e. removed while the directory was listed
+                continue
+        # the projects of this directory, outside the project folders
+        logbooks, projects = {}, {}
+        if project is None:
+            for entry in files:
+                if entry.name.lower().endswith(LOGBOOK_SUFFIX.lower()):
+                    name = entry.name[:-len(LOGBOOK_SUFFIX)]
+                    logbooks[name.upper()] = _norm(entry.path)
+                    projects[name.upper()] = name
+            # two category folders make a project without a logbook
+            prefixes = {}
+            for entry in folders:
+                split = category_folder(entry.name)
+                if split is not None:
+                    prefixes.setdefault(split[0].upper(), []).append(split[0])
+            for key, names in prefixes.items():
+                if len(names) > 1:
+                    projects.setdefault(key, names[0])
+        children = []
+        for entry in folders:
+            child_project, child_category = project, category
+            split = category_folder(entry.name) if project is None else None
+            if split is not None and split[0].upper() in projects:
+                child_project = path + '/' + projects[split[0].upper()]
+                child_category = split[1]
+            try:
+                child_mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            children.append((_norm(entry.path), child_mtime, child_project,
+                             child_category))
+        rows = []
+        for entry in files:
+            try:
+                info = entry.stat()
+            except OSError:
+                continue
+            file_project = project
+            if _norm(entry.path) in logbooks.values():
+                file_project = path + '/' + entry.name[:-len(LOGBOOK_SUFFIX)]
+            rows.append((_norm(entry.path), path, entry.name,
+                         os.path.splitext(entry.name)[1].lower(),
+                         info.st_size, info.st_mtime, file_project,
+                         category))
+        stats['files'] += len(rows)
+        # the subdirectories that are gone
+        current = set(child[0] for child in children)
+        for old, in self.connection.execute(
+                'SELECT path FROM directories WHERE parent = ?',
+                (path,)).fetchall():
+            if old not in current:
+                self._remove(old)
+                stats['removed'] += 1
+        self.connection.execute('DELETE FROM files WHERE directory = ?',
+                                (path,))
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            rows)
+        self.connection.execute('DELETE FROM projects WHERE folder = ?',
+                                (path,))
+        for key, name in projects.items():
+            self._store_project(path, name, logbooks.get(key))
+        stats['logbooks'] += len(logbooks)
+        # the directory is stored last, an interrupted scan lists it again
+        self.connection.execute(
+            'INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?, ?)',
+            (path, parent, mtime, project, category, time.time()))
+        return children
+
+    def _snapshot(self, root):
+        """ This method reads what the catalog holds below a root, so the
+        directories that did not change cost no query.
+
+        Returns:
+        A tuple of dictionaries ({path: (mtime, project, category)},
+        {parent: [(path, project, category)]}, {folder: [(name, logbook,
+        logbook mtime)]}).
+        """
+        low, high = _subtree(root)
+        directories, children, logbooks = {}, {}, {}
+        for path, parent, mtime, project, category in self.connection.execute(
+                'SELECT path, parent, mtime, project, category FROM '
+                'directories WHERE path = ? OR (path >= ? AND path < ?)',
+                (root, low, high)):
+            directories[path] = (mtime, project, category)
+            children.setdefault(parent, []).append((path, project, category))
+        for folder, name, logbook, mtime in self.connection.execute(
+                'SELECT folder, name, logbook, logbook_mtime FROM projects '
+                'WHERE logbook IS NOT NULL AND (folder = ? OR '
+                '(folder >= ? AND folder < ?))', (root, low, high)):
+            logbooks.setdefault(folder, []).append((name, logbook, mtime))
+        return directories, children, logbooks
+
+    def _known(self, path, snapshot, stats):
+        """ This method returns the subdirectories of a directory that did
+        not change from the catalog, with their current modification time,
+        and reads its logbooks again when they were edited.
+        """
+        _, known, logbooks = snapshot
+        children = []
+        for child, project, category in known.get(path, []):
+            try:
+                mtime = os.stat(child).st_mtime
+            except OSError:
+                # removing it would have changed this directory's time
+                self._remove(child)
+                stats['removed'] += 1
+                continue
+            children.append((child, mtime, project, category))
+        for name, logbook, logbook_mtime in logbooks.get(path, []):
+            try:
+                mtime = os.stat(logbook).st_mtime
+            except OSError:
+                continue
+            if mtime != logbook_mtime:
+                self._store_project(path, name, logbook)
+                stats['logbooks'] += 1
+        return children
+
+    def scan(self, roots, full=False):
+        """ This method brings the catalog of the project roots up to date.
+
+        Args:
+        roots (list) = The folders that hold the projects.
+        full (boolean) (default = False) = List every directory, not only the
+        ones whose modification time changed.
+
+        Returns:
+        A dictionary with the number of directories visited and listed, the
+        files stored, the logbooks read, the directories removed, the
+        directories that could not be listed and the seconds taken.
+        """
+        start = time.time()
+        stats = {'directories': 0, 'listed': 0, 'files': 0, 'logbooks': 0,
+                 'removed': 0, 'errors': 0}
+        with self._lock:
+            for root in roots:
+                if isinstance(root, bytes):
+                    # python 2, text paths make the listings text too, sqlite3
+                    # rejects byte strings that are not ascii
+                    root = root.decode(sys.getfilesystemencoding() or 'utf-8')
+                root = _norm(os.path.abspath(root))
+                try:
+                    mtime = os.stat(root).st_mtime
+                except OSError:
+                    print('{} is not available'.format(root))
+                    stats['errors'] += 1
+                    continue
+                snapshot = self._snapshot(root)
+                stack = [(root, None, mtime, None, None)]
+                while stack:
+                    path, parent, mtime, project, category = stack.pop()
+                    stats['directories'] += 1
+                    row = snapshot[0].get(path)
+                    if full or row != (mtime, project, category):
+                        children = self._list(path, parent, mtime, project,
+                                              category, stats)
+                        if stats['listed'] % COMMIT_EVERY == 0:
+                            self.connection.commit()
+                    else:
+                        children = self._known(path, snapshot, stats)
+                    stack.extend((child, path, child_mtime, child_project,
+                                  child_category) for child, child_mtime,
+                                 child_project, child_category in children)
+                self.connection.commit()
+        stats['seconds'] = time.time() - start
+        return stats
+
+    def find(self, name=None, extension=None, category=None, project=None,
+             limit=None):
+        """ This method searches the catalog.
+
+        Args:
+        name (string) (default = None) = A file name pattern, i.e. '*trees*'.
+        extension (string) (default = None) = The extension, i.e. '.mxd'.
+        category (string) (default = None) = The project folder category,
+        i.e. 'SHP'.
+        project (string) (default = None) = A project name pattern.
+        limit (int) (default = None) = The maximum number of files returned.
+
+        Returns:
+        A list of dictionaries (path, directory, name, extension, size,
+        mtime, project, category), sorted by path.
+        """
+        clauses, values = [], []
+        if name is not None:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            values.append(_like(name))
+        if extension is not None:
+            clauses.append('extension = ?')
+            values.append('.' + extension.lower().lstrip('.'))
+        if category is not None:
+            clauses.append('category = ?')
+            values.append(category.upper().lstrip('_'))
+        if project is not None:
+            clauses.append("project IN (SELECT project FROM projects WHERE "
+                           "name LIKE ? ESCAPE '\\')")
+            values.append(_like(project))
+        query = 'SELECT * FROM files'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY path'
+        if limit is not None:
+            query += ' LIMIT {:d}'.format(limit)
+        with self._lock:
+            cursor = self.connection.execute(query, values)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def projects(self, name=None):
+        """ This method returns the projects (project, name, folder, logbook,
+        logbook_mtime and the LOGBOOK_FIELDS columns) whose name matches a
+        pattern, sorted by folder and name.
+        """
+        query = 'SELECT * FROM projects'
+        values = []
+        if name is not None:
+            query += " WHERE name LIKE ? ESCAPE '\\'"
+            values.append(_like(name))
+        with self._lock:
+            cursor = self.connection.execute(query + ' ORDER BY folder, name',
+                                             values)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def main(argv=None):
+    """ This function runs the catalog from the command line.
+
+    Examples:
+    >>> main(['C:/Temp/gis_catalog.sqlite', 'scan', 'Z:/GIS'])
+    >>> main(['C:/Temp/gis_catalog.sqlite', 'find', '--ext', '.mxd'])
+    """
+    parser = argparse.ArgumentParser(
+        description='Catalog the files of the GIS project folders.')
+    parser.add_argument('index', help='the SQLite catalog file')
+    actions = parser.add_subparsers(dest='action', metavar='action')
+    actions.required = True
+    action = actions.add_parser('scan', help='bring the catalog up to date')
+    action.add_argument('roots', nargs='+',
+                        help='the folders that hold the projects')
+    action.add_argument('--full', action='store_true',
+                        help='list every directory again')
+    action = actions.add_parser('find', help='search the files')
+    action.add_argument('--name', help='a file name pattern, i.e. *trees*')
+    action.add_argument('--ext', help='the extension, i.e. .mxd')
+    action.add_argument('--category', help='the project folder, i.e. SHP')
+    action.add_argument('--project', help='a project name pattern')
+    action.add_argument('--limit', type=int, help='the maximum number of '
+                        'files listed')
+    action = actions.add_parser('projects', help='list the projects')
+    action.add_argument('--name', help='a project name pattern')
+    args = parser.parse_args(argv)
+
+    catalog = GisCatalog(args.index)
+    try:
+        if args.action == 'scan':
+            stats = catalog.scan(args.roots, full=args.full)
+            print('{directories} directories ({listed} listed), {files} '
+                  'files stored, {logbooks} logbooks read, {removed} '
+                  'directories removed, {errors} errors in {seconds:.2f} '
+                  'seconds'.format(**stats))
+            return 1 if stats['errors'] else 0
+        if args.action == 'find':
+            for row in catalog.find(args.name, args.ext, args.category,
+                                    args.project, args.limit):
+                print('{:>12}  {}  {}'.format(
+                    row['size'], time.strftime(
+                        '%Y-%m-%d %H:%M', time.localtime(row['mtime'])),
+                    row['path']))
+            return 0
+        for row in catalog.projects(args.name):
+            print('{}  {}  {}'.format(row['project'], row['date'] or '',
+                                      row['assigned_to'] or ''))
+        return 0
+    finally:
+        catalog.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
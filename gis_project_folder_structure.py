@@ -10,7 +10,7 @@ Python Version:   2.7.8
 --------------------------------------------------------------------------------
 This script creates the standard folder structure for the CAD/GIS Office at
 CU Boulder GIS projects, it creates 10 empty folders and 1 logbook text file.
-The folder_structure python list can be expanded to accomodate more file
+The FOLDER_STRUCTURE python list can be expanded to accomodate more file
 extensions. The script only requires a standard python installation, no special
 dependencies are required.
 --------------------------------------------------------------------------------
@@ -20,6 +20,14 @@ from __future__ import print_function
 import os
 import time
 
+"""the folders of a GIS project, their names are the project name followed
+by these suffixes (see gis_catalog.py)"""
+FOLDER_STRUCTURE = ['_DOC', '_IMG', '_GDB', '_LYR', '_MXD',
+                    '_PDF', '_SHP', '_XLSX', '_SCRIPTS', '_CAD']
+
+"""the suffix of a project's logbook file"""
+LOGBOOK_SUFFIX = '_logbook.txt'
+
 
 def simple_path_retriever(vpath):
     """ This helper function prompts the user for a path while checking if the
@@ -41,12 +49,17 @@ def simple_path_retriever(vpath):
     return path
 
 
-def gis_folder_structure(folderpath):
+def gis_folder_structure(folderpath, project_name=None, p_author=None):
     """
     This function creates the folder structure we use for our GIS projects,
     this is an ongoing effort to standardize our processes.
     Args:
     folderpath (string) = A string representation of the folder location.
+    project_name (string) (default = None) = The project name, it is prompted
+    for when it is None. A ValueError is raised when the given name does not
+    start with a letter.
+    p_author (string) (default = None) = The author's initials, they are
+    prompted for when they are None.
     Returns:
     10 folders and 1 text file.
     Examples:
@@ -56,20 +69,23 @@ def gis_folder_structure(folderpath):
     J.
     Where would you like me to create your GIS project structure<path>?:
     """
+    # making sure the project name starts with a string and not with a digit,
+    # only the prompted names can be asked for again
+    if project_name is not None and not project_name[:1].isalpha():
+        raise ValueError('the project name {!r} does not start with a '
+                         'letter'.format(project_name))
     os.chdir(folderpath)
-    folder_structure = ['_DOC', '_IMG', '_GDB', '_LYR', '_MXD',
-                        '_PDF', '_SHP', '_XLSX', '_SCRIPTS', '_CAD']
-    project_name = raw_input('Please enter the project name: ')
-    p_author = raw_input('Please enter your initials: ').upper()
-    project_name = project_name.upper()
-    # making sure the project name starts with a string and not with a digit
-    while not project_name[0].isalpha():
+    while project_name is None or not project_name[:1].isalpha():
         project_name = raw_input('Please enter the project name: ')
+    if p_author is None:
+        p_author = raw_input('Please enter your initials: ')
+    p_author = p_author.upper()
+    project_name = project_name.upper()
     print(project_name)
-    for ext in folder_structure:
+    for ext in FOLDER_STRUCTURE:
         if not os.path.exists(project_name + ext):
             os.makedirs(project_name + ext)
-    logbook = open(project_name + '_logbook.txt', 'w')
+    logbook = open(project_name + LOGBOOK_SUFFIX, 'w')
     # getting current time in 12 hour format
     current_time = time.strftime("%d/%m/%Y")
     logbook.write('Project name: %s\n' % project_name)
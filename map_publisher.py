@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       map_publisher.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   10.3
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module publishes a batch of map documents (mxd) as hosted services. Every
+map goes through three steps, draft (.sddraft), stage (.sd) and upload, and
+the maps are processed by a pool of workers. Failed steps are retried with an
+exponential backoff, unless the backend raises a PublishingError (a failure
+that retrying cannot fix, i.e. the draft analysis found errors). The steps
+are done by a backend object:
+draft(mxd_loc, out_dir)   returns the path of the .sddraft file
+stage(sddraft, out_dir)   returns the path of the .sd file
+upload(sd)                publishes the service
+ArcpyPublishingBackend uses arcpy and the portal, LocalPublishingBackend only
+writes placeholder files and can be used to exercise a batch without ArcGIS.
+arcpy is not thread safe, a backend whose thread_safe attribute is False is
+run on a pool of processes (it must be picklable), the others on threads.
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import os
+import threading
+import time
+from functools import partial
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+
+class PublishingError(Exception):
+    """ A publishing failure that is not retried.
+    """
+
+
+def _service_name(mxd_loc):
+    return os.path.splitext(os.path.basename(mxd_loc))[0]
+
+
+class ArcpyPublishingBackend(object):
+    """ This backend drafts, stages and uploads the services with arcpy.
+
+    Args:
+    groups (list) (default = None) = A list of group names with which to
+    share the services.
+    portal (string) (default = 'MY_HOSTED_SERVICES') = A string representing
+    the server type. The string 'MY_HOSTED_SERVICES' represents
+    My Hosted Services server type for ArcGIS Online or Portal for ArcGIS.
+    """
+
+    # every map is published in its own process
+    thread_safe = False
+
+    def __init__(self, groups=None, portal='MY_HOSTED_SERVICES'):
+        self.groups = groups
+        self.portal = portal
+
+    def draft(self, mxd_loc, out_dir):
+        import arcpy
+        map_document = arcpy.mapping.MapDocument(mxd_loc)
+        service_name = _service_name(mxd_loc)
+        sddraft = os.path.join(out_dir, '{}.sddraft'.format(service_name))
+        analysis = arcpy.mapping.CreateMapSDDraft(
+            map_document, sddraft, service_name, self.portal)
+        if analysis['errors']:
+            raise PublishingError('draft analysis errors: {}'.format(
+                analysis['errors']))
+        return sddraft
+
+    def stage(self, sddraft, out_dir):
+        import arcpy
+        sd = os.path.join(out_dir, '{}.sd'.format(
+            os.path.splitext(os.path.basename(sddraft))[0]))
+        if os.path.exists(sd):
+            os.remove(sd)
+        arcpy.StageService_server(sddraft, sd)
+        return sd
+
+    def upload(self, sd):
+        import arcpy
+        arcpy.UploadServiceDefinition_server(sd, self.portal,
+                                             in_groups=self.groups)
+
+
+class LocalPublishingBackend(object):
+    """ This backend stands in for arcpy and the portal, every step writes a
+    placeholder file and sleeps for the given number of seconds.
+
+    Args:
+    seconds (float) (default = 0) = The time every step takes.
+    failures (dict) (default = None) = {(service name, step): n}, the step
+    raises an IOError the first n times it runs for that service.
+
+    Examples:
+    >>> backend = LocalPublishingBackend(failures={('webmap', 'upload'): 2})
+    >>> publish_maps(['webmap.mxd'], backend, out_dir, backoff=0)
+    """
+
+    thread_safe = True
+
+    def __init__(self, seconds=0, failures=None):
+        self.seconds = seconds
+        self.failures = dict(failures or {})
+        self.uploaded = []
+        self._lock = threading.Lock()
+
+    def _step(self, name, step):
+        time.sleep(self.seconds)
+        with self._lock:
+            if self.failures.get((name, step)):
+                self.failures[(name, step)] -= 1
+                raise IOError('{} {} failed'.format(name, step))
+
+    def draft(self, mxd_loc, out_dir):
+        name = _service_name(mxd_loc)
+        self._step(name, 'draft')
+        sddraft = os.path.join(out_dir, '{}.sddraft'.format(name))
+        with open(sddraft, 'w') as f:
+            f.write(mxd_loc)
+        return sddraft
+
+    def stage(self, sddraft, out_dir):
+        name = os.path.splitext(os.path.basename(sddraft))[0]
+        self._step(name, 'stage')
+        sd = os.path.join(out_dir, '{}.sd'.format(name))
+        with open(sd, 'w') as f:
+            f.write(sddraft)
+        return sd
+
+    def upload(self, sd):
+        name = os.path.splitext(os.path.basename(sd))[0]
+        self._step(name, 'upload')
+        with self._lock:
+            self.uploaded.append(name)
+
+
+def _with_retries(func, args, entry, retries, backoff):
+    """ This helper function calls func, retrying it up to retries times
+    with an exponential backoff (backoff, 2 * backoff, 4 * backoff, ...).
+    """
+    attempt = 0
+    while True:
+        try:
+            return func(*args)
+        except PublishingError:
+            raise
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            entry['retries'] += 1
+            print('{} {} failed ({}), retrying'.format(
+                entry['map'], func.__name__, e))
+            time.sleep(backoff * 2 ** attempt)
+            attempt += 1
+
+
+def print_publishing_report(report):
+    """ This function prints the per map timings returned by publish_maps.
+    """
+    width = max([len(entry['map']) for entry in report] + [3])
+    print('{:<{w}}  {:>8}  {:>8}  {:>8}  {:>7}  {}'.format(
+        'map', 'draft', 'stage', 'upload', 'retries', 'status', w=width))
+    for entry in report:
+        print('{:<{w}}  {:>8.2f}  {:>8.2f}  {:>8.2f}  {:>7}  {}'.format(
+            entry['map'], entry['draft'], entry['stage'], entry['upload'],
+            entry['retries'], entry['status'], w=width))
+        if entry['error']:
+            print('    {}'.format(entry['error']))
+
+
+def _publish_map(mxd_loc, backend, out_dir, retries, backoff):
+    """ This helper function drafts, stages and uploads one map, it runs in
+    a worker thread or process (see publish_maps).
+    """
+    entry = {'map': _service_name(mxd_loc), 'draft': 0.0, 'stage': 0.0,
+             'upload': 0.0, 'seconds': 0.0, 'retries': 0,
+             'status': 'failed', 'error': ''}
+    start = time.time()
+    result = mxd_loc
+    try:
+        for step in ('draft', 'stage', 'upload'):
+            step_start = time.time()
+            try:
+                args = (result,) if step == 'upload' else (result, out_dir)
+                result = _with_retries(getattr(backend, step), args, entry,
+                                       retries, backoff)
+            finally:
+                entry[step] = time.time() - step_start
+        entry['status'] = 'ok'
+    except Exception as e:
+        entry['error'] = '{}: {}'.format(type(e).__name__, e)
+    entry['seconds'] = time.time() - start
+    return entry
+
+
+def publish_maps(mxds, backend, out_dir, workers=4, retries=3, backoff=5.0):
+    """ This function drafts, stages and uploads a list of map documents
+    through a pool of workers, threads when the backend is thread safe and
+    processes otherwise (arcpy).
+
+    Args:
+    mxds (list) = The paths and file names of the mxd documents.
+    backend (object) = An ArcpyPublishingBackend, LocalPublishingBackend or
+    any object with the same draft, stage and upload methods.
+    out_dir (string) = The folder for the .sddraft and .sd files.
+    workers (int) (default = 4) = The number of maps published at the same
+    time.
+    retries (int) (default = 3) = The number of times a failed step is
+    retried.
+    backoff (float) (default = 5.0) = The seconds before the first retry, it
+    doubles with every retry.
+
+    Returns:
+    A list with one dictionary per map (map, draft, stage, upload, seconds,
+    retries, status and error), the step timings are in seconds and status
+    is 'ok' or 'failed'.
+
+    Examples:
+    >>> publish_maps(glob.glob('/CU_ED_MXD/*.mxd'),
+    ...              ArcpyPublishingBackend(['group']), sdd_outloc)
+    map                          draft     stage    upload  retries  status
+    sustainable_transportation   12.41    183.20    95.77        0  ok
+    """
+    publish = partial(_publish_map, backend=backend, out_dir=out_dir,
+                      retries=retries, backoff=backoff)
+    size = max(1, min(workers, len(mxds)))
+    if getattr(backend, 'thread_safe', True):
+        pool = ThreadPool(size)
+    else:
+        pool = Pool(size)
+    try:
+        report = pool.map(publish, mxds)
+    finally:
+        pool.close()
+        pool.join()
+    print_publishing_report(report)
+    return report
@@ -16,20 +16,22 @@ resulting feature classes will be stored in the provided PARK_MI.gdb
 
 from __future__ import print_function
 import os
+import argparse
 import glob
-import pandas as pd
-import re
-from num2words import num2words
-import arcpy
-from arcpy import env
-env.overwriteOutput = True
-env.qualifiedFieldNames = "UNQUALIFIED"
-
-
-"""this dictionary was created manually due to data constraints.The name of
-the keys have to exactly matched the excel volume data filename,
-i.e 'j-100-15 Colorado - Folsom VOL.xls'. The spatial reference system is our
-standard projection: NAD_1983_HARN_StatePlane_Colorado_North_FIPS_0501_Feet
+import time
+from functools import partial
+from multiprocessing import Pool
+from excel_cache import ExcelCache
+from feature_writers import ArcpyFeatureWriter, GeoPackageWriter
+from sensor_registry import SensorRegistry, sensor_id_from_file
+
+
+"""this dictionary was created manually due to data constraints, it is the
+default sensor registry (see sensor_registry.py), a registry file is used
+for any other sensor. The keys start with the sensor id of the excel volume
+data filename, i.e 'j-100-15 Colorado - Folsom VOL.xls'. The spatial
+reference system is our standard projection:
+NAD_1983_HARN_StatePlane_Colorado_North_FIPS_0501_Feet
 """
 SENSORS_COORDINATES = {'j-100-15 Colorado - Folsom VOL.xls':
                        (3066000.14, 1245908.47),
@@ -67,16 +69,151 @@ def path_retriever(ws):
     return path
 
 
-def movein_dataparser():
+def _parse_column(values, formats):
+    """ This helper function parses a column with the first of formats that
+    matches each value, the values no format matches are parsed by pandas
+    without a format (i.e. cells excel already stored as dates or times) and
+    are NaT when that fails too. A sensor file repeats the same days and
+    hours many times, so only the distinct values are parsed.
+    """
+    import pandas as pd
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques)
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    text = uniques.astype(str).str.strip()
+    for date_format in formats:
+        missing = parsed.isnull()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=date_format,
+                                         errors='coerce')
+    for index in parsed[parsed.isnull()].index:
+        try:
+            parsed[index] = pd.Timestamp(str(uniques[index]))
+        except (ValueError, TypeError):
+            pass
+    # factorize codes missing values as -1, that is the NaT appended last
+    parsed = pd.concat([parsed, pd.Series([pd.NaT], dtype=parsed.dtype)])
+    return pd.Series(parsed.values.take(codes), index=values.index)
+
+
+def parse_timestamps(day, hour):
+    """ This function builds the sensor timestamps from the day and hour
+    columns of a CUPD volume file in one vectorized pass.
+
+    Args:
+    day (pandas.Series) = The days, i.e. '8/16/2016'.
+    hour (pandas.Series) = The hours, i.e. '11:30 PM'.
+
+    Returns:
+    A pandas Series of datetime64 values, NaT where the day or the hour
+    could not be parsed.
+
+    Examples:
+    >>> parse_timestamps(pd.Series(['8/16/2016']), pd.Series(['11:30 PM']))
+    0   2016-08-16 23:30:00
+    dtype: datetime64[ns]
+    """
+    days = _parse_column(day, ['%m/%d/%Y', '%m/%d/%y'])
+    hours = _parse_column(hour, ['%I:%M %p', '%I:%M:%S %p', '%H:%M',
+                                 '%H:%M:%S'])
+    # keeping only the time of day of the parsed hours
+    return days.dt.normalize() + (hours - hours.dt.normalize())
+
+
+def _add_timestamps(df):
+    """ This helper function adds the DATE column to a parsed volume sheet,
+    i.e. 8/16/2016 and 11:30 PM become 2016-08-16 23:30:00. It is the
+    transform cached by ExcelCache under TIMESTAMPS_TAG.
+    """
+    df.insert(5, 'DATE', parse_timestamps(df['Unnamed: 1'],
+                                          df['Unnamed: 2']))
+    return df
+
+
+"""change this tag whenever _add_timestamps (or parse_timestamps) changes,
+so the cached sheets are parsed again"""
+TIMESTAMPS_TAG = 'movein-timestamps-1'
+
+
+def parse_volume_file(vol_data, cache_folder=None):
+    """ This function parses a CUPD volume excel file, it runs in the worker
+    processes of movein_dataparser so it only returns data.
+
+    Args:
+    vol_data (string) = The path and file name of the excel file.
+    cache_folder (string) (default = None) = An ExcelCache folder (see
+    excel_cache.py), unchanged files are read from it instead of parsed.
+
+    Returns:
+    A dictionary with the file name, the parsed rows (frame), the rows
+    whose day or hour could not be parsed (rejects) and the parse time in
+    seconds.
+    """
+    start = time.time()
+    if cache_folder is None:
+        import pandas as pd
+        xl = pd.ExcelFile(vol_data)
+        # first sheet
+        sheet = xl.sheet_names[0]
+        df = _add_timestamps(xl.parse(sheet, skiprows=11))
+    else:
+        df = ExcelCache(cache_folder).parse(vol_data, skiprows=11,
+                                            transform=_add_timestamps,
+                                            tag=TIMESTAMPS_TAG)
+    rejects = df[df['DATE'].isnull()]
+    df = df[df['DATE'].notnull()]
+    # preparing dataframe for arcmap by adding headers to the date
+    df = df.rename(
+        columns={'Unnamed: 0': 'OBJECTID', 'Unnamed: 1': 'DAY',
+                 'Unnamed: 2': 'HOUR', 'Unnamed: 3': 'VOL_LEFTLANE',
+                 'Unnamed: 4': 'VOL_RIGHTLANE'})
+    return {'file': os.path.basename(vol_data), 'frame': df,
+            'rejects': rejects, 'parse': time.time() - start}
+
+
+def print_file_report(report):
+    """ This function prints the per file timings of movein_dataparser.
+    """
+    width = max([len(entry['file']) for entry in report] + [4])
+    print('{:<{w}}  {:>8}  {:>8}  {:>8}  {:>7}'.format(
+        'file', 'rows', 'parse s', 'write s', 'rejects', w=width))
+    for entry in report:
+        print('{:<{w}}  {:>8}  {:>8.2f}  {:>8.2f}  {:>7}'.format(
+            entry['file'], entry['rows'], entry['parse'], entry['write'],
+            entry['rejects'], w=width))
+
+
+def movein_dataparser(xls_path=None, writer=None, workers=None,
+                      store=None, registry=None, cache_folder=None):
     """
     This function iterates over a folder collecting only the files with
     extension xls that contains the keyword 'VOL'. The logic follows the
     naming conventions that are already in place for the CUPD sensor excel
-    files.
+    files. The files are parsed by a pool of processes and written one at a
+    time by this process, so the geodatabase writes stay serialized.
     Args:
+    xls_path (string) (default = None) = The folder with the excel files,
+    the user is prompted for it when it is None.
+    writer (object) (default = None) = The feature writer (see
+    feature_writers.py), i.e. a GeoPackageWriter, an ArcpyFeatureWriter on
+    the PARK_MI.gdb (the user is prompted for it) is used when it is None.
+    workers (int) (default = None) = The number of parsing processes, it
+    defaults to the number of CPUs.
+    store (VolumeStore) (default = None) = When given, the readings are also
+    added to this columnar store (see volume_store.py) and its rollups are
+    updated.
+    registry (SensorRegistry) (default = None) = The sensors' locations and
+    feature class names, SENSORS_COORDINATES is used when it is None.
+    cache_folder (string) (default = None) = An ExcelCache folder (see
+    excel_cache.py), the files that did not change since they were cached
+    are not parsed again.
 
     Returns:
-    Creates 4 feature classes , one per each sensor file.
+    Creates one feature class per sensor file. The rows whose
+    day or hour cannot be parsed are left out and listed in a
+    <feature class>_rejects.csv file in the excel folder. Returns a list with
+    one dictionary per file (file, rows, rejects, parse and write seconds).
 
     Examples:
     >>> movein_dataparser()
@@ -85,92 +222,113 @@ def movein_dataparser():
     J.
     Please enter a valid path for PARK_MI_XLSX:
     """
+    if store is not None:
+        from volume_store import LANES
     # setting up the workspaces
-    XLS_PATH = path_retriever('PARK_MI_XLSX')
-    # this gdb was created in advance at the start of the project
-    GDB_PATH = path_retriever('PARK_MI.gdb')
-    os.chdir(XLS_PATH)
-    env.workspace = GDB_PATH
-    xls_list = glob.glob('*.xls')
-    # print(xls_list)
+    XLS_PATH = xls_path or path_retriever('PARK_MI_XLSX')
+    if writer is None:
+        from arcpy import env
+        env.overwriteOutput = True
+        env.qualifiedFieldNames = "UNQUALIFIED"
+        # this gdb was created in advance at the start of the project
+        GDB_PATH = path_retriever('PARK_MI.gdb')
+        env.workspace = GDB_PATH
+        writer = ArcpyFeatureWriter(GDB_PATH)
+    xls_list = glob.glob(os.path.join(XLS_PATH, '*.xls'))
     # getting the excel files for volume data
-    volume_data_files = [xls for xls in xls_list if 'VOL' in xls]
+    volume_data_files = [xls for xls in xls_list
+                         if 'VOL' in os.path.basename(xls)]
     print("""
       Processing the following files:
       %s
-      """ % volume_data_files)
-    # reading the data in the excel files (xls, note the version of the
-    # files)
-    for vol_data in volume_data_files:
-        xl = pd.ExcelFile(vol_data)
-        # first sheet
-        sheet = xl.sheet_names[0]
-        df = xl.parse(sheet, skiprows=11)
-        df.insert(5, 'DATE', 'x')
-        # iterating over the rows in the current dataframe
-        for index, row in df.iterrows():
-            # arcgis online format m/d/yyyy h:mm
-            # i.e. 8/16/2016  11:30:00 PM
-            day = row['Unnamed: 1']
-            hour = row['Unnamed: 2']
-            # using a bit of regex to parse the data
-            hour_pattern = '\w\w\s'
-            hour_repla = hour[3:5] + ':00' + ' '
-            parsed_hour_data = re.sub(hour_pattern, hour_repla, hour)
-            # setting DATE to the new hour values
-            df.loc[index, 'DATE'] = day + ' ' + parsed_hour_data
-            # print(day, hour, parsed_hour_data)
-        # preparing dataframe for arcmap by adding headers to the date
-        df.rename(
-            columns={'Unnamed: 0': 'OBJECTID', 'Unnamed: 1': 'DAY',
-                     'Unnamed: 2': 'HOUR', 'Unnamed: 3': 'VOL_LEFTLANE',
-                     'Unnamed: 4': 'VOL_RIGHTLANE'}, inplace=True)
-        # highly dependent on naming convention:
-        # 'j-100-15 Colorado - Folsom VOL.xls'
-        fc_name = vol_data[9:-4].replace(' ', '').replace('-', '_')
-        # transforming digits into words to follow arcmap feature classes
-        # naming rules
-        if fc_name[0].isdigit():
-            pattern = re.search('\d\d|\d', fc_name)
-            num = int(pattern.group(0))
-            numword = num2words(num)
-            fc_name = re.sub(str(num), numword, fc_name)
-        # creating feature classes from data
-        # harcoding our standard spatial reference
-        # NAD_1983_HARN_StatePlane_Colorado_North_FIPS_0501_Feet
-        # ESRI code: 2876
-        sr = arcpy.SpatialReference(2876)
-        # create point object from dictionay elements
-        for k, v in SENSORS_COORDINATES.iteritems():
-            if vol_data in k:
-                # creating point geomtry object
-                pt = arcpy.PointGeometry(arcpy.Point(
-                    SENSORS_COORDINATES[k][0], SENSORS_COORDINATES[k][1]), sr)
-        # creating empty feature class
-        arcpy.CreateFeatureclass_management(env.workspace, fc_name,
-                                            'POINT', '', '',
-                                            '', sr)
-        # adding necessary fields
-        field_names = list(df.columns.values)
-        field_names.remove('OBJECTID')
-        field_names.insert(0, 'SHAPE@')
-        # ['SHAPE@', 'DAY', 'HOUR', 'VOL_LEFTLANE', 'VOL_RIGHTLANE', 'DATE']
-        '''change this part to make it explicit'''
-        arcpy.AddField_management(fc_name, 'VOL_LEFTLANE', 'DOUBLE')
-        arcpy.AddField_management(fc_name, 'VOL_RIGHTLANE', 'DOUBLE')
-        arcpy.AddField_management(fc_name, 'DAY', 'TEXT')
-        arcpy.AddField_management(fc_name, 'HOUR', 'TEXT')
-        arcpy.AddField_management(fc_name, 'DATE', 'DATE')
-        for pd_index, pd_row in df.iterrows():
-            with arcpy.da.InsertCursor(fc_name, field_names) as cursor:
-                # directly inserting geometry using the "SHAPE@" token
-                cursor.insertRow((pt, pd_row[1], pd_row[2], pd_row[3],
-                                  pd_row[4], pd_row[5]))
-        print('%s feature class was successfully created' % fc_name)
+      """ % [os.path.basename(xls) for xls in volume_data_files])
+    if registry is None:
+        registry = SensorRegistry.from_coordinates(SENSORS_COORDINATES)
+    report = []
+    pool = Pool(workers)
+    try:
+        # reading the data in the excel files (xls, note the version of
+        # the files), the results arrive in the order they finish
+        parse = partial(parse_volume_file, cache_folder=cache_folder)
+        for parsed in pool.imap_unordered(parse, volume_data_files):
+            vol_data = parsed['file']
+            sensor = registry.lookup(vol_data)
+            fc_name = sensor.fc_name if sensor else \
+                os.path.splitext(vol_data)[0]
+            entry = {'file': vol_data, 'rows': len(parsed['frame']),
+                     'rejects': len(parsed['rejects']),
+                     'parse': parsed['parse'], 'write': 0.0}
+            report.append(entry)
+            if entry['rejects']:
+                reject_report = os.path.join(
+                    XLS_PATH, '{}_rejects.csv'.format(fc_name))
+                parsed['rejects'].to_csv(reject_report, encoding='utf-8')
+                print('{} rows with an unknown day or hour, see {}'.format(
+                    entry['rejects'], reject_report))
+            if store is not None and sensor_id_from_file(vol_data):
+                store.ingest(sensor_id_from_file(vol_data),
+                             parsed['frame']['DATE'],
+                             parsed['frame'][list(LANES)].values)
+            # the files without a registered sensor are reported at the end
+            if sensor is None:
+                continue
+            start = time.time()
+            # creating the feature class (the schema is VOLUME_FIELDS) and
+            # inserting the rows in batches
+            writer.create(fc_name)
+            writer.write(fc_name, parsed['frame'], *sensor.xy)
+            entry['write'] = time.time() - start
+            print('%s feature class was successfully created' % fc_name)
+    finally:
+        pool.close()
+        pool.join()
+        writer.close()
+    registry.report_unknown()
+    print_file_report(report)
+    return report
 
 
-if __name__ == "__main__":
-    print("""Hello, I will parse the data for you
+def main(argv=None):
+    """ This function runs the command line interface, argv defaults to
+    the script's arguments (sys.argv[1:]).
+    """
+    parser = argparse.ArgumentParser(
+        description='Translates the CUPD traffic volume excel files into '
+        'feature classes. Without arguments the paths are prompted for.')
+    parser.add_argument('--xls', help='the folder with the *VOL*.xls files')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--gdb', help='the PARK_MI.gdb geodatabase')
+    output.add_argument('--gpkg', help='a GeoPackage, written without arcpy')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='the number of parsing processes')
+    parser.add_argument('--sensors', help='a sensor registry .csv or .json '
+                        'file (see sensor_registry.py)')
+    parser.add_argument('--cache', help='a folder where the parsed excel '
+                        'files are cached (see excel_cache.py)')
+    parser.add_argument('--store', help='a volume store folder that is '
+                        'updated with the readings (see volume_store.py)')
+    args = parser.parse_args(argv)
+    writer = None
+    if args.gpkg:
+        writer = GeoPackageWriter(args.gpkg)
+    elif args.gdb:
+        from arcpy import env
+        env.overwriteOutput = True
+        env.qualifiedFieldNames = "UNQUALIFIED"
+        env.workspace = args.gdb
+        writer = ArcpyFeatureWriter(args.gdb)
+    if args.xls is None:
+        print("""Hello, I will parse the data for you
 Regards,
 J.""")
-    movein_dataparser()
+    store = None
+    if args.store:
+        from volume_store import VolumeStore
+        store = VolumeStore(args.store)
+    registry = SensorRegistry.load(args.sensors) if args.sensors else None
+    movein_dataparser(args.xls, writer, args.workers, store, registry,
+                      args.cache)
+
+
+if __name__ == "__main__":
+    main()
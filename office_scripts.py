@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       office_scripts.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   10.4
+AutoCAD Version:  20.1
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This script is the single command line entry point of the CAD/GIS Office
+scripts. Every step is a subcommand:
+ingest      loads the latest employees excel file into PostgreSQL
+load-shp    loads a folder of shapefiles into PostgreSQL
+run-sql     runs a SQL script against PostgreSQL
+publish     publishes mxd documents to ArcGIS Online
+clean-dwg   standardizes a folder of AutoCAD drawings
+area-report reports the BLDG layer areas of a folder of DXF floor plans
+movein      translates the CUPD traffic volume files into feature classes
+scaffold    creates the folder structure of a new GIS project
+catalog     indexes and searches the files of the GIS project folders
+Only the standard library is imported at startup, the modules of a
+subcommand (and pandas, sqlalchemy, arcpy, win32com or num2words with them)
+are imported when the subcommand runs, so the help text and the light steps
+start fast and do not need ArcGIS or AutoCAD installed.
+The database subcommands read the credentials file cu_ed_web_map uses, one
+python dictionary with the dbname, dbuser and dbpassword keys.
+usage: python office_scripts.py <subcommand> [options]
+       python office_scripts.py <subcommand> --help
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import argparse
+import ast
+import glob
+import os
+import sys
+
+"""the modules that must not be imported before a subcommand runs (see
+benchmarks.bench_startup)"""
+HEAVY_MODULES = ('arcpy', 'num2words', 'numpy', 'pandas', 'sqlalchemy',
+                 'win32com')
+
+"""the subcommands build_parser adds, in the order of the --help listing"""
+SUBCOMMANDS = ('ingest', 'load-shp', 'run-sql', 'publish', 'clean-dwg',
+               'area-report', 'movein', 'scaffold', 'catalog')
+
+
+def read_credentials(path):
+    """ This function reads a credentials file, the last line holding a
+    python dictionary wins.
+
+    Returns:
+    A tuple (db, user, password).
+
+    Examples:
+    >>> read_credentials('C:/credentials.txt')
+    ('cu_ed', 'gis_user', 'secret')
+    """
+    login_dict = None
+    with open(path, 'r') as c:
+        for line in c:
+            if line.strip():
+                login_dict = ast.literal_eval(line)
+    if not login_dict:
+        raise ValueError('no credentials in {}'.format(path))
+    return (login_dict['dbname'], login_dict['dbuser'],
+            login_dict['dbpassword'])
+
+
+def ingest(args):
+    from cu_ed_web_map import employees_to_postgresql
+    from excel_cache import ExcelCache
+    db, user, password = read_credentials(args.credentials)
+    cache = None
+    # the copy mode streams the sheet, it does not use the cache
+    if not args.no_cache and args.mode != 'copy':
+        cache = ExcelCache(os.path.join(args.folder, '.excel_cache'))
+    employees_to_postgresql(db, user, password, args.host, args.schema,
+                            cu_ed_loc=args.folder, load_mode=args.mode,
+                            chunksize=args.chunksize, key_column=args.key,
+                            cache=cache)
+    return 0
+
+
+def load_shp(args):
+    from cu_ed_web_map import load_shps_to_postgresql
+    db, user, password = read_credentials(args.credentials)
+    report = load_shps_to_postgresql(
+        db, user, password, args.host, args.schema, srid=args.srid,
+        shp_loc=args.folder, workers=args.workers, loader=args.loader,
+        force=args.force)
+    return 1 if any(r['returncode'] != 0 for r in report) else 0
+
+
+def run_sql(args):
+    from cu_ed_web_map import run_sql_on_db
+    db, user, password = read_credentials(args.credentials)
+    report = run_sql_on_db(db, user, password, args.script, args.host,
+                           args.schema, transaction=not args.autocommit,
+                           savepoints=args.savepoints, workers=args.workers)
+    return 1 if any(e['status'] == 'failed' for e in report) else 0
+
+
+def publish(args):
+    from map_publisher import ArcpyPublishingBackend, publish_maps
+    mxds = sorted(set(mxd for pattern in args.mxds
+                      for mxd in glob.glob(pattern)))
+    if not mxds:
+        print('No map documents match {}'.format(' '.join(args.mxds)))
+        return 1
+    backend = ArcpyPublishingBackend(args.group or None, args.portal)
+    report = publish_maps(mxds, backend, args.out, workers=args.workers,
+                          retries=args.retries)
+    return 1 if any(e['status'] != 'ok' for e in report) else 0
+
+
+def clean_dwg(args):
+    from dwg_floorplans_cleaner import dwgs_cleaner
+    report = dwgs_cleaner(args.folder, workers=args.workers,
+                          retries=args.retries, force=args.force,
+                          dry_run=args.dry_run, timed=args.timed,
+                          lisp_cache=args.lisp_cache, script=args.script)
+    if args.dry_run or args.script:
+        return 0
+    return 1 if any(e['status'] != 'ok' for e in report) else 0
+
+
+def area_report(args):
+    from dxf_area_report import dxf_area_report
+    results = dxf_area_report(args.folder, args.report, args.layers,
+                              args.workers, args.boundaries)
+    return 1 if any(r['error'] for r in results) else 0
+
+
+def movein(args, extra):
+    # the movein options belong to its own parser
+    from movein_project_csv_formatting import main as movein_main
+    movein_main(extra)
+    return 0
+
+
+def scaffold(args):
+    from gis_project_folder_structure import gis_folder_structure
+    gis_folder_structure(args.folder, args.name, args.initials)
+    return 0
+
+
+def catalog(args, extra):
+    # the catalog options belong to its own parser
+    from gis_catalog import main as catalog_main
+    return catalog_main(extra)
+
+
+def build_parser():
+    """ This function builds the command line parser, every subcommand sets
+    the function that runs it as its 'command' default.
+    """
+    parser = argparse.ArgumentParser(
+        description='CAD/GIS Office scripts, run a subcommand with --help '
+        'for its options.')
+    subcommands = parser.add_subparsers(dest='subcommand',
+                                        metavar='subcommand')
+    subcommands.required = True
+    # the options shared by the database subcommands
+    database = argparse.ArgumentParser(add_help=False)
+    database.add_argument('--credentials', required=True,
+                          help='the credentials file (a python dictionary '
+                          'with dbname, dbuser and dbpassword)')
+    database.add_argument('--host', default='localhost',
+                          help='the PostgreSQL host (default: localhost)')
+    database.add_argument('--schema', default='public',
+                          help='the target schema (default: public)')
+
+    command = subcommands.add_parser(
+        'ingest', parents=[database],
+        help='load the latest employees excel file into PostgreSQL')
+    command.add_argument('folder', help='the folder with the excel files')
+    command.add_argument('--mode', default='replace',
+                         choices=['replace', 'copy', 'delta'],
+                         help='the load mode (default: replace)')
+    command.add_argument('--chunksize', type=int, default=50000,
+                         help='the rows per chunk in the copy mode')
+    command.add_argument('--key', help='the key column of the delta mode')
+    command.add_argument('--no-cache', action='store_true',
+                         help='parse the excel file even when it did not '
+                         'change (the copy mode never uses the cache)')
+    command.set_defaults(command=ingest)
+
+    command = subcommands.add_parser(
+        'load-shp', parents=[database],
+        help='load a folder of shapefiles into PostgreSQL')
+    command.add_argument('folder', help='the folder with the shapefiles')
+    command.add_argument('--srid', default='26913',
+                         help='the SRID of the shapefiles (default: 26913)')
+    command.add_argument('--workers', type=int, default=4,
+                         help='the number of layers loaded at the same time')
+    command.add_argument('--loader', default='shp2pgsql',
+                         choices=['shp2pgsql', 'native'],
+                         help='the loader (default: shp2pgsql)')
+    command.add_argument('--force', action='store_true',
+                         help='load the layers that did not change too')
+    command.set_defaults(command=load_shp)
+
+    command = subcommands.add_parser(
+        'run-sql', parents=[database],
+        help='run a SQL script against PostgreSQL')
+    command.add_argument('script', help='the SQL script')
+    command.add_argument('--workers', type=int, default=1,
+                         help='run the independent statements on this many '
+                         'connections')
+    command.add_argument('--autocommit', action='store_true',
+                         help='commit every statement on its own')
+    command.add_argument('--savepoints', action='store_true',
+                         help='roll back a failing statement on its own')
+    command.set_defaults(command=run_sql)
+
+    command = subcommands.add_parser(
+        'publish', help='publish mxd documents to ArcGIS Online')
+    command.add_argument('mxds', nargs='+',
+                         help='the mxd files or glob patterns')
+    command.add_argument('--out', required=True,
+                         help='the folder for the .sddraft and .sd files')
+    command.add_argument('--group', action='append',
+                         help='a group the services are shared with, it '
+                         'can be repeated')
+    command.add_argument('--portal', default='MY_HOSTED_SERVICES',
+                         help='the server connection (default: '
+                         'MY_HOSTED_SERVICES)')
+    command.add_argument('--workers', type=int, default=4,
+                         help='the number of maps published at the same '
+                         'time')
+    command.add_argument('--retries', type=int, default=3,
+                         help='the number of retries of a failed step')
+    command.set_defaults(command=publish)
+
+    command = subcommands.add_parser(
+        'clean-dwg', help='standardize a folder of AutoCAD drawings')
+    command.add_argument('folder', help='the folder with the drawings')
+    command.add_argument('--workers', type=int, default=1,
+                         help='the number of hidden AutoCAD instances')
+    command.add_argument('--retries', type=int, default=1,
+                         help='the number of retries of a failed drawing, on '
+                         'a restarted instance')
+    command.add_argument('--force', action='store_true',
+                         help='clean the unchanged drawings too')
+    command.add_argument('--dry-run', action='store_true',
+                         help='only list the drawings that would be cleaned')
+    command.add_argument('--timed', action='store_true',
+                         help='report the seconds of every step')
+    command.add_argument('--lisp-cache',
+                         help='the local folder for the lisp routines copies')
+    command.add_argument('--script',
+                         help='write an AutoCAD script (.scr) for the '
+                         'drawings instead of running AutoCAD')
+    command.set_defaults(command=clean_dwg)
+
+    command = subcommands.add_parser(
+        'area-report',
+        help='report the BLDG layer areas of a folder of DXF floor plans')
+    command.add_argument('folder', help='the folder with the *.dxf files')
+    command.add_argument('report', help='the CSV report, one row per '
+                         'drawing and layer')
+    command.add_argument('--layers', nargs='+', default=['BLDG*'],
+                         help='the layer name patterns (default: BLDG*)')
+    command.add_argument('--workers', type=int, default=None,
+                         help='the number of processes')
+    command.add_argument('--boundaries', help='a CSV file with one row per '
+                         'boundary')
+    command.set_defaults(command=area_report)
+
+    # --help is passed on to the movein parser with the other options
+    command = subcommands.add_parser(
+        'movein', add_help=False,
+        help='translate the CUPD traffic volume files into feature classes '
+        '(movein --help lists its options)')
+    command.set_defaults(command=movein)
+
+    command = subcommands.add_parser(
+        'scaffold', help='create the folder structure of a GIS project')
+    command.add_argument('folder', help='the folder the project goes in')
+    command.add_argument('--name', help='the project name, it starts with a '
+                         'letter (prompted for when missing)')
+    command.add_argument('--initials', help="the author's initials "
+                         '(prompted for when missing)')
+    command.set_defaults(command=scaffold)
+
+    command = subcommands.add_parser(
+        'catalog', add_help=False,
+        help='index and search the files of the GIS project folders '
+        '(catalog --help lists its options)')
+    command.set_defaults(command=catalog)
+    return parser
+
+
+def main(argv=None):
+    """ This function runs a subcommand.
+
+    Returns:
+    The exit status, 0 when the subcommand succeeded.
+
+    Examples:
+    >>> main(['run-sql', '--credentials', 'C:/credentials.txt',
+    ...       'cu_ed_map_layers.sql'])
+    """
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command in (movein, catalog):
+        return args.command(args, extra)
+    if extra:
+        parser.error('unrecognized arguments: {}'.format(' '.join(extra)))
+    if args.command is scaffold:
+        # an invalid --name is a usage error, not a crash
+        try:
+            return scaffold(args)
+        except ValueError as e:
+            parser.error(str(e))
+    return args.command(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       pipeline_context.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+PostgreSQL Version: 9.4
+--------------------------------------------------------------------------------
+This module holds the database session shared by the steps of the
+cu_ed_web_map pipeline. A PipelineContext owns a single pooled SQLAlchemy
+engine, it can open the pool's connections ahead of time (warm up) and it
+keeps track of how long the steps waited for a connection. The session
+settings a step changes (i.e. SET search_path in a SQL script) are reset
+when its connection goes back to the pool, so they do not leak into the next
+step. It can be passed wherever an engine is expected (connect, begin and
+dialect).
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+
+
+def _reset_session(dbapi_connection, connection_record):
+    """ This pool listener resets the session settings of a connection that
+    is checked in. RESET ALL goes back to the connection's startup options,
+    so the search_path set by PipelineContext stays (DISCARD ALL cannot run
+    inside the transaction psycopg2 opens).
+    """
+    if dbapi_connection is None:
+        # the connection was invalidated
+        return
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('RESET ALL')
+        finally:
+            cursor.close()
+        dbapi_connection.commit()
+    except Exception as e:
+        # a broken connection is replaced instead of reused
+        connection_record.invalidate(e)
+
+
+class PipelineContext(object):
+    """ This class owns the pooled engine the pipeline steps share.
+
+    Args:
+    db (string) = The name of the target PostgreSQL database.
+    user (string) = The user name of the target PostgreSQL database.
+    password (string) = The corresponding user password.
+    host (string) (default = 'localhost') = The host where the PostgreSQL
+    service runs (host or host:port).
+    schema (string) (default = 'public') = The target schema, it goes first
+    in the connections' search_path (public stays on it for PostGIS).
+    pool_size (int) (default = 4) = The number of connections kept open.
+    max_overflow (int) (default = 4) = The number of extra connections
+    opened under load.
+    pool_timeout (int) (default = 30) = The seconds a step waits for a free
+    connection before giving up.
+
+    Examples:
+    >>> with PipelineContext(db_name, db_user, db_password) as context:
+    ...     context.warm_up()
+    ...     run_sql_on_db(db_name, db_user, db_password, ed_format,
+    ...                   context=context)
+    """
+
+    def __init__(self, db, user, password, host='localhost', schema='public',
+                 pool_size=4, max_overflow=4, pool_timeout=30):
+        self.db = db
+        self.user = user
+        self.password = password
+        self.host = host
+        self.schema = schema
+        self.pool_size = pool_size
+        """authenticating to the PostgreSQL db by using a URI
+        (Uniform Resource Identifier).
+        """
+        self.uri = 'postgresql://{}:{}@{}/{}'.format(user, password, host,
+                                                     db)
+        search_path = schema if schema == 'public' else \
+            '{},public'.format(schema)
+        self.engine = create_engine(
+            self.uri, pool_size=pool_size, max_overflow=max_overflow,
+            pool_timeout=pool_timeout, pool_recycle=3600,
+            connect_args={'options': '-csearch_path={}'.format(search_path)})
+        event.listen(self.engine, 'checkin', _reset_session)
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.warm_up_seconds = 0.0
+
+    @property
+    def dialect(self):
+        return self.engine.dialect
+
+    def connect(self):
+        """ This method checks a connection out of the pool and records how
+        long it took (the pool opens a new connection when none is free).
+        """
+        start = time.time()
+        con = self.engine.connect()
+        waited = time.time() - start
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return con
+
+    @contextmanager
+    def begin(self):
+        """ This method yields a connection inside a transaction, it is
+        committed when the block succeeds and rolled back otherwise.
+        """
+        con = self.connect()
+        try:
+            with con.begin():
+                yield con
+        finally:
+            con.close()
+
+    def warm_up(self, connections=None):
+        """ This method opens the pool's connections at the same time, so
+        the steps do not pay for connection setup later on.
+
+        Args:
+        connections (int) (default = None) = The number of connections to
+        open, it defaults to the pool size.
+        """
+        connections = connections or self.pool_size
+        start = time.time()
+        opened = []
+        errors = []
+
+        def open_one():
+            try:
+                con = self.engine.connect()
+                with self._lock:
+                    opened.append(con)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=open_one)
+                   for _ in range(connections)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # returning the connections to the pool
+        for con in opened:
+            con.close()
+        self.warm_up_seconds = time.time() - start
+        if errors:
+            raise errors[0]
+        print('{} connections opened in {:.2f} s'.format(
+            len(opened), self.warm_up_seconds))
+
+    def report(self):
+        """ This method prints the connection pool usage.
+        """
+        average = self.wait_seconds / self.checkouts if self.checkouts else 0
+        print('{} connection checkouts, {:.2f} s waiting in total '
+              '({:.3f} s average, {:.3f} s max), warm up {:.2f} s'.format(
+                  self.checkouts, self.wait_seconds, average,
+                  self.max_wait_seconds, self.warm_up_seconds))
+
+    def dispose(self):
+        """ This method closes every pooled connection.
+        """
+        self.engine.dispose()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.report()
+        self.dispose()
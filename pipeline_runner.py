@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       pipeline_runner.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module runs a script's steps as a graph of stages with checkpoints. Every
+stage declares the files it reads (inputs) and the stages it waits for
+(after). A stage is skipped when its last run succeeded, its inputs did not
+change and none of the stages it waits for ran again, so rerunning a failed
+pipeline resumes at the failed stage. Stages that do not wait for each other
+run at the same time. The checkpoints are stored in a JSON manifest (see
+file_manifest.py).
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import glob
+import hashlib
+import os
+import time
+from multiprocessing.pool import ThreadPool
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+from file_manifest import Manifest, file_fingerprint
+
+
+class Stage(object):
+    """ This class describes a pipeline stage.
+
+    Args:
+    name (string) = A unique stage name.
+    func (function) = The function that runs the stage.
+    args (tuple) (default = ()) = The positional arguments of func.
+    kwargs (dict) (default = None) = The keyword arguments of func.
+    inputs (list) (default = ()) = The files (or glob patterns) the stage
+    reads, their content decides whether the stage has to run again.
+    after (list) (default = ()) = The names of the stages that have to finish
+    before this one.
+    version (string) (default = '') = Changing it forces the stage to run
+    again (i.e. when its settings change).
+    check (function) (default = None) = For functions that report errors
+    instead of raising them, it receives func's return value and returns an
+    error message, the stage fails when the message is not empty.
+
+    Examples:
+    >>> Stage('format', run_sql_on_db, (db, user, password, ed_format),
+    ...       inputs=[ed_format], after=['geocode'])
+    """
+
+    def __init__(self, name, func, args=(), kwargs=None, inputs=(), after=(),
+                 version='', check=None):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.inputs = list(inputs)
+        self.after = list(after)
+        self.version = version
+        self.check = check
+
+    def input_files(self):
+        """ This method expands the stage's input patterns into file paths.
+        """
+        paths = set()
+        for pattern in self.inputs:
+            paths.update(path for path in glob.glob(pattern)
+                         if os.path.isfile(path))
+        return sorted(paths)
+
+
+class PipelineRunner(object):
+    """ This class runs stages in dependency order and keeps their
+    checkpoints.
+
+    Args:
+    stages (list) = The Stage objects.
+    checkpoint_loc (string) = The path and file name of the JSON checkpoint
+    manifest.
+    workers (int) (default = 2) = The number of stages that can run at the
+    same time.
+
+    Examples:
+    >>> runner = PipelineRunner(stages, 'cu_ed_web_map_checkpoints.json')
+    >>> runner.run()
+    stage        status      seconds
+    ingest       skipped        0.00
+    load_shp     ran           81.20
+    ...
+    """
+
+    def __init__(self, stages, checkpoint_loc, workers=2):
+        self.stages = dict((stage.name, stage) for stage in stages)
+        self.order = [stage.name for stage in stages]
+        for stage in stages:
+            for name in stage.after:
+                if name not in self.stages:
+                    raise ValueError('{} waits for an unknown stage {}'.format(
+                        stage.name, name))
+        self.checkpoints = Manifest(checkpoint_loc)
+        self.workers = workers
+
+    def _downstream(self, name):
+        """ This helper method returns the stage and every stage that waits
+        for it, directly or not.
+        """
+        names = set([name])
+        changed = True
+        while changed:
+            changed = False
+            for stage in self.stages.values():
+                if stage.name not in names and names.intersection(
+                        stage.after):
+                    names.add(stage.name)
+                    changed = True
+        return names
+
+    def _fingerprint(self, stage, fingerprints, previous):
+        """ This helper method hashes a stage's version, inputs and the
+        fingerprints of the stages it waits for. The files are keyed by their
+        full path, two inputs can have the same file name (i.e. two
+        employees.xlsx in different folders).
+        """
+        paths = stage.input_files()
+        previous_files = previous.get('files') or {}
+        files = {}
+        digest = hashlib.sha1(stage.version.encode('utf-8'))
+        for path in paths:
+            key = os.path.abspath(path).replace('\\', '/')
+            files[key] = file_fingerprint(path, previous_files.get(key))
+            digest.update(path.encode('utf-8'))
+            digest.update(files[key]['sha1'].encode('ascii'))
+        for name in sorted(stage.after):
+            digest.update(fingerprints[name].encode('ascii'))
+        return digest.hexdigest(), files
+
+    def run(self, resume_from=None, force=False):
+        """ This method runs the pipeline.
+
+        Args:
+        resume_from (string) (default = None) = Run this stage and everything
+        downstream of it even if their checkpoints are up to date.
+        force (boolean) (default = False) = Run every stage.
+
+        Returns:
+        A dictionary {stage name: {'status', 'seconds', 'error'}}, status is
+        'ran', 'skipped', 'failed' or 'blocked' (a stage it waits for
+        failed).
+        """
+        rerun = set(self.order) if force else set()
+        if resume_from is not None:
+            rerun.update(self._downstream(resume_from))
+        report = dict((name, {'status': 'blocked', 'seconds': 0.0,
+                              'error': ''}) for name in self.order)
+        fingerprints = {}
+        ran = set()
+        waiting = dict((name, set(self.stages[name].after))
+                       for name in self.order)
+        finished = Queue()
+
+        def run_stage(name, fingerprint, files):
+            stage = self.stages[name]
+            start = time.time()
+            try:
+                result = stage.func(*stage.args, **stage.kwargs)
+                error = stage.check(result) if stage.check else ''
+                if error:
+                    raise RuntimeError(error)
+                report[name]['status'] = 'ran'
+                self.checkpoints.set(name, {
+                    'fingerprint': fingerprint, 'files': files,
+                    'finished': time.time()})
+            except Exception as e:
+                report[name]['status'] = 'failed'
+                report[name]['error'] = '{}: {}'.format(type(e).__name__, e)
+                self.checkpoints.remove(name)
+            report[name]['seconds'] = time.time() - start
+            self.checkpoints.save()
+            finished.put(name)
+
+        pool = ThreadPool(max(1, self.workers))
+
+        def start(name):
+            stage = self.stages[name]
+            previous = self.checkpoints.get(name) or {}
+            fingerprint, files = self._fingerprint(stage, fingerprints,
+                                                   previous)
+            fingerprints[name] = fingerprint
+            if name not in rerun and not ran.intersection(stage.after) and \
+                    previous.get('fingerprint') == fingerprint:
+                report[name]['status'] = 'skipped'
+                finished.put(name)
+            else:
+                ran.add(name)
+                pool.apply_async(run_stage, (name, fingerprint, files))
+
+        try:
+            for name in self.order:
+                if not waiting[name]:
+                    start(name)
+            pending = set(self.order)
+            while pending:
+                name = finished.get()
+                pending.discard(name)
+                if report[name]['status'] == 'failed':
+                    # the stages downstream stay 'blocked'
+                    pending.difference_update(self._downstream(name))
+                    continue
+                for other in self.order:
+                    if name in waiting[other]:
+                        waiting[other].discard(name)
+                        if not waiting[other]:
+                            start(other)
+        finally:
+            pool.close()
+            pool.join()
+        self.print_report(report)
+        return report
+
+    def print_report(self, report):
+        """ This method prints every stage's status and wall-clock time.
+        """
+        width = max(len(name) for name in self.order + ['stage'])
+        print('{:<{w}}  {:<8}  {:>9}'.format('stage', 'status', 'seconds',
+                                             w=width))
+        for name in self.order:
+            entry = report[name]
+            print('{:<{w}}  {:<8}  {:>9.2f}'.format(
+                name, entry['status'], entry['seconds'], w=width))
+            if entry['error']:
+                print('    {}'.format(entry['error']))
+        skipped = [n for n in self.order if report[n]['status'] == 'skipped']
+        print('{} of {} stages skipped, {:.2f} s in total'.format(
+            len(skipped), len(self.order),
+            sum(entry['seconds'] for entry in report.values())))
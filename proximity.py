@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       proximity.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+PostgreSQL Version: 9.4
+--------------------------------------------------------------------------------
+This module answers distance questions about the geocoded employees in
+memory, so commute scenarios (distance bands, nearest transit stop, employees
+within a radius) can be tried without running the PostGIS map-layer script
+again. The employee points are loaded once into NumPy arrays and indexed with
+scipy's cKDTree when scipy is installed, or with a uniform grid otherwise.
+Queries take arrays of points and are answered in vectorized batches. The
+lon/lat coordinates are projected to meters with an equirectangular
+projection centered on the points, its error is well below one percent for
+the distances of a commute.
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import numpy as np
+import pandas as pd
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+EARTH_RADIUS = 6371008.8
+
+
+def project_lonlat(lon, lat, origin_lat):
+    """ This function projects lon/lat degrees to x/y meters (equirectangular
+    projection, true scale at origin_lat).
+
+    Returns:
+    A tuple of NumPy arrays (x, y).
+    """
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    x = EARTH_RADIUS * lon * np.cos(np.radians(origin_lat))
+    return x, EARTH_RADIUS * lat
+
+
+class GridIndex(object):
+    """ This class indexes points in a uniform grid of square cells, the
+    points are sorted by cell so the points of a cell are a contiguous slice.
+
+    Args:
+    x (array) = The x coordinates in meters.
+    y (array) = The y coordinates in meters.
+    cell_size (float) (default = 1000) = The cell side in meters, about the
+    typical query radius works best.
+    """
+
+    def __init__(self, x, y, cell_size=1000.0):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.cell_size = float(cell_size)
+        self.x0 = self.x.min() if len(self.x) else 0.0
+        self.y0 = self.y.min() if len(self.y) else 0.0
+        self.nx = int((self.x.max() - self.x0) // self.cell_size) + 1 \
+            if len(self.x) else 1
+        self.ny = int((self.y.max() - self.y0) // self.cell_size) + 1 \
+            if len(self.y) else 1
+        cells = self._cells(self.x, self.y)
+        cell_id = cells[1] * self.nx + cells[0]
+        self.order = np.argsort(cell_id, kind='mergesort')
+        self.counts = np.bincount(cell_id, minlength=self.nx * self.ny)
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+
+    def _cells(self, x, y):
+        return ((x - self.x0) // self.cell_size).astype(np.int64), \
+            ((y - self.y0) // self.cell_size).astype(np.int64)
+
+    def _candidates(self, cx, cy, queries):
+        """ This helper method returns the (query, point) pairs for the
+        points in the cells (cx, cy), one cell per query.
+        """
+        inside = (cx >= 0) & (cx < self.nx) & (cy >= 0) & (cy < self.ny)
+        queries = queries[inside]
+        cell_id = cy[inside] * self.nx + cx[inside]
+        counts = self.counts[cell_id]
+        total = counts.sum()
+        query_idx = np.repeat(queries, counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+        point_idx = self.order[np.repeat(self.starts[cell_id], counts) +
+                               offsets]
+        return query_idx, point_idx
+
+    def _pairs_within(self, qx, qy, radius):
+        """ This helper method returns the (query, point, distance) pairs
+        closer than radius.
+        """
+        cx, cy = self._cells(qx, qy)
+        queries = np.arange(len(qx))
+        reach = int(np.ceil(radius / self.cell_size))
+        found = []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                query_idx, point_idx = self._candidates(cx + dx, cy + dy,
+                                                        queries)
+                distance = np.hypot(self.x[point_idx] - qx[query_idx],
+                                    self.y[point_idx] - qy[query_idx])
+                keep = distance <= radius
+                found.append((query_idx[keep], point_idx[keep],
+                              distance[keep]))
+        return [np.concatenate(parts) for parts in zip(*found)]
+
+    def count_within(self, qx, qy, radius):
+        query_idx = self._pairs_within(qx, qy, radius)[0]
+        return np.bincount(query_idx, minlength=len(qx))
+
+    def within(self, qx, qy, radius):
+        query_idx, point_idx = self._pairs_within(qx, qy, radius)[:2]
+        order = np.argsort(query_idx, kind='mergesort')
+        bounds = np.cumsum(np.bincount(query_idx, minlength=len(qx)))[:-1]
+        return np.split(point_idx[order], bounds)
+
+    def nearest(self, qx, qy):
+        """ This method searches rings of cells around the queries until the
+        best point found is closer than any unvisited cell.
+        """
+        # the search starts from the closest grid cell for queries outside
+        # the grid, the cells beyond a ring are still at least ring cells
+        # away from them
+        cx, cy = self._cells(qx, qy)
+        cx, cy = np.clip(cx, 0, self.nx - 1), np.clip(cy, 0, self.ny - 1)
+        best = np.full(len(qx), np.inf)
+        best_idx = np.full(len(qx), -1, dtype=np.int64)
+        pending = np.arange(len(qx))
+        ring = 0
+        while len(pending) and ring <= max(self.nx, self.ny):
+            for dx in range(-ring, ring + 1):
+                for dy in range(-ring, ring + 1):
+                    if max(abs(dx), abs(dy)) != ring:
+                        continue
+                    query_idx, point_idx = self._candidates(
+                        cx[pending] + dx, cy[pending] + dy, pending)
+                    if not len(query_idx):
+                        continue
+                    distance = np.hypot(self.x[point_idx] - qx[query_idx],
+                                        self.y[point_idx] - qy[query_idx])
+                    # keeping the closest candidate of every query
+                    order = np.lexsort((distance, query_idx))
+                    query_idx, point_idx, distance = query_idx[order], \
+                        point_idx[order], distance[order]
+                    first = np.concatenate(([True],
+                                            query_idx[1:] != query_idx[:-1]))
+                    query_idx, point_idx, distance = query_idx[first], \
+                        point_idx[first], distance[first]
+                    better = distance < best[query_idx]
+                    best[query_idx[better]] = distance[better]
+                    best_idx[query_idx[better]] = point_idx[better]
+            # the cells outside the ring are at least ring cells away
+            pending = pending[best[pending] > ring * self.cell_size]
+            ring += 1
+        return best, best_idx
+
+
+class KDTreeIndex(object):
+    """ This class wraps scipy's cKDTree with the GridIndex methods.
+    """
+
+    def __init__(self, x, y):
+        self.tree = cKDTree(np.column_stack((x, y)))
+
+    def count_within(self, qx, qy, radius):
+        return np.asarray(self.tree.query_ball_point(
+            np.column_stack((qx, qy)), radius, return_length=True))
+
+    def within(self, qx, qy, radius):
+        return [np.asarray(sorted(points), dtype=np.int64) for points in
+                self.tree.query_ball_point(np.column_stack((qx, qy)), radius)]
+
+    def nearest(self, qx, qy):
+        return self.tree.query(np.column_stack((qx, qy)))
+
+
+def build_index(x, y, cell_size=1000.0):
+    """ This function indexes points with cKDTree when scipy is installed,
+    with a GridIndex otherwise. Both have the same methods:
+    count_within(qx, qy, radius)  the number of points within radius
+    within(qx, qy, radius)        a list with the point indexes within radius
+    nearest(qx, qy)               the distance and index of the nearest point
+    """
+    if cKDTree is not None:
+        return KDTreeIndex(x, y)
+    return GridIndex(x, y, cell_size)
+
+
+class ProximityEngine(object):
+    """ This class holds the geocoded employee points in memory and answers
+    proximity queries against them.
+
+    Args:
+    frame (pandas.DataFrame) = The employee rows with lon and lat columns,
+    rows without coordinates are ignored.
+    cell_size (float) (default = 1000) = The GridIndex cell side in meters.
+
+    Examples:
+    >>> engine = ProximityEngine.from_table(context, 'cu_employees_data')
+    >>> engine.band_counts([-105.2705], [40.0076], [1000, 5000, 10000])
+       center  0-1000  1000-5000  5000-10000
+    0       0    2210      14880       11302
+    >>> nearest = engine.nearest_stop(stops.lon, stops.lat)
+    >>> engine.write(context, nearest, 'cu_ed_nearest_stop')
+    """
+
+    def __init__(self, frame, cell_size=1000.0):
+        frame = frame[frame['lon'].notnull() & frame['lat'].notnull()]
+        self.ids = frame.index.values
+        self.origin_lat = float(frame['lat'].mean()) if len(frame) else 0.0
+        self.x, self.y = self.project(frame['lon'].values,
+                                      frame['lat'].values)
+        self.index = build_index(self.x, self.y, cell_size)
+
+    @classmethod
+    def from_table(cls, engine, table, schema='public', cell_size=1000.0,
+                   key_column=None):
+        """ This method loads the employee points from the table written by
+        employees_to_postgresql and geocode_employees.
+
+        Args:
+        engine (sqlalchemy.engine.Engine) = The database engine, or a
+        PipelineContext.
+        table (string) = The name of the employee table.
+        schema (string) (default = 'public') = The name of the schema.
+        cell_size (float) (default = 1000) = The GridIndex cell side in
+        meters.
+        key_column (string) (default = None) = The column that identifies an
+        employee. When it is None the "index" column the replace and copy
+        modes write is used, the delta mode writes no index, so the
+        employees are then numbered in table order.
+        """
+        from sqlalchemy.sql import text
+        from bulk_loader import quote_identifier
+        qualified = '{}.{}'.format(quote_identifier(schema),
+                                   quote_identifier(table))
+        con = engine.connect()
+        try:
+            if key_column is None:
+                columns = list(con.execute(text(
+                    'SELECT * FROM {} LIMIT 0'.format(qualified))).keys())
+                if 'index' in columns:
+                    key_column = 'index'
+            select = 'lon, lat' if key_column is None else '{}, lon, lat' \
+                .format(quote_identifier(key_column))
+            frame = pd.read_sql(text(
+                'SELECT {} FROM {} WHERE lon IS NOT NULL AND lat IS NOT '
+                'NULL'.format(select, qualified)), con, index_col=key_column)
+        finally:
+            con.close()
+        return cls(frame, cell_size)
+
+    def project(self, lon, lat):
+        return project_lonlat(lon, lat, self.origin_lat)
+
+    def distances(self, lon, lat):
+        """ This method returns the distance in meters from every employee to
+        the point (lon, lat).
+        """
+        x, y = self.project(lon, lat)
+        return np.hypot(self.x - x, self.y - y)
+
+    def band_counts(self, lon, lat, bands):
+        """ This method counts the employees in every distance band around
+        each center.
+
+        Args:
+        lon (array) = The center longitudes.
+        lat (array) = The center latitudes.
+        bands (list) = The increasing band limits in meters, i.e.
+        [1000, 5000, 10000] counts 0-1000, 1000-5000 and 5000-10000.
+
+        Returns:
+        A pandas DataFrame with one row per center and one column per band.
+        """
+        qx, qy = self.project(np.atleast_1d(lon), np.atleast_1d(lat))
+        cumulative = np.column_stack(
+            [self.index.count_within(qx, qy, radius) for radius in bands])
+        counts = np.diff(np.column_stack(
+            (np.zeros(len(qx), dtype=cumulative.dtype), cumulative)), axis=1)
+        limits = [0] + list(bands)
+        frame = pd.DataFrame(counts, columns=[
+            '{:g}-{:g}'.format(low, high)
+            for low, high in zip(limits[:-1], limits[1:])])
+        frame.index.name = 'center'
+        return frame
+
+    def band_of_employees(self, lon, lat, bands):
+        """ This method assigns every employee the distance band it falls in
+        around a single center, employees beyond the last band get
+        len(bands).
+
+        Returns:
+        A pandas DataFrame (index = employee, distance, band).
+        """
+        distance = self.distances(lon, lat)
+        return pd.DataFrame({'distance': distance,
+                             'band': np.searchsorted(bands, distance)},
+                            index=pd.Index(self.ids, name='index'))
+
+    def nearest_stop(self, stop_lon, stop_lat, stop_ids=None):
+        """ This method finds the nearest stop to every employee.
+
+        Args:
+        stop_lon (array) = The stop longitudes.
+        stop_lat (array) = The stop latitudes.
+        stop_ids (array) (default = None) = The stop identifiers, the
+        positions of the stops are used when it is None.
+
+        Returns:
+        A pandas DataFrame (index = employee, stop, distance).
+        """
+        sx, sy = self.project(stop_lon, stop_lat)
+        distance, position = build_index(sx, sy).nearest(self.x, self.y)
+        stops = np.arange(len(sx)) if stop_ids is None else \
+            np.asarray(stop_ids)
+        return pd.DataFrame({'stop': stops[position], 'distance': distance},
+                            index=pd.Index(self.ids, name='index'))
+
+    def within_radius(self, lon, lat, radius):
+        """ This method lists the employees within radius meters of each
+        point.
+
+        Returns:
+        A pandas DataFrame (center, employee), one row per pair.
+        """
+        qx, qy = self.project(np.atleast_1d(lon), np.atleast_1d(lat))
+        found = self.index.within(qx, qy, radius)
+        centers = np.repeat(np.arange(len(found)),
+                            [len(points) for points in found])
+        points = np.concatenate(found) if found else np.array([], dtype=int)
+        return pd.DataFrame({'center': centers,
+                             'employee': self.ids[points.astype(np.int64)]})
+
+    def write(self, engine, frame, table, schema='public'):
+        """ This method writes a query result to a table (replacing it).
+
+        Args:
+        engine (sqlalchemy.engine.Engine) = The database engine, or a
+        PipelineContext.
+        frame (pandas.DataFrame) = A result returned by one of the queries.
+        table (string) = The name of the target table.
+        schema (string) (default = 'public') = The name of the schema.
+        """
+        con = engine.connect()
+        try:
+            with con.begin():
+                frame.to_sql(table, con, schema=schema, if_exists='replace')
+        finally:
+            con.close()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       sensor_registry.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   10.3.1
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module keeps the CUPD traffic sensors: their id, name, location and
+output feature class name. The registry is loaded from a CSV or JSON file
+and indexed by the sensor id, the id is parsed from the start of the volume
+file name (i.e. 'j-100-15' in 'j-100-15 Colorado - Folsom VOL.xls'), so
+renamed exports still match and a lookup is a single dictionary access. The
+feature class names are validated once, when the registry is loaded. Files
+without a registered sensor are collected and reported together.
+CSV columns (JSON objects have the same keys):
+sensor_id, name, x, y, fc_name (optional, derived from name when empty)
+The coordinates are in our standard projection:
+NAD_1983_HARN_StatePlane_Colorado_North_FIPS_0501_Feet (ESRI code: 2876)
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import csv
+import io
+import json
+import os
+import re
+
+"""the sensor id at the start of a CUPD file name, i.e. 'j-100-15'"""
+SENSOR_ID = re.compile(r'^([a-z]-\d+-\d+)', re.IGNORECASE)
+
+
+def sensor_id_from_file(file_name):
+    """ This function returns the sensor id of a CUPD volume file name, None
+    when the name does not start with one.
+
+    Examples:
+    >>> sensor_id_from_file('j-100-15 Colorado - Folsom VOL.xls')
+    'j-100-15'
+    """
+    match = SENSOR_ID.match(os.path.basename(file_name))
+    return match.group(1).lower() if match else None
+
+
+def feature_class_name(name):
+    """ This function turns a sensor name into a valid feature class name:
+    spaces are removed, dashes and other invalid characters become
+    underscores and a leading number is spelled out (arcmap feature class
+    names cannot start with a digit).
+
+    Examples:
+    >>> feature_class_name('18th St - Broadway VOL')
+    'eighteenthSt_BroadwayVOL'
+    """
+    fc_name = name.replace(' ', '').replace('-', '_')
+    fc_name = re.sub(r'\W', '_', fc_name)
+    # transforming digits into words to follow arcmap feature classes
+    # naming rules
+    if fc_name[:1].isdigit():
+        from num2words import num2words
+        pattern = re.search(r'\d\d|\d', fc_name)
+        num = int(pattern.group(0))
+        numword = num2words(num)
+        fc_name = re.sub(str(num), numword, fc_name)
+    return fc_name[:160]
+
+
+class Sensor(object):
+    """ This class holds a registered sensor.
+
+    Args:
+    sensor_id (string) = The id, i.e. 'j-100-15'.
+    name (string) = The location name, i.e. 'Colorado - Folsom'.
+    x (float) = The x coordinate.
+    y (float) = The y coordinate.
+    fc_name (string) (default = None) = The output feature class name, it is
+    derived from name when it is None.
+    """
+
+    def __init__(self, sensor_id, name, x, y, fc_name=None):
+        self.sensor_id = sensor_id.lower()
+        self.name = name
+        self.xy = (float(x), float(y))
+        self.fc_name = feature_class_name(fc_name or name)
+        self._geometry = None
+
+    def geometry(self, spatial_reference=2876):
+        """ This method returns the sensor's arcpy PointGeometry, it is
+        built once.
+        """
+        if self._geometry is None:
+            import arcpy
+            self._geometry = arcpy.PointGeometry(
+                arcpy.Point(*self.xy),
+                arcpy.SpatialReference(spatial_reference))
+        return self._geometry
+
+    def as_dict(self):
+        return {'sensor_id': self.sensor_id, 'name': self.name,
+                'x': self.xy[0], 'y': self.xy[1], 'fc_name': self.fc_name}
+
+
+class SensorRegistry(object):
+    """ This class indexes the sensors by id.
+
+    Args:
+    sensors (list) (default = ()) = The Sensor objects.
+
+    Examples:
+    >>> registry = SensorRegistry.load('C:/PARK_MI/sensors.csv')
+    >>> registry.lookup('j-100-15 Colorado - Folsom (2) VOL.xls').fc_name
+    'Colorado_FolsomVOL'
+    >>> registry.report_unknown()
+    """
+
+    def __init__(self, sensors=()):
+        self.sensors = {}
+        self.unknown = []
+        for sensor in sensors:
+            if sensor.sensor_id in self.sensors:
+                raise ValueError('sensor {} is registered twice'.format(
+                    sensor.sensor_id))
+            self.sensors[sensor.sensor_id] = sensor
+        names = [sensor.fc_name for sensor in self.sensors.values()]
+        duplicates = sorted(set(n for n in names if names.count(n) > 1))
+        if duplicates:
+            raise ValueError('feature class names used by more than one '
+                             'sensor: {}'.format(', '.join(duplicates)))
+
+    @classmethod
+    def load(cls, path):
+        """ This method reads a registry from a .csv or .json file.
+        """
+        if path.lower().endswith('.json'):
+            with io.open(path, encoding='utf-8') as f:
+                rows = json.load(f)
+        else:
+            with open(path, 'rb' if bytes is str else 'r') as f:
+                rows = list(csv.DictReader(f))
+        return cls(Sensor(row['sensor_id'], row['name'], row['x'], row['y'],
+                          row.get('fc_name') or None) for row in rows)
+
+    @classmethod
+    def from_coordinates(cls, coordinates):
+        """ This method builds a registry from a {file name: (x, y)}
+        dictionary such as SENSORS_COORDINATES, the feature class names are
+        the ones the file names always produced.
+        """
+        sensors = []
+        for file_name, (x, y) in coordinates.items():
+            # i.e. 'j-100-15 Colorado - Folsom VOL.xls'
+            sensors.append(Sensor(sensor_id_from_file(file_name),
+                                  file_name[9:-4], x, y))
+        return cls(sensors)
+
+    def save(self, path):
+        """ This method writes the registry to a .csv or .json file.
+        """
+        rows = [self.sensors[key].as_dict() for key in sorted(self.sensors)]
+        columns = ['sensor_id', 'name', 'x', 'y', 'fc_name']
+        if path.lower().endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump(rows, f, indent=1, sort_keys=True)
+        else:
+            with open(path, 'wb' if bytes is str else 'w') as f:
+                writer = csv.DictWriter(f, columns, lineterminator='\n')
+                writer.writeheader()
+                writer.writerows(rows)
+
+    def lookup(self, file_name):
+        """ This method returns the sensor of a volume file, None (and the
+        file is remembered for report_unknown) when it is not registered.
+        """
+        sensor = self.sensors.get(sensor_id_from_file(file_name))
+        if sensor is None:
+            self.unknown.append(os.path.basename(file_name))
+        return sensor
+
+    def report_unknown(self):
+        """ This method prints the files without a registered sensor.
+
+        Returns:
+        The list of file names.
+        """
+        if self.unknown:
+            print('No registered sensor for {} files, add them to the sensor '
+                  'registry:\n  {}'.format(len(self.unknown),
+                                           '\n  '.join(sorted(self.unknown))))
+        return list(self.unknown)
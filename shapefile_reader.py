@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       shapefile_reader.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module reads ESRI shapefiles without ArcGIS, GDAL or the PostGIS
+command line tools. The .shp, .shx and .dbf files are memory-mapped and every
+record is returned as (E)WKB geometry plus its attribute values, the format
+PostGIS expects, so the records can be bulk loaded without a SQL text round
+trip. Only the standard library is required.
+Supported shape types: Null, Point, MultiPoint, PolyLine and Polygon, with
+their Z and M variants (M values are dropped). Following shp2pgsql, lines
+and polygons are returned as MULTILINESTRING and MULTIPOLYGON.
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import codecs
+import datetime
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+# shapefile shape type: (PostGIS geometry type, has z)
+SHAPE_TYPES = {1: ('POINT', False), 3: ('MULTILINESTRING', False),
+               5: ('MULTIPOLYGON', False), 8: ('MULTIPOINT', False),
+               11: ('POINT', True), 13: ('MULTILINESTRING', True),
+               15: ('MULTIPOLYGON', True), 18: ('MULTIPOINT', True),
+               21: ('POINT', False), 23: ('MULTILINESTRING', False),
+               25: ('MULTIPOLYGON', False), 28: ('MULTIPOINT', False)}
+WKB_TYPES = {'POINT': 1, 'LINESTRING': 2, 'POLYGON': 3, 'MULTIPOINT': 4,
+             'MULTILINESTRING': 5, 'MULTIPOLYGON': 6}
+EWKB_Z = 0x80000000
+EWKB_SRID = 0x20000000
+
+
+def _doubles(data):
+    """ This helper function converts little endian bytes into an array of
+    doubles.
+    """
+    values = array('d')
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _packed(values):
+    """ This helper function converts an array of doubles into little endian
+    bytes.
+    """
+    if sys.byteorder == 'big':
+        values = array('d', values)
+        values.byteswap()
+    return values.tobytes() if hasattr(values, 'tobytes') \
+        else values.tostring()
+
+
+def _header(wkb_type, has_z, srid=None):
+    """ This helper function returns a little endian (E)WKB geometry header.
+    """
+    if has_z:
+        wkb_type |= EWKB_Z
+    if srid is None:
+        return struct.pack('<BI', 1, wkb_type)
+    return struct.pack('<BII', 1, wkb_type | EWKB_SRID, int(srid))
+
+
+def _ring_is_clockwise(xy):
+    """ This helper function tells whether a ring (flat x, y array) is
+    clockwise, shapefile outer rings are clockwise and holes are not.
+    """
+    area = 0.0
+    for i in range(0, len(xy) - 2, 2):
+        area += xy[i] * xy[i + 3] - xy[i + 2] * xy[i + 1]
+    return area < 0
+
+
+def _dbf_encoding(shp_path, encoding):
+    """ This helper function returns the attribute encoding, the .cpg file
+    wins over the encoding argument.
+    """
+    cpg = os.path.splitext(shp_path)[0] + '.cpg'
+    if os.path.exists(cpg):
+        with open(cpg) as f:
+            name = f.read().strip()
+        if name.isdigit():
+            name = 'cp{}'.format(name)
+        try:
+            codecs.lookup(name)
+            return name
+        except LookupError:
+            pass
+    return encoding
+
+
+class ShapefileReader(object):
+    """ This class memory-maps a shapefile and reads its geometries and
+    attributes record by record.
+
+    Args:
+    shp_path (string) = The path and file name of the .shp file, the .shx
+    and .dbf files must sit next to it.
+    encoding (string) (default = 'utf-8') = The attribute text encoding, a
+    .cpg file next to the shapefile overrides it.
+    srid (int) (default = None) = When given, geometries are returned as
+    PostGIS EWKB carrying this SRID.
+
+    Examples:
+    >>> with ShapefileReader('buildings.shp', srid=26913) as reader:
+    ...     for batch in reader.batches(5000):
+    ...         print(len(batch))
+    5000
+    1287
+    """
+
+    def __init__(self, shp_path, encoding='utf-8', srid=None):
+        base = os.path.splitext(shp_path)[0]
+        self.path = shp_path
+        self.srid = srid
+        self.encoding = _dbf_encoding(shp_path, encoding)
+        self._files = []
+        self._shp = self._map(shp_path)
+        self._shx = self._map(base + '.shx')
+        self._dbf = self._map(base + '.dbf')
+        code, = struct.unpack_from('>i', self._shp, 0)
+        if code != 9994:
+            raise ValueError('{} is not a shapefile'.format(shp_path))
+        self.shape_type, = struct.unpack_from('<i', self._shp, 32)
+        if self.shape_type not in SHAPE_TYPES:
+            raise ValueError('shape type {} is not supported'.format(
+                self.shape_type))
+        self.geometry_type, self.has_z = SHAPE_TYPES[self.shape_type]
+        self._read_dbf_header()
+
+    def _map(self, path):
+        f = open(path, 'rb')
+        self._files.append(f)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read_dbf_header(self):
+        self.num_records, header_length, self._record_length = \
+            struct.unpack_from('<IHH', self._dbf, 4)
+        self._dbf_start = header_length
+        self.fields = []
+        offset = 1
+        position = 32
+        while self._dbf[position:position + 1] != b'\r':
+            name, kind, length, decimals = struct.unpack_from(
+                '<11sc4xBB', self._dbf, position)
+            name = name.split(b'\0')[0].decode('ascii', 'replace')
+            self.fields.append((name, kind.decode('ascii'), length, decimals,
+                                offset))
+            offset += length
+            position += 32
+
+    def __len__(self):
+        return self.num_records
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for m in (self._shp, self._shx, self._dbf):
+            m.close()
+        for f in self._files:
+            f.close()
+
+    def field_names(self):
+        """ This method returns the attribute field names.
+        """
+        return [field[0] for field in self.fields]
+
+    def _value(self, raw, kind, decimals):
+        if kind == 'C':
+            return raw.decode(self.encoding, 'replace').rstrip(u' \0')
+        text = raw.strip(b' \0')
+        if kind in 'NF':
+            if not text or text.startswith(b'*'):
+                return None
+            if kind == 'N' and decimals == 0 and b'.' not in text:
+                return int(text)
+            return float(text)
+        if kind == 'D':
+            if len(text) != 8 or not text.isdigit() or text == b'00000000':
+                return None
+            return datetime.date(int(text[:4]), int(text[4:6]),
+                                 int(text[6:]))
+        if kind == 'L':
+            if text[:1] in (b'Y', b'y', b'T', b't'):
+                return True
+            if text[:1] in (b'N', b'n', b'F', b'f'):
+                return False
+            return None
+        return raw.decode(self.encoding, 'replace').strip()
+
+    def attributes(self, index):
+        """ This method returns the attribute values of a record, or None
+        when the record is flagged as deleted.
+        """
+        start = self._dbf_start + index * self._record_length
+        record = self._dbf[start:start + self._record_length]
+        if record[:1] == b'*':
+            return None
+        return [self._value(record[offset:offset + length], kind, decimals)
+                for name, kind, length, decimals, offset in self.fields]
+
+    def geometry(self, index):
+        """ This method returns the (E)WKB geometry of a record, or None for
+        null shapes.
+        """
+        offset, = struct.unpack_from('>i', self._shx, 100 + index * 8)
+        start = offset * 2 + 8
+        shape_type, = struct.unpack_from('<i', self._shp, start)
+        if shape_type == 0:
+            return None
+        content = start + 4
+        if self.geometry_type == 'POINT':
+            return self._point(content)
+        if self.geometry_type == 'MULTIPOINT':
+            return self._multipoint(content)
+        return self._parts(content)
+
+    def _coordinates(self, xy_start, count, z_start):
+        """ This helper method returns the packed coordinates of count
+        points, x y pairs are copied as they are, z values are interleaved.
+        """
+        data = self._shp[xy_start:xy_start + 16 * count]
+        if not self.has_z:
+            return data
+        xy = _doubles(data)
+        z = _doubles(self._shp[z_start:z_start + 8 * count])
+        xyz = array('d', [0.0]) * (3 * count)
+        xyz[0::3] = xy[0::2]
+        xyz[1::3] = xy[1::2]
+        xyz[2::3] = z
+        return _packed(xyz)
+
+    def _point(self, content):
+        return (_header(WKB_TYPES['POINT'], self.has_z, self.srid) +
+                self._coordinates(content, 1, content + 16))
+
+    def _multipoint(self, content):
+        count, = struct.unpack_from('<i', self._shp, content + 32)
+        xy_start = content + 36
+        z_start = xy_start + 16 * count + 16
+        points = [_header(WKB_TYPES['POINT'], self.has_z) +
+                  self._coordinates(xy_start + 16 * i, 1, z_start + 8 * i)
+                  for i in range(count)]
+        return (_header(WKB_TYPES['MULTIPOINT'], self.has_z, self.srid) +
+                struct.pack('<I', count) + b''.join(points))
+
+    def _parts(self, content):
+        num_parts, num_points = struct.unpack_from('<ii', self._shp,
+                                                   content + 32)
+        parts = list(struct.unpack_from('<{}i'.format(num_parts), self._shp,
+                                        content + 40))
+        parts.append(num_points)
+        xy_start = content + 40 + 4 * num_parts
+        z_start = xy_start + 16 * num_points + 16
+        rings = []
+        for first, last in zip(parts[:-1], parts[1:]):
+            count = last - first
+            rings.append((count, self._coordinates(
+                xy_start + 16 * first, count, z_start + 8 * first),
+                xy_start + 16 * first))
+        if self.geometry_type == 'MULTILINESTRING':
+            lines = [_header(WKB_TYPES['LINESTRING'], self.has_z) +
+                     struct.pack('<I', count) + coordinates
+                     for count, coordinates, _ in rings]
+            return (_header(WKB_TYPES['MULTILINESTRING'], self.has_z,
+                            self.srid) +
+                    struct.pack('<I', len(lines)) + b''.join(lines))
+        # every clockwise ring starts a polygon, the rings that follow it
+        # are its holes
+        polygons = []
+        for count, coordinates, ring_start in rings:
+            if not polygons or len(rings) > 1 and _ring_is_clockwise(
+                    _doubles(self._shp[ring_start:ring_start + 16 * count])):
+                polygons.append([])
+            polygons[-1].append(struct.pack('<I', count) + coordinates)
+        polygons = [_header(WKB_TYPES['POLYGON'], self.has_z) +
+                    struct.pack('<I', len(polygon)) + b''.join(polygon)
+                    for polygon in polygons]
+        return (_header(WKB_TYPES['MULTIPOLYGON'], self.has_z, self.srid) +
+                struct.pack('<I', len(polygons)) + b''.join(polygons))
+
+    def records(self):
+        """ This method yields (geometry, attributes) tuples, deleted records
+        are skipped.
+        """
+        for index in range(self.num_records):
+            attributes = self.attributes(index)
+            if attributes is not None:
+                yield self.geometry(index), attributes
+
+    def batches(self, size=5000):
+        """ This method yields lists of at most size (geometry, attributes)
+        tuples.
+        """
+        batch = []
+        for record in self.records():
+            batch.append(record)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
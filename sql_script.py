@@ -0,0 +1,479 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       sql_script.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+PostgreSQL Version: 9.4
+--------------------------------------------------------------------------------
+This module splits PostgreSQL scripts into statements. Unlike splitting on
+';', the tokenizer understands string literals ('...', E'...'), quoted
+identifiers ("..."), dollar quoted bodies ($$...$$, $tag$...$tag$), line
+comments (--) and nested block comments (/* */). Comments are removed from
+the statements.
+It also works out which tables every statement reads and writes, so the
+independent statements of a script can run at the same time on several
+connections (see run_parallel). Only the standard library is required.
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import re
+import time
+from multiprocessing.pool import ThreadPool
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+DOLLAR_TAG = re.compile(r'\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$')
+# backslashes only escape inside E'...' strings, like split_statements
+TOKEN = re.compile(r"""
+    (?P<literal>[eE]'(?:''|\\.|[^'\\])*'
+               |'(?:''|[^'])*'
+               |(?P<tag>\$(?:[A-Za-z_]\w*)?\$).*?(?P=tag))
+  | "(?P<quoted>(?:""|[^"])*)"
+  | (?P<word>[A-Za-z_][\w$]*)
+  | (?P<symbol>\S)
+""", re.VERBOSE | re.DOTALL)
+# statements that change the session (not the data), they have to be applied
+# to every connection
+SESSION_KEYWORDS = ('set', 'reset', 'load', 'discard')
+# statements whose tables are known, anything else is run on its own
+TABLE_KEYWORDS = ('create', 'drop', 'alter', 'insert', 'update', 'delete',
+                  'truncate', 'select', 'with', 'vacuum', 'analyze',
+                  'cluster', 'reindex')
+# words that end a table reference in a FROM list (instead of an alias)
+CLAUSE_WORDS = frozenset([
+    'where', 'group', 'order', 'having', 'limit', 'offset', 'join', 'inner',
+    'left', 'right', 'full', 'cross', 'natural', 'on', 'using', 'union',
+    'except', 'intersect', 'window', 'returning', 'set', 'lateral', 'for',
+    'as', 'from', 'into', 'values', 'select', 'and', 'or', 'not', 'fetch'])
+
+
+def _is_identifier_char(char):
+    return char.isalnum() or char in '_$'
+
+
+def split_statements(sql):
+    """ This function splits a SQL script into statements on the ';' that
+    are not inside a literal, a quoted identifier, a dollar quoted body or a
+    comment. Comments are replaced by a space and empty statements are
+    dropped.
+
+    Args:
+    sql (string) = The SQL script.
+
+    Returns:
+    A list of statement strings, without the trailing ';'.
+
+    Examples:
+    >>> split_statements("SELECT 'a;b'; -- done\\nSELECT $$;$$;")
+    ["SELECT 'a;b'", 'SELECT $$;$$']
+    """
+    statements = []
+    current = []
+    i = 0
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if char == ';':
+            statements.append(''.join(current))
+            current = []
+            i += 1
+        elif sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = length if end == -1 else end
+            current.append(' ')
+        elif sql.startswith('/*', i):
+            # block comments nest in PostgreSQL
+            depth = 1
+            i += 2
+            while i < length and depth:
+                if sql.startswith('/*', i):
+                    depth += 1
+                    i += 2
+                elif sql.startswith('*/', i):
+                    depth -= 1
+                    i += 2
+                else:
+                    i += 1
+            current.append(' ')
+        elif char == "'":
+            # E'...' strings allow backslash escapes
+            escapes = (i > 0 and sql[i - 1] in 'eE' and
+                       (i == 1 or not _is_identifier_char(sql[i - 2])))
+            end = i + 1
+            while end < length:
+                if escapes and sql[end] == '\\':
+                    end += 2
+                elif sql[end] == "'":
+                    if sql.startswith("''", end):
+                        end += 2
+                    else:
+                        break
+                else:
+                    end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+        elif char == '"':
+            end = i + 1
+            while end < length:
+                if sql.startswith('""', end):
+                    end += 2
+                elif sql[end] == '"':
+                    break
+                else:
+                    end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+        elif char == '$' and (i == 0 or not _is_identifier_char(sql[i - 1])):
+            tag = DOLLAR_TAG.match(sql, i)
+            if tag is None:
+                current.append(char)
+                i += 1
+            else:
+                end = sql.find(tag.group(0), tag.end())
+                end = length if end == -1 else end + len(tag.group(0))
+                current.append(sql[i:end])
+                i = end
+        else:
+            current.append(char)
+            i += 1
+    statements.append(''.join(current))
+    return [s.strip() for s in statements if s.strip()]
+
+
+def parse_sql_file(sql_script_loc):
+    """ This function reads and splits a SQL script.
+
+    Args:
+    sql_script_loc (string) = The path and file name of the SQL script.
+
+    Returns:
+    A list of statement strings (see split_statements).
+    """
+    with open(sql_script_loc, 'rb') as sql:
+        return split_statements(sql.read().decode('utf-8'))
+
+
+def execute_statement(con, statement):
+    """ This function sends a statement to the database as it is, without
+    SQLAlchemy bind parameter (':name') or DBAPI ('%') processing.
+
+    Args:
+    con (sqlalchemy.engine.Connection) = An open connection.
+    statement (string) = The SQL statement.
+
+    Returns:
+    The number of rows returned or affected (-1 when the driver does not
+    know).
+    """
+    if hasattr(con, 'exec_driver_sql'):
+        result = con.exec_driver_sql(statement)
+    else:
+        result = con.execute(statement)
+    rowcount = result.rowcount
+    result.close()
+    return rowcount
+
+
+def print_statement_report(report):
+    """ This function prints the per-statement timings, row counts and
+    errors returned by run_sql_on_db.
+    """
+    print('{:>4}  {:>9}  {:>9}  {}'.format('#', 'seconds', 'rows',
+                                           'statement'))
+    for number, entry in enumerate(report, 1):
+        summary = ' '.join(entry['statement'].split())
+        if len(summary) > 60:
+            summary = summary[:57] + '...'
+        print('{:>4}  {:>9.3f}  {:>9}  {}'.format(
+            number, entry['seconds'], entry['status']
+            if entry['status'] != 'ok' else entry['rowcount'], summary))
+        if entry['error']:
+            print('      {}'.format(entry['error'].strip().splitlines()[0]))
+
+
+def _tokens(statement):
+    """ This helper function returns the statement's words and symbols, words
+    are lower case (unless they are quoted identifiers) and literals are
+    replaced by a "'" token.
+    """
+    tokens = []
+    for match in TOKEN.finditer(statement):
+        if match.group('literal') is not None:
+            tokens.append("'")
+        elif match.group('quoted') is not None:
+            tokens.append(('"', match.group('quoted').replace('""', '"')))
+        elif match.group('word') is not None:
+            tokens.append(match.group('word').lower())
+        else:
+            tokens.append(match.group('symbol'))
+    return tokens
+
+
+def _name(tokens, i):
+    """ This helper function reads a (schema qualified) name at tokens[i],
+    it returns the table name without schema and the position after it.
+    """
+    name = None
+    while i < len(tokens):
+        token = tokens[i]
+        if isinstance(token, tuple):
+            name = token[1]
+        elif token[0].isalpha() or token[0] == '_':
+            name = token
+        else:
+            break
+        if i + 1 < len(tokens) and tokens[i + 1] == '.':
+            i += 2
+        else:
+            i += 1
+            break
+    return name, i
+
+
+def _skip(tokens, i, *words):
+    """ This helper function skips the optional words found at tokens[i].
+    """
+    while i < len(tokens) and tokens[i] in words:
+        i += 1
+    return i
+
+
+def _from_list(tokens, i):
+    """ This helper function reads the comma separated table references of a
+    FROM, JOIN or USING clause starting at tokens[i].
+    """
+    names = set()
+    while i < len(tokens):
+        i = _skip(tokens, i, 'only', 'lateral')
+        if i < len(tokens) and tokens[i] == '(':
+            # a subquery, its own FROM is read on its own
+            return names
+        name, i = _name(tokens, i)
+        if name is None:
+            return names
+        if i < len(tokens) and tokens[i] == '(':
+            # a function in the FROM list (i.e. geocode(...)), not a table
+            return names
+        names.add(name)
+        # the alias
+        if i < len(tokens) and tokens[i] == 'as':
+            i += 1
+        if i < len(tokens) and (isinstance(tokens[i], tuple) or
+                                tokens[i] not in CLAUSE_WORDS and
+                                (tokens[i][0].isalpha() or
+                                 tokens[i][0] == '_')):
+            i += 1
+        if i < len(tokens) and tokens[i] == ',':
+            i += 1
+        else:
+            return names
+    return names
+
+
+def is_session_statement(statement):
+    """ This function tells whether a statement changes the session settings
+    (SET, RESET, LOAD, DISCARD) instead of the data.
+    """
+    tokens = _tokens(statement)
+    return bool(tokens) and tokens[0] in SESSION_KEYWORDS
+
+
+def statement_tables(statement):
+    """ This function works out which tables a statement reads and writes.
+    Names are compared without schema, so 'public.a' and 'a' are the same
+    table. Statements whose effects cannot be known from their text
+    (functions, DO blocks, SELECT without FROM such as
+    SELECT AddGeometryColumn(...), session statements) are barriers.
+    Note that tables changed inside functions are not detected.
+
+    Args:
+    statement (string) = A SQL statement without comments.
+
+    Returns:
+    A tuple (reads, writes, barrier), reads and writes are sets of table
+    names and barrier is True when the statement has to run on its own.
+
+    Examples:
+    >>> statement_tables('CREATE TABLE b AS SELECT * FROM a JOIN c ON true')
+    ({'a', 'c'}, {'b'}, False)
+    """
+    tokens = _tokens(statement)
+    reads = set()
+    writes = set()
+    if not tokens or tokens[0] not in TABLE_KEYWORDS:
+        return reads, writes, True
+    first = tokens[0]
+    i = 1
+    if first == 'create':
+        i = _skip(tokens, i, 'or', 'replace', 'temp', 'temporary',
+                  'unlogged', 'global', 'local', 'unique', 'materialized')
+        if i < len(tokens) and tokens[i] in ('table', 'view'):
+            name, _ = _name(tokens, _skip(tokens, i + 1, 'if', 'not',
+                                          'exists'))
+            writes.add(name)
+        elif i < len(tokens) and tokens[i] == 'index':
+            if 'on' not in tokens:
+                return reads, writes, True
+            on = tokens.index('on')
+            name, _ = _name(tokens, _skip(tokens, on + 1, 'only'))
+            writes.add(name)
+        else:
+            return reads, writes, True
+    elif first == 'drop':
+        i = _skip(tokens, i, 'materialized')
+        if i >= len(tokens) or tokens[i] not in ('table', 'view', 'index'):
+            return reads, writes, True
+        i = _skip(tokens, i + 1, 'concurrently', 'if', 'exists')
+        while True:
+            name, i = _name(tokens, i)
+            writes.add(name)
+            if i < len(tokens) and tokens[i] == ',':
+                i += 1
+            else:
+                break
+    elif first == 'alter':
+        if i >= len(tokens) or tokens[i] != 'table':
+            return reads, writes, True
+        name, _ = _name(tokens, _skip(tokens, i + 1, 'if', 'exists',
+                                      'only'))
+        writes.add(name)
+    elif first in ('truncate', 'vacuum', 'analyze', 'cluster', 'reindex'):
+        i = _skip(tokens, i, 'table', 'only', 'full', 'freeze', 'verbose',
+                  'analyze')
+        while i < len(tokens):
+            name, i = _name(tokens, i)
+            if name is None:
+                break
+            writes.add(name)
+            if i < len(tokens) and tokens[i] == ',':
+                i += 1
+            else:
+                break
+        if not writes:
+            return reads, writes, True
+    for position, token in enumerate(tokens):
+        previous = tokens[position - 1] if position else None
+        if token == 'into' and previous == 'insert':
+            name, _ = _name(tokens, position + 1)
+            writes.add(name)
+        elif token == 'into' and first in ('select', 'with'):
+            # SELECT ... INTO new_table
+            name, _ = _name(tokens, _skip(tokens, position + 1, 'temp',
+                                          'temporary', 'unlogged', 'table'))
+            writes.add(name)
+        elif token == 'update' and previous not in ('for', 'do', 'on',
+                                                    'no'):
+            name, _ = _name(tokens, _skip(tokens, position + 1, 'only'))
+            writes.add(name)
+        elif token == 'from' and previous == 'delete':
+            name, _ = _name(tokens, _skip(tokens, position + 1, 'only'))
+            writes.add(name)
+        elif token in ('from', 'join', 'using') and previous != 'delete':
+            reads.update(_from_list(tokens, position + 1))
+    writes.discard(None)
+    reads.discard(None)
+    if first in ('select', 'with') and not writes and not reads:
+        # i.e. SELECT AddGeometryColumn(...), the function may change anything
+        return reads, writes, True
+    return reads, writes, False
+
+
+def statement_dependencies(statements):
+    """ This function builds the dependency graph of a script, statement j
+    depends on an earlier statement i when one of them writes a table the
+    other one reads or writes, or when one of them is a barrier (see
+    statement_tables).
+
+    Args:
+    statements (list) = The statements of the script, in order.
+
+    Returns:
+    A list with the set of earlier statement indexes every statement
+    depends on.
+    """
+    tables = [statement_tables(statement) for statement in statements]
+    dependencies = []
+    for j, (reads_j, writes_j, barrier_j) in enumerate(tables):
+        depends = set()
+        for i in range(j):
+            reads_i, writes_i, barrier_i = tables[i]
+            if barrier_i or barrier_j or writes_i & (reads_j | writes_j) or \
+                    reads_i & writes_j:
+                depends.add(i)
+        dependencies.append(depends)
+    return dependencies
+
+
+def run_parallel(statements, execute, workers=4):
+    """ This function runs the statements of a script on a pool of workers,
+    a statement starts as soon as every statement it depends on finished
+    (see statement_dependencies). When a statement fails, the statements
+    that depend on it are skipped, the independent ones still run.
+
+    Args:
+    statements (list) = The statements of the script, in order.
+    execute (function) = execute(index, statement) runs a statement and
+    returns its row count, it is called from the worker threads.
+    workers (int) (default = 4) = The number of statements that can run at
+    the same time.
+
+    Returns:
+    A list with one dictionary per statement, in script order (statement,
+    seconds, rowcount, status and error), status is 'ok', 'failed' or
+    'skipped'.
+    """
+    dependencies = statement_dependencies(statements)
+    dependents = [set() for _ in statements]
+    for j, depends in enumerate(dependencies):
+        for i in depends:
+            dependents[i].add(j)
+    report = [{'statement': statement, 'seconds': 0.0, 'rowcount': None,
+               'status': 'skipped', 'error': ''} for statement in statements]
+    finished = Queue()
+
+    def run_one(index):
+        start = time.time()
+        entry = report[index]
+        try:
+            entry['rowcount'] = execute(index, statements[index])
+            entry['status'] = 'ok'
+        except Exception as e:
+            entry['status'] = 'failed'
+            entry['error'] = str(e)
+        entry['seconds'] = time.time() - start
+        finished.put(index)
+
+    pool = ThreadPool(max(1, workers))
+    waiting = [set(depends) for depends in dependencies]
+    done = set()
+    try:
+        for index, depends in enumerate(waiting):
+            if not depends:
+                pool.apply_async(run_one, (index,))
+        while len(done) < len(statements):
+            index = finished.get()
+            done.add(index)
+            if report[index]['status'] != 'ok':
+                # skipping everything downstream of the failure
+                stack = list(dependents[index])
+                while stack:
+                    j = stack.pop()
+                    if j not in done:
+                        done.add(j)
+                        stack.extend(dependents[j])
+                continue
+            for j in sorted(dependents[index]):
+                waiting[j].discard(index)
+                if not waiting[j] and j not in done:
+                    pool.apply_async(run_one, (j,))
+    finally:
+        pool.close()
+        pool.join()
+    return report
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       test_dwg_floorplans_cleaner.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+These tests exercise the scheduling and retry logic of clean_drawings with
+the fake CAD sessions of cad_session.RecordingCad, neither AutoCAD nor the
+lisp routines on the share are needed. The routines_version tests use a
+temporary folder as the share.
+usage: python -m pytest test_dwg_floorplans_cleaner.py
+--------------------------------------------------------------------------------
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from cad_commands import CommandCompiler
+from cad_session import RecordingCad
+from dwg_floorplans_cleaner import clean_drawings, routines_version
+
+
+class CleanDrawingsTest(unittest.TestCase):
+
+    def events(self, cad, event):
+        return [e for e in cad.log if e['event'] == event]
+
+    def test_all_drawings_are_cleaned(self):
+        # the drawings take some time, so every worker gets one
+        cad = RecordingCad(seconds=0.1)
+        dwgs = ['0001_01.dwg', '0001_02.dwg', '0002_01.dwg', '0003_01.dwg']
+        report = clean_drawings(dwgs, cad, workers=3)
+        self.assertEqual([e['drawing'] for e in report], dwgs)
+        self.assertEqual([e['status'] for e in report], ['ok'] * 4)
+        self.assertEqual([e['attempts'] for e in report], [1] * 4)
+        self.assertEqual(cad.drawings(), sorted(dwgs))
+        # one session per worker, stopped at the end
+        self.assertEqual(cad.sessions(), len(set(e['session']
+                                                 for e in report)))
+        self.assertGreater(cad.sessions(), 1)
+        self.assertEqual(len(self.events(cad, 'stop')), cad.sessions())
+
+    def test_crashed_drawing_is_retried_on_a_new_session(self):
+        cad = RecordingCad(failures={'0001_01.dwg': 1})
+        report = clean_drawings(['0001_01.dwg', '0001_02.dwg'], cad,
+                                workers=1, retries=1)
+        self.assertEqual([e['status'] for e in report], ['ok', 'ok'])
+        self.assertEqual([e['attempts'] for e in report], [2, 1])
+        self.assertEqual(report[0]['error'], '')
+        self.assertEqual(len(self.events(cad, 'crash')), 1)
+        # the crashed session is stopped and a new one started
+        self.assertEqual(cad.sessions(), 2)
+        self.assertEqual([e['event'] for e in cad.log],
+                         ['start', 'crash', 'stop', 'start', 'run', 'run',
+                          'stop'])
+
+    def test_drawing_fails_when_the_retries_are_used_up(self):
+        cad = RecordingCad(failures={'0001_01.dwg': 5})
+        report = clean_drawings(['0001_01.dwg', '0001_02.dwg'], cad,
+                                workers=1, retries=2)
+        self.assertEqual(report[0]['status'], 'failed')
+        self.assertEqual(report[0]['attempts'], 3)
+        self.assertIn('CadSessionError', report[0]['error'])
+        self.assertEqual(report[1]['status'], 'ok')
+        self.assertEqual(len(self.events(cad, 'crash')), 3)
+        # every attempt and the next drawing run on a new session
+        self.assertEqual(cad.sessions(), 4)
+        self.assertEqual(cad.drawings(), ['0001_02.dwg'])
+
+    def test_sessions_load_the_lisp_routines_once(self):
+        cad = RecordingCad()
+        clean_drawings(['0001_01.dwg', '0001_02.dwg'], cad, workers=1)
+        start, = self.events(cad, 'start')
+        self.assertTrue(any('vl-load-all' in c for c in start['commands']))
+        # every drawing gets its steps in a single payload
+        for run in self.events(cad, 'run'):
+            self.assertEqual(len(run['commands']), 1)
+
+
+class RoutinesVersionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.share = os.path.join(self.folder, 'share')
+        self.cache = os.path.join(self.folder, 'cache')
+        os.makedirs(self.share)
+        self.lisp = os.path.join(self.share, 'dlf.lsp').replace('\\', '/')
+        with open(self.lisp, 'w') as f:
+            f.write('(defun c:dlf () (princ))\n')
+        self.steps = [('dlf', 'DLF\n', self.lisp), ('save', 'QSAVE\n', None)]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def version(self):
+        compiler = CommandCompiler(self.steps, self.cache)
+        return routines_version(self.steps, compiler.local_lisp())
+
+    def test_version_is_stable_when_the_share_is_offline(self):
+        online = self.version()
+        os.remove(self.lisp)
+        self.assertEqual(self.version(), online)
+
+    def test_version_changes_with_the_routines(self):
+        before = self.version()
+        with open(self.lisp, 'a') as f:
+            f.write('(princ)\n')
+        self.assertNotEqual(self.version(), before)
+
+    def test_missing_routine_is_an_error(self):
+        os.remove(self.lisp)
+        self.assertRaises(IOError, routines_version, self.steps)
+        self.assertRaises(IOError, self.version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       test_sql_script.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+These tests exercise the statement splitting and the table analysis of
+sql_script, no database is needed.
+usage: python -m pytest test_sql_script.py
+--------------------------------------------------------------------------------
+"""
+
+import unittest
+from sql_script import split_statements, statement_dependencies, \
+    statement_tables
+
+"""a windows path ends the first literal with a backslash, it is not an
+escape under standard_conforming_strings"""
+SCRIPT = r"""CREATE TABLE buildings AS SELECT * FROM buildings_shp;
+INSERT INTO drives SELECT 'C:\', name FROM buildings WHERE kind = 'x';
+"""
+
+
+class StatementTablesTest(unittest.TestCase):
+
+    def test_backslash_ends_a_plain_literal(self):
+        statements = split_statements(SCRIPT)
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(statement_tables(statements[1]),
+                         (set(['buildings']), set(['drives']), False))
+        # the INSERT reads the table the CREATE writes
+        self.assertEqual(statement_dependencies(statements), [set(), set([0])])
+
+    def test_backslash_escapes_in_e_literals(self):
+        statement = r"INSERT INTO notes SELECT E'it\'s', name FROM buildings"
+        self.assertEqual(split_statements(statement + ';'), [statement])
+        self.assertEqual(statement_tables(statement),
+                         (set(['buildings']), set(['notes']), False))
+
+
+if __name__ == '__main__':
+    unittest.main()
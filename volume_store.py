@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Name:       volume_store.py
+Author:     Ulises  Guzman
+Created:    10/18/2026
+Copyright:   (c) CAD/GIS Office at CU Boulder
+ArcGIS Version:   NA
+AutoCAD Version:  NA
+Python Version:   2.7.8
+--------------------------------------------------------------------------------
+This module stores the CUPD traffic volume counts in a columnar on-disk
+format, so questions across sensors (i.e. the peak hour of move-in week) do
+not need to scan one feature class per sensor. The store is a folder with:
+meta.json     the sensor ids (one row each), the first week and the size
+volumes.dat   a sensor x 15 minute slot x lane float32 NumPy memmap, NaN
+              where there is no reading
+hourly.dat, daily.dat, weekly.dat
+              the rollups of both lanes, sensor x period float64 memmaps
+The slots start on a Monday at midnight and the arrays grow a whole week at
+a time. Ingesting a file only recomputes the rollups of the weeks it
+touched, and queries read slices of the memmaps.
+--------------------------------------------------------------------------------
+"""
+
+from __future__ import print_function
+import json
+import os
+import numpy as np
+import pandas as pd
+
+SLOT_MINUTES = 15
+SLOTS_PER_HOUR = 60 // SLOT_MINUTES
+SLOTS_PER_DAY = 24 * SLOTS_PER_HOUR
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+LANES = ('VOL_LEFTLANE', 'VOL_RIGHTLANE')
+ROLLUPS = {'hour': SLOTS_PER_HOUR, 'day': SLOTS_PER_DAY,
+           'week': SLOTS_PER_WEEK}
+
+
+def _week_start(timestamp):
+    """ This helper function returns the Monday midnight of a timestamp's
+    week.
+    """
+    day = pd.Timestamp(timestamp).normalize()
+    return day - pd.Timedelta(days=day.weekday())
+
+
+class VolumeStore(object):
+    """ This class is a sensor by time store of volume counts with hourly,
+    daily and weekly rollups.
+
+    Args:
+    path (string) = The store folder, it is created when it does not exist.
+
+    Examples:
+    >>> store = VolumeStore('C:/PARK_MI/volumes')
+    >>> store.ingest('j-100-15', df['DATE'], df[['VOL_LEFTLANE',
+    ...                                          'VOL_RIGHTLANE']].values)
+    >>> store.peak('2016-08-15', '2016-08-22', 'hour')
+    ('j-200-15', Timestamp('2016-08-19 16:00:00'), 1894.0)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        meta = os.path.join(path, 'meta.json')
+        if os.path.exists(meta):
+            with open(meta) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {'sensors': [], 'epoch': None, 'weeks': 0}
+        self.rows = dict((sensor, row) for row, sensor in
+                         enumerate(self.meta['sensors']))
+        self._open()
+
+    @property
+    def sensors(self):
+        return list(self.meta['sensors'])
+
+    @property
+    def epoch(self):
+        return pd.Timestamp(self.meta['epoch']) if self.meta['epoch'] \
+            else None
+
+    def _file(self, name):
+        return os.path.join(self.path, '{}.dat'.format(name))
+
+    def _shape(self, name, sensors=None, weeks=None):
+        sensors = len(self.meta['sensors']) if sensors is None else sensors
+        weeks = self.meta['weeks'] if weeks is None else weeks
+        if name == 'volumes':
+            return (sensors, weeks * SLOTS_PER_WEEK, len(LANES))
+        return (sensors, weeks * SLOTS_PER_WEEK // ROLLUPS[name])
+
+    def _open(self):
+        """ This helper method maps the arrays of the current shape.
+        """
+        self.arrays = {}
+        if not self.meta['sensors'] or not self.meta['weeks']:
+            return
+        for name in ['volumes'] + sorted(ROLLUPS):
+            dtype = np.float32 if name == 'volumes' else np.float64
+            self.arrays[name] = np.memmap(self._file(name), dtype=dtype,
+                                          mode='r+',
+                                          shape=self._shape(name))
+
+    def _save_meta(self):
+        temporary = os.path.join(self.path, 'meta.json.tmp')
+        with open(temporary, 'w') as f:
+            json.dump(self.meta, f, indent=1)
+        target = os.path.join(self.path, 'meta.json')
+        if hasattr(os, 'replace'):
+            os.replace(temporary, target)
+        else:
+            if os.path.exists(target):
+                os.remove(target)
+            os.rename(temporary, target)
+
+    def _grow(self, sensors, first_week, last_week):
+        """ This helper method rewrites the arrays with room for new sensors
+        and weeks, the existing values are copied to their new position.
+        """
+        old_epoch = self.epoch
+        epoch = first_week if old_epoch is None else min(old_epoch,
+                                                         first_week)
+        end = last_week if old_epoch is None else max(
+            last_week, old_epoch + pd.Timedelta(weeks=self.meta['weeks'] - 1))
+        weeks = (end - epoch).days // 7 + 1
+        shift = 0 if old_epoch is None else (old_epoch - epoch).days // 7
+        # the new sensor ids are already in meta, the arrays are not
+        old_sensors = self.arrays['volumes'].shape[0] \
+            if 'volumes' in self.arrays else 0
+        if weeks == self.meta['weeks'] and sensors == old_sensors:
+            return
+        for name in ['volumes'] + sorted(ROLLUPS):
+            dtype = np.float32 if name == 'volumes' else np.float64
+            shape = self._shape(name, sensors, weeks)
+            grown = np.memmap(self._file(name) + '.tmp', dtype=dtype,
+                              mode='w+', shape=shape)
+            grown[:] = np.nan
+            old = self.arrays.get(name)
+            if old is not None:
+                offset = shift * shape[1] // weeks
+                grown[:old.shape[0], offset:offset + old.shape[1]] = old
+            grown.flush()
+            del grown
+            self.arrays.pop(name, None)
+            del old
+            if os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+            os.rename(self._file(name) + '.tmp', self._file(name))
+        self.meta['epoch'] = str(epoch)
+        self.meta['weeks'] = weeks
+
+    def ingest(self, sensor, timestamps, volumes):
+        """ This method stores (or overwrites) a sensor's readings and
+        updates the rollups of the weeks they fall in. The readings that fall
+        in the same 15 minute slot are added up.
+
+        Args:
+        sensor (string) = The sensor id, i.e. 'j-100-15'.
+        timestamps (array) = The reading times, they are floored to 15
+        minute slots.
+        volumes (array) = The readings, one row per timestamp and one column
+        per lane (LANES).
+
+        Returns:
+        The number of readings stored.
+        """
+        timestamps = pd.DatetimeIndex(timestamps)
+        volumes = np.asarray(volumes, dtype=np.float32).reshape(
+            len(timestamps), len(LANES))
+        valid = np.asarray(timestamps.notnull())
+        timestamps, volumes = timestamps[valid], volumes[valid]
+        if not len(timestamps):
+            return 0
+        sensors = self.meta['sensors']
+        if sensor not in self.rows:
+            sensors.append(sensor)
+            self.rows[sensor] = len(sensors) - 1
+        self._grow(len(sensors), _week_start(timestamps.min()),
+                   _week_start(timestamps.max()))
+        self._save_meta()
+        self._open()
+        row = self.rows[sensor]
+        slots = np.asarray((timestamps - self.epoch) //
+                           pd.Timedelta(minutes=SLOT_MINUTES))
+        slots, inverse = np.unique(slots, return_inverse=True)
+        if len(slots) < len(inverse):
+            # a fancy assignment would keep the last reading of a slot only
+            summed = np.zeros((len(slots), len(LANES)))
+            np.add.at(summed, inverse, np.nan_to_num(volumes))
+            seen = np.zeros(summed.shape, dtype=bool)
+            np.logical_or.at(seen, inverse, ~np.isnan(volumes))
+            volumes = np.where(seen, summed, np.nan).astype(np.float32)
+        self.arrays['volumes'][row, slots] = volumes
+        self.arrays['volumes'].flush()
+        self._rollup(row, np.unique(slots // SLOTS_PER_WEEK))
+        return len(inverse)
+
+    def _rollup(self, row, weeks):
+        """ This helper method recomputes a sensor's rollups for the given
+        weeks, a period is NaN when it has no reading at all.
+        """
+        for week in weeks:
+            start, end = week * SLOTS_PER_WEEK, (week + 1) * SLOTS_PER_WEEK
+            total = self.arrays['volumes'][row, start:end].astype(np.float64)
+            has_data = ~np.isnan(total).all(axis=1)
+            total = np.where(has_data, np.nansum(total, axis=1), np.nan)
+            for name, size in ROLLUPS.items():
+                periods = total.reshape(-1, size)
+                counts = (~np.isnan(periods)).sum(axis=1)
+                self.arrays[name][row, start // size:end // size] = np.where(
+                    counts > 0, np.nansum(periods, axis=1), np.nan)
+        for name in ROLLUPS:
+            self.arrays[name].flush()
+
+    def _slice(self, freq, start, end):
+        """ This helper method returns the array and the period range of a
+        query, start included and end excluded.
+        """
+        size = 1 if freq == '15min' else ROLLUPS[freq]
+        period = pd.Timedelta(minutes=SLOT_MINUTES * size)
+        epoch = self.epoch
+        if epoch is None:
+            raise ValueError('the volume store {} is empty'.format(self.path))
+        total = self.meta['weeks'] * SLOTS_PER_WEEK // size
+        first = 0 if start is None else max(0, int(
+            (pd.Timestamp(start) - epoch) // period))
+        last = total if end is None else min(total, int(
+            -((epoch - pd.Timestamp(end)) // period)))
+        last = max(first, last)
+        if freq == '15min':
+            array = np.nansum(self.arrays['volumes'][:, first:last], axis=2)
+            empty = np.isnan(self.arrays['volumes'][:, first:last]).all(
+                axis=2)
+            array = np.where(empty, np.nan, array)
+        else:
+            array = self.arrays[freq][:, first:last]
+        index = pd.date_range(epoch + first * period, periods=last - first,
+                              freq=period)
+        return array, index
+
+    def totals(self, start=None, end=None, freq='day', sensors=None):
+        """ This method returns the volumes of both lanes per period.
+
+        Args:
+        start (string) (default = None) = The first period, i.e.
+        '2016-08-15'.
+        end (string) (default = None) = The end of the range (excluded).
+        freq (string) (default = 'day') = '15min', 'hour', 'day' or 'week'.
+        sensors (list) (default = None) = The sensor ids, all of them when
+        it is None.
+
+        Returns:
+        A pandas DataFrame, one row per period and one column per sensor.
+        """
+        array, index = self._slice(freq, start, end)
+        sensors = sensors or self.sensors
+        rows = [self.rows[sensor] for sensor in sensors]
+        return pd.DataFrame(np.asarray(array[rows]).T, index=index,
+                            columns=sensors)
+
+    def series(self, sensor, start=None, end=None, freq='15min'):
+        """ This method returns one sensor's volumes per period.
+        """
+        return self.totals(start, end, freq, [sensor])[sensor]
+
+    def peak(self, start=None, end=None, freq='hour', sensors=None):
+        """ This method returns the busiest period of any sensor.
+
+        Returns:
+        A tuple (sensor, period start, volume), None when there are no
+        readings in the range.
+        """
+        array, index = self._slice(freq, start, end)
+        sensors = sensors or self.sensors
+        array = np.asarray(array[[self.rows[s] for s in sensors]])
+        if not array.size or np.isnan(array).all():
+            return None
+        row, column = np.unravel_index(np.nanargmax(array), array.shape)
+        return sensors[row], index[column], float(array[row, column])
+
+    def busiest(self, start=None, end=None, freq='hour', top=10):
+        """ This method returns the periods with the highest volume summed
+        over every sensor.
+
+        Returns:
+        A pandas Series, the top periods and their volumes.
+        """
+        array, index = self._slice(freq, start, end)
+        total = pd.Series(np.nansum(array, axis=0), index=index)
+        return total.nlargest(top)